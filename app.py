@@ -3,8 +3,16 @@ import pandas as pd
 import time
 import io
 import os
+import pathlib
 from dotenv import load_dotenv
 from backend import TranslatorBackend
+from engines import format_engine_report, make_engine
+from estimator import Estimator, format_estimate
+from exports import export_format, result_fingerprint
+from languages import TARGET_LANGUAGES, language_name, result_column
+from jobs import JobManager
+from tmx import load_into_memory
+from workbook import WorkbookSource, dropped_parts, list_text_columns
 
 load_dotenv()
 
@@ -182,8 +190,38 @@ if not api_key_input:
     st.warning("⚠️ Please provide an API Key to proceed.")
     st.stop()
 
-# Initialize Backend
-backend = TranslatorBackend(api_key_input)
+# Request deadlines / hedging
+call_deadline = st.sidebar.number_input("Call deadline (s)", min_value=5, max_value=300, value=60, help="A model call running longer than this is cancelled and retried.")
+target_langs = st.sidebar.multiselect(
+    "Target languages", list(TARGET_LANGUAGES), default=["nl"], format_func=language_name,
+    help="Several targets share one improved-English pass. Glossary columns: translation_nl, translation_de, ..."
+)
+row_workers = st.sidebar.slider("Parallel rows", min_value=1, max_value=8, value=4, help="Rows translated at the same time; the longest cells are started first.")
+hedge_opt = st.sidebar.checkbox("Hedge slow requests", value=False, help="Send a duplicate request when a call runs past the observed p95 latency (capped at 5% of calls).")
+echo_opt = st.sidebar.checkbox("Echo source in answers", value=True, help="Off: the model does not repeat the English in its JSON answer, which saves about a third of the output tokens.")
+engine_opt = st.sidebar.selectbox(
+    "First pass", ["llm", "deepl"],
+    format_func=lambda e: {"llm": "Gemini (LLM only)", "deepl": "DeepL + Gemini post-edit"}[e],
+    help="With DeepL, Gemini only post-edits the Dutch rows that miss glossary terms, lose markup or come back untranslated."
+)
+deepl_key = ""
+improve_mt_opt = False
+if engine_opt == "deepl":
+    deepl_key = st.sidebar.text_input("DeepL API Key", type="password", value=os.environ.get("DEEPL_AUTH_KEY", ""))
+    improve_mt_opt = st.sidebar.checkbox(
+        "Improve English of DeepL rows", value=False,
+        help="Off: for rows DeepL translates, improved_english is the cleaned source text. On: one extra Gemini call per row."
+    )
+
+
+
+@st.cache_resource
+def get_job_manager():
+    # One manager per server process: jobs outlive reruns and browser refreshes
+    return JobManager(output_dir="output", max_jobs=2)
+
+
+job_manager = get_job_manager()
 
 # File Uploads
 col1, col2 = st.columns(2)
@@ -195,6 +233,16 @@ with col1:
 with col2:
     st.subheader("2. Glossary (Optional)")
     glossary_file = st.file_uploader("Upload Glossary .csv or .xlsx (Term | Translation)", type=["csv", "xlsx"])
+    tmx_file = st.file_uploader("Translation memory .tmx (Optional)", type=["tmx"], help="Segments found in the TMX are reused instead of translated.")
+
+
+def preload_tmx(memory):
+    """Loads the uploaded TMX into `memory` for every selected target."""
+    loaded = 0
+    for code in target_langs:
+        tmx_file.seek(0)
+        loaded += load_into_memory(tmx_file, memory, target=code)
+    return loaded
 
 # Data Preview & Logic
 if source_file:
@@ -217,12 +265,32 @@ if source_file:
         
         source_col = st.selectbox("Select Column with English Text", df_source.columns, index=default_col_idx)
 
+        # Workbook mode: several sheets/columns in one job, written back into a copy of the file
+        workbook_selection = []
+        if source_file.name.endswith('.xlsx') and st.checkbox(
+            "📚 Workbook mode: translate several sheets and columns",
+            help="Shared strings are translated once; the result is a copy of the workbook with the same "
+                 "sheets, styles, formulas and charts. Shapes, text boxes, slicers and some newer Excel features are not copied."
+        ):
+            dropped = dropped_parts(source_file.getvalue())
+            if dropped:
+                st.warning(f"⚠️ The translated copy of this workbook will not contain its {', '.join(dropped)}.")
+            sheet_columns = list_text_columns(source_file.getvalue())
+            options = [(sheet, column) for sheet, columns in sheet_columns.items() for column in columns]
+            first_sheet = next(iter(sheet_columns), None)
+            workbook_selection = st.multiselect(
+                "Sheets and columns to translate", options,
+                default=[o for o in options if o == (first_sheet, str(source_col))],
+                format_func=lambda o: f"{o[0]} › {o[1]}"
+            )
+
     except Exception as e:
         st.error(f"Error reading file: {e}")
         st.stop()
 
     # Glossary Processing
     glossary_dict = {}
+    glossary_dicts = {}
     if glossary_file:
         try:
             if glossary_file.name.endswith('.csv'):
@@ -230,245 +298,163 @@ if source_file:
             else:
                 df_gloss = pd.read_excel(glossary_file)
             
-            glossary_dict = backend.build_glossary_dict(df_gloss)
-            st.success(f"✅ Glossary loaded: {len(glossary_dict)} terms")
+            glossary_dict = TranslatorBackend.build_glossary_dict(df_gloss)
+            glossary_dicts = {code: TranslatorBackend.build_glossary_dict(df_gloss, target=code) for code in target_langs}
+            st.success("✅ Glossary loaded: " + ", ".join(f"{len(glossary_dicts[c])} {c} terms" for c in target_langs))
         except Exception as e:
             st.error(f"Error reading glossary: {e}")
 
+    # Dry run: counts, tokens, cost and duration without calling the model
+    if st.button("🧮 Estimate", help="Predict model calls, tokens, cost and wall time. No API calls are made."):
+        estimate_backend = TranslatorBackend(api_key_input, echo_source=echo_opt)
+        estimator = Estimator.for_backend(estimate_backend)
+        if tmx_file:
+            preload_tmx(estimate_backend.memory)
+        if workbook_selection:
+            texts = WorkbookSource(source_file.getvalue(), workbook_selection).texts
+        else:
+            texts = df_source[source_col].tolist()
+        estimate = estimator.estimate(texts, glossary_dict, memory=estimate_backend.memory, concurrency=row_workers)
+        st.code("\n".join(format_estimate(estimate)), language=None)
+        if any(code != "nl" for code in target_langs):
+            st.caption("The estimate covers the English/Dutch pipeline; every other target adds about one short call per segment.")
+
     # Process Button
-    if st.button("🚀 Start Translation", type="primary"):
-        # Reset previous state
-        if 'translation_df' in st.session_state:
-            del st.session_state['translation_df']
-        
-        results = []
-        errors = []
-        total_rows = len(df_source)
-        
-        # CONTAINER FOR LIVE LOGS
-        log_container = st.expander("📜 Process Live Log", expanded=True)
-        with log_container:
-            st.write("Initializing translation engine...")
-        
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # Placeholder for partial results (so user sees table growing)
-        results_placeholder = st.empty()
-        
-        try:
-            # AUTOSAVE INIT
-            # AUTOSAVE INIT
-            # 1. Create output directory immediately
-            output_dir = "output"
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-            
-            # 2. Generate Timestamped Filename for Auto-save
-            timestamp = time.strftime("%Y%m%d_%H%M%S")
-            base_filename = f"translation_results_{timestamp}"
-            autosave_file = os.path.join(output_dir, f"{base_filename}.csv")
-            
-            # Initialize/Clear the file with headers
-            pd.DataFrame(columns=["original_english", "improved_english", "dutch_translation"]).to_csv(autosave_file, index=False, encoding='utf-8-sig')
-            abs_path = os.path.abspath(autosave_file)
-            st.info(f"💾 Autosave active. Saving real-time to:\n`{abs_path}`")
-
-            for index, row in df_source.iterrows():
-                try:
-                    text = row[source_col]
-                    status_msg = f"Processing row {index+1}/{total_rows}..."
-                    status_text.text(status_msg)
-                    
-                    if index % 10 == 0:
-                        with log_container:
-                            st.write(f"⏱️ {status_msg}")
-
-                    current_result = None
-                    if pd.isna(text) or str(text).strip() == "":
-                        # Handle empty
-                        current_result = {
-                            "original_english": text,
-                            "improved_english": "",
-                            "dutch_translation": ""
-                        }
-                    else:
-                        # Find terms
-                        relevant_terms = backend.find_relevant_terms(str(text), glossary_dict)
-                        # Translate
-                        current_result = backend.translate_row_robust(str(text), relevant_terms)
-                    
-                    results.append(current_result)
-                    
-                    # --- REAL-TIME AUTOSAVE ---
-                    # Append this single row to the CSV immediately
-                    # We utilize a temporary DF to append safely with quotes/escaping handled by pandas
-                    pd.DataFrame([current_result])[["original_english", "improved_english", "dutch_translation"]].to_csv(
-                        autosave_file, mode='a', header=False, index=False, encoding='utf-8-sig'
+    if st.button("🚀 Start Translation", type="primary", disabled=not target_langs or (engine_opt == "deepl" and not deepl_key)):
+        # The job runs on a background worker; this script run only submits it.
+        # Rows hitting rate limits or timeouts are queued and retried at the end of the job
+        job_backend = TranslatorBackend(
+            api_key_input, call_deadline=call_deadline, hedge=hedge_opt, defer_retries=True, echo_source=echo_opt,
+            engine=make_engine("deepl", auth_key=deepl_key) if engine_opt == "deepl" else None,
+            improve_engine_rows=improve_mt_opt
+        )
+        if tmx_file:
+            st.caption(f"📚 {preload_tmx(job_backend.memory)} translation units loaded from {tmx_file.name}")
+        if workbook_selection:
+            job = job_manager.submit_workbook(
+                job_backend,
+                WorkbookSource(source_file.getvalue(), workbook_selection, name=source_file.name),
+                glossary_dict,
+                targets=target_langs,
+                glossary_dicts=glossary_dicts or None,
+                workers=row_workers
+            )
+        else:
+            job = job_manager.submit(
+                job_backend,
+                df_source[source_col].tolist(),
+                glossary_dict,
+                name=f"{source_file.name} [{source_col}]",
+                targets=target_langs,
+                glossary_dicts=glossary_dicts or None,
+                workers=row_workers
+            )
+        st.session_state['active_job_id'] = job.id
+        st.session_state.pop('translation_df', None)
+        st.session_state.pop('translation_fp', None)
+        st.info(f"💾 Job `{job.id}` started. Autosaving real-time to:\n`{os.path.abspath(job.outputs['csv'])}`")
+
+
+# --- BACKGROUND JOBS ---
+# Rendered in a fragment that refreshes itself, so progress updates without
+# rerunning (or blocking) the rest of the page.
+@st.fragment(run_every="2s")
+def render_jobs_panel():
+    jobs = job_manager.list_jobs()
+    if not jobs:
+        return
+    st.divider()
+    st.subheader("🛰️ Translation Jobs")
+    for job in jobs:
+        with st.expander(f"{job.status.upper()} · {job.name} · `{job.id}`", expanded=job.is_active):
+            st.progress(job.progress, text=f"{job.done}/{job.total} rows")
+            if job.results:
+                st.dataframe(job.results.tail(3))
+            st.code("\n".join(list(job.log)[-8:]) or "...")
+            if job.is_active:
+                if st.button("⏹️ Cancel", key=f"cancel_{job.id}"):
+                    job_manager.cancel(job.id)
+            else:
+                if job.report:
+                    report = job.report
+                    st.write(
+                        f"📊 Run report: {report['local_pct']}% of cells resolved without the model, "
+                        f"{report['json_ok']} JSON OK "
+                        f"({report['parse_recovered']} recovered by the tolerant parser), "
+                        f"{report['parse_retries']} parse retries, {report['strategy_b']} text fallbacks, "
+                        f"{report['truncations']} truncated answers ({report['truncation_splits']} split), "
+                        f"{report['failed']} failed, {report['timeouts']} timed-out calls, "
+                        f"{report.get('retry_deferred', 0)} deferred retries ({report.get('retry_recovered', 0)} recovered), "
+                        f"{report['hedges']} hedged calls ({report['hedge_wins']} won), "
+                        f"{report['marker_repairs']} placeholder repairs ({report['marker_failures']} unrepaired)"
                     )
-                    # --------------------------
-                    
-                    # Update Progress
-                    progress = (index + 1) / total_rows
-                    progress_bar.progress(progress)
-                    
-                    # VISUAL FEEDBACK: Update table every row so user KNOWS it's working
-                    # This might slow it down slightly but provides peace of mind needed right now.
-                    if index % 2 == 0 or index == total_rows - 1:
-                         results_placeholder.dataframe(pd.DataFrame(results).tail(3))
-                         
-                except Exception as row_error:
-                    err_msg = f"❌ Error on row {index+1}: {str(row_error)}"
-                    with log_container:
-                        st.error(err_msg)
-                    errors.append(err_msg)
-                    # Create a dummy failed row so we don't lose alignment
-                    failed_row = {
-                        "original_english": str(row[source_col]),
-                        "improved_english": "ERROR",
-                        "dutch_translation": "ERROR_FAILED_PROCESSING"
-                    }
-                    results.append(failed_row)
-                    
-                    # Try to autosave the error too so alignment is kept
-                    try:
-                        pd.DataFrame([failed_row])[["original_english", "improved_english", "dutch_translation"]].to_csv(
-                            autosave_file, mode='a', header=False, index=False, encoding='utf-8-sig'
+                    if report.get("engine"):
+                        st.write(
+                            f"🔁 {format_engine_report(report['engine'])}; {report['mt_rows']} rows from the engine "
+                            f"({report['post_edits']} post-edited by the LLM), {report['post_edit_fallbacks']} fully retranslated; "
+                            f"improved_english of engine rows: {report.get('mt_improved_english', 'cleaned source')}"
                         )
-                    except:
-                        pass # If saving fails here, we can't do much
+                if job.errors:
+                    st.warning(f"Process finished with {len(job.errors)} errors. Check the log above.")
+                for key, path in job.outputs.items():
+                    if key.startswith("workbook") and os.path.exists(path):
+                        st.download_button(
+                            label=f"📘 Download translated workbook ({key})",
+                            data=pathlib.Path(path).read_bytes,
+                            file_name=f"{os.path.splitext(job.workbook.name)[0]}_{key}.xlsx",
+                            key=f"{key}_{job.id}",
+                        )
+                if st.button("📋 Show results", key=f"show_{job.id}"):
+                    st.session_state['active_job_id'] = job.id
+                    st.session_state['translation_df'] = job.results_frame()
+                    st.session_state['translation_fp'] = job.fingerprint
+                    st.rerun(scope="app")
 
-            # LOOP FINISHED
-            progress_bar.progress(1.0)
-            status_text.success(f"✅ Translation Finished! All data saved to {autosave_file}")
-            
-            # Store Final Results
-            st.session_state['translation_df'] = pd.DataFrame(results)
-
-            # --- AUTO-SAVE TO DISK (Finalize) ---
-            try:
-                # The CSV is already saved row-by-row in autosave_file, so we don't need to re-save it
-                # unless we want to ensure it matches the final list exactly (which it should).
-                # We will keep the reference to it.
-                
-                # 4. Save Excel
-                excel_path = os.path.join(output_dir, f"{base_filename}.xlsx")
-                with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                    pd.DataFrame(results).to_excel(writer, index=False, sheet_name='Translations')
-                    
-                # 5. Save XLIFF
-                # We need the generate_xliff function here, but it's defined inside the column scope later. 
-                # Let's extract the XLIFF generation logic to be reusable or define it here.
-                # For simplicity, we define a quick helper here or move the function up. 
-                # Since we are editing inside the block, let's define it here locally for the auto-save.
-                def _quick_xliff_gen(df):
-                    xliff = ['<?xml version="1.0" encoding="UTF-8"?>']
-                    xliff.append('<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">')
-                    xliff.append('  <file source-language="en" target-language="nl" datatype="plaintext" original="translation_job">')
-                    xliff.append('    <body>')
-                    for i, r in df.iterrows():
-                        src = str(r.get("original_english", "")).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                        tgt = str(r.get("dutch_translation", "")).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                        xliff.append(f'      <trans-unit id="{i+1}">')
-                        xliff.append(f'        <source>{src}</source>')
-                        xliff.append(f'        <target>{tgt}</target>')
-                        xliff.append('      </trans-unit>')
-                    xliff.append('    </body>')
-                    xliff.append('  </file>')
-                    xliff.append('</xliff>')
-                    return "\n".join(xliff)
-
-                xliff_path = os.path.join(output_dir, f"{base_filename}.xlf")
-                with open(xliff_path, "w", encoding="utf-8") as f:
-                    f.write(_quick_xliff_gen(pd.DataFrame(results)))
-                
-                with st.expander("✅ AUTO-SAVE SUCCESS", expanded=True):
-                    st.success(f"Files saved to '/{output_dir}/' folder:")
-                    st.code(f"- {base_filename}.csv\n- {base_filename}.xlsx\n- {base_filename}.xlf")
-                
-            except Exception as save_error:
-                st.error(f"⚠️ Auto-save failed: {save_error}")
-                import traceback
-                st.code(traceback.format_exc())
-            
-            if errors:
-                st.warning(f"Process finished with {len(errors)} errors. Check the log above.")
-        
-        except Exception as e:
-            # FATAL CRASH CATCHER
-            st.error(f"🔥 FATAL ERROR: The process crashed unexpectedly.\nError details: {e}")
-            if results:
-                st.warning("⚠️ Attempting to save partial results so you don't lose everything...")
-                st.session_state['translation_df'] = pd.DataFrame(results)
-            else:
-                st.error("No results could be saved.")
-
-    # --- PERSISTENT RESULTS DISPLAY ---
-    if 'translation_df' in st.session_state:
-        st.divider()
-        st.subheader("🎉 Translation Results")
-        img_df = st.session_state['translation_df']
-        st.dataframe(img_df)
-        
-        st.write("### Download Options")
-        d_col1, d_col2, d_col3 = st.columns(3)
-
-        with d_col1:
-            # Download Button CSV (Fixed with BOM for Excel)
-            try:
-                csv = img_df.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    label="📥 Download Results (CSV)",
-                    data=csv,
-                    file_name="translated_results.csv",
-                    mime="text/csv",
-                )
-            except Exception as e:
-                st.error(f"Could not generate CSV file: {e}")
-
-        with d_col2:
-            # Download Button Excel (.xlsx)
-            output = io.BytesIO()
-            try:
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    img_df.to_excel(writer, index=False, sheet_name='Translations')
-                excel_data = output.getvalue()
-                
-                st.download_button(
-                    label="📥 Download Results (Excel)",
-                    data=excel_data,
-                    file_name="translated_results.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                )
-            except Exception as e:
-                st.error(f"Could not generate Excel file: {e}")
-
-        with d_col3:
-            # Download Button XLIFF
-            def generate_xliff(df):
-                xliff = ['<?xml version="1.0" encoding="UTF-8"?>']
-                xliff.append('<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">')
-                xliff.append('  <file source-language="en" target-language="nl" datatype="plaintext" original="translation_job">')
-                xliff.append('    <body>')
-                
-                for i, r in df.iterrows():
-                    src = str(r.get("original_english", "")).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                    tgt = str(r.get("dutch_translation", "")).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-                    
-                    xliff.append(f'      <trans-unit id="{i+1}">')
-                    xliff.append(f'        <source>{src}</source>')
-                    xliff.append(f'        <target>{tgt}</target>')
-                    xliff.append('      </trans-unit>')
-                
-                xliff.append('    </body>')
-                xliff.append('  </file>')
-                xliff.append('</xliff>')
-                return "\n".join(xliff)
-
-            xliff_content = generate_xliff(img_df)
+
+render_jobs_panel()
+
+# Finished jobs from earlier sessions stay downloadable from output/
+saved_outputs = job_manager.list_saved_outputs()
+if saved_outputs:
+    with st.expander(f"📁 Saved results in '/{job_manager.output_dir}/' ({len(saved_outputs)} files)"):
+        for i, path in enumerate(saved_outputs[:30]):
+            st.download_button(
+                label=f"📥 {os.path.basename(path)}",
+                data=pathlib.Path(path).read_bytes,
+                file_name=os.path.basename(path),
+                key=f"saved_{i}_{os.path.basename(path)}",
+            )
+
+# --- PERSISTENT RESULTS DISPLAY ---
+if 'translation_df' in st.session_state:
+    st.divider()
+    st.subheader("🎉 Translation Results")
+    img_df = st.session_state['translation_df']
+    st.dataframe(img_df)
+    
+    st.write("### Download Options")
+    # Export bytes are built only when a button is clicked, and cached by a
+    # hash of the results; unchanged autosaved job files are served directly.
+    if not st.session_state.get('translation_fp'):
+        st.session_state['translation_fp'] = result_fingerprint(img_df)
+    fingerprint = st.session_state['translation_fp']
+    labels = {"csv": "CSV", "xlsx": "Excel", "tmx": "TMX"}
+    formats = ["csv", "xlsx", "tmx"]
+    # One XLIFF per target language column in the results
+    for code in TARGET_LANGUAGES:
+        if result_column(code) in img_df.columns:
+            fmt = "xlf" if code == "nl" else f"xlf_{code}"
+            formats.append(fmt)
+            labels[fmt] = f"XLIFF {code}"
+
+    for column, fmt in zip(st.columns(len(formats)), formats):
+        _, extension, mime = export_format(fmt)
+        suffix = "" if fmt in ("csv", "xlsx", "xlf", "tmx") else f"_{fmt[4:]}"
+        with column:
             st.download_button(
-                label="📥 Download Results (XLIFF)",
-                data=xliff_content,
-                file_name="translated_results.xlf",
-                mime="application/x-xliff+xml",
+                label=f"📥 Download Results ({labels[fmt]})",
+                data=(lambda f=fmt: job_manager.exports.get(img_df, f, fingerprint)),
+                file_name=f"translated_results{suffix}.{extension}",
+                mime=mime,
+                key=f"download_{fmt}",
             )
@@ -1,63 +1,80 @@
-import pandas as pd
-import requests
-import google.generativeai as genai
-import time
 import json
-import io
-import os
 import re
-import sys
 
-# Force UTF-8 environment logic
-try:
-    sys.stdout.reconfigure(encoding='utf-8')
-    sys.stderr.reconfigure(encoding='utf-8')
-except:
-    pass
+from compliance import CompiledGlossary
+from estimator import output_budget
+from fastpath import FastPath
+from glossary import DEFAULT_TERM_TOKEN_BUDGET
+from json_recovery import parse_complete_json
+from languages import TARGET_LANGUAGES, glossary_column, result_column
+from latency import DEFAULT_CALL_DEADLINE, HedgedCaller
+from masking import is_all_caps, mask, upper_outside_markup
+from pipeline import FAILED, TranslationPipeline, is_failed
+from prompts import BATCH_TRANSLATION_SCHEMA, TRANSLATION_SCHEMA, TRANSLATION_SCHEMA_NO_ECHO, PromptTemplate
+from retry_queue import TRANSIENT, RetryLater, classify_error
+from segmenter import join_segments, split_segments
+from transport import Transport
 
-class TranslatorBackend:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        # Configure Gemini
-        genai.configure(api_key=self.api_key)
-        self.generation_config = {
-            "temperature": 0.2,
-            "top_p": 0.8,
-            "top_k": 40,
-            "max_output_tokens": 1024,
-        }
-        self.safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
-        self.model = genai.GenerativeModel(
-            model_name="gemini-2.5-flash", 
-            generation_config=self.generation_config,
-            safety_settings=self.safety_settings
-        )
+JSON_TEMPLATE = PromptTemplate(
+    name="translate_json",
+    system="""
+You are an expert technical translator converting English to Dutch.
 
-    def _verify_and_correct(self, candidate_translation, original_english):
-        """
-        Secondary pass to enforce Dutch linguistic rules:
-        - Compound words (Samengestelde woorden)
-        - Koppelteken for omission (Weglatingsstreepje)
-        - Word order (V2, SOV)
-        - Capitalization
-        """
-        verify_prompt = f"""
-Role: Dutch Language Editor.
-Task: Review and correct the following translation.
+STRICT INSTRUCTIONS:
+1. Output JSON ONLY. No markdown.
+2. Structure: { "original_english": "...", "improved_english": "...", "dutch_translation": "..." }
+3. Rephrase 'Input Text' to be grammatically correct (improved_english). **CRITICAL: Add missing articles (the, a) if the source sounds broken (e.g. "I am Driver-i" -> "I am THE Driver-i").**
+4. Translate to Dutch using the Glossary (dutch_translation).
+
+LINGUISTIC RULES (CRITICAL):
+- **BRANDING (INVIOLABLE)**: NEVER translate 'Driver-i'. It is ALWAYS 'Driver-i', never 'Bestuurder-i'.
+- **PUNCTUATION**: You MAY add commas or semicolons if it improves natural Dutch flow/readability.
+- **CAPITALIZATION (STRICT)**: MIRROR English casing EXACTLY.
+    - If English is "feedback" (lowercase), Dutch MUST be "feedback" (lowercase).
+    - If English is "Feedback" (Title), Dutch MUST be "Feedback".
+    - DO NOT capitalize nouns mid-sentence (German style) unless they are capitalized in English.
+- **Compound Words**: ALWAYS combine nouns in Dutch. (e.g., 'Account Meldingen' -> 'Accountmeldingen').
+- **Word Order**: Use natural Dutch syntax (SOV).
+- **Ellipsis**: Use 'koppelteken' correctly (e.g., 'Bestuurders- en Voertuiggroepen').
+- **MARKERS**: Tokens like ⟦0⟧ stand for markup, placeholders or brand names. Copy each one unchanged into
+  improved_english and dutch_translation, at the position where it belongs in the sentence.
+
+Each request gives the GLOSSARY terms and EXAMPLES relevant to its Input Text.
+""",
+    body="""
+GLOSSARY:
+{glossary}
+
+EXAMPLES:
+{examples}
+{context}
+Input Text: "{source}"
+""",
+    response_schema=TRANSLATION_SCHEMA,
+)
 
-Original English: "{original_english}"
-Candidate Dutch: "{candidate_translation}"
+# Same rules, but the answer leaves out the unchanged original_english echo
+JSON_NO_ECHO_TEMPLATE = PromptTemplate(
+    name="translate_json_no_echo",
+    system=JSON_TEMPLATE.system.replace(
+        '{ "original_english": "...", "improved_english": "...", "dutch_translation": "..." }',
+        '{ "improved_english": "...", "dutch_translation": "..." }'
+    ),
+    body=JSON_TEMPLATE.body,
+    response_schema=TRANSLATION_SCHEMA_NO_ECHO,
+)
+
+VERIFY_TEMPLATE = PromptTemplate(
+    name="verify",
+    system="""
+Role: Dutch Language Editor.
+Task: Review and correct the translation you are given.
 
 CHECKLIST:
 1. **Capitalization (STRICT)**: MIRROR English casing EXACTLY. (e.g. "feedback" -> "feedback", "Feedback" -> "Feedback"). Do NOT capitalize nouns mid-sentence.
 2. **Branding (INVIOLABLE)**: Ensure 'Driver-i' is NEVER translated to 'Bestuurder-i'. It must remain 'Driver-i'.
 3. **Compound Words**: Are nouns combined? (e.g. 'Account Meldingen' -> 'Accountmeldingen').
-4. **Variables**: Are `{{count}}` or `[text]` placeholders correctly placed?
+4. **Markers**: Is every ⟦n⟧ marker from the English kept unchanged and correctly placed?
 5. **Ellipsis**: Is the hyphen used correctly? (e.g. 'Bestuurders- en Voertuiggroepen').
 
 EXAMPLES OF CORRECTIONS:
@@ -70,39 +87,231 @@ Instruction:
 - If the Candidate Dutch is perfect, output it exactly.
 - If errors exist, output ONLY the corrected Dutch version.
 - Do NOT provide explanations. Just the text.
-"""
-        try:
-            response = self.model.generate_content(verify_prompt)
-            return response.text.strip()
-        except:
-            return candidate_translation
-    
-    def fix_utf8_mojibake(self, text):
+""",
+    body="""
+Original English: "{source}"
+Candidate Dutch: "{candidate}"
+""",
+)
+
+FALLBACK_TEMPLATE = PromptTemplate(
+    name="translate_text",
+    system="""
+Role: Technical Translator (English -> Dutch).
+Task: Translate the English text you are given to Dutch, using the listed terms if present.
+Return ONLY the Dutch translation. do not include any other text.
+""",
+    body="""
+Use these terms if present: {glossary}
+
+Input: "{source}"
+""",
+)
+
+MARKER_REPAIR_TEMPLATE = PromptTemplate(
+    name="repair_markers",
+    system="""
+Role: Dutch Language Editor.
+Task: The Dutch translation lost or changed some ⟦n⟧ markers. Each marker stands for markup or a name
+and must appear in the Dutch exactly as in the English. Put every listed marker back in the right place
+and change nothing else.
+Output ONLY the corrected Dutch text.
+""",
+    body="""
+English: "{source}"
+Dutch: "{candidate}"
+Markers: {markers}
+""",
+)
+
+IMPROVE_TEMPLATE = PromptTemplate(
+    name="improve_english",
+    system="""
+Role: English technical editor.
+Task: Rephrase the English text you are given to be grammatically correct. Add missing articles
+(the, a) where the source sounds broken. Keep the meaning, tone and capitalization.
+Never change brand names (Driver-i, Driver•i, Netradyne). Tokens like ⟦0⟧ stand for markup or
+placeholders: copy each one unchanged.
+Return ONLY the improved English text.
+""",
+    body="""
+Input: "{source}"
+""",
+)
+
+POST_EDIT_TEMPLATE = PromptTemplate(
+    name="post_edit",
+    system="""
+Role: Dutch post-editor for machine translation (English -> Dutch, technical UI text).
+Task: Correct the machine translation of the English text. Fix the listed issues and any
+mistranslation; keep everything that is already correct.
+
+RULES:
+1. Use every listed glossary term exactly as given.
+2. MIRROR English capitalization EXACTLY. Do NOT capitalize nouns mid-sentence.
+3. 'Driver-i' and other brand names are never translated.
+4. Keep every ⟦n⟧ marker from the English unchanged.
+
+Output ONLY the corrected Dutch text.
+""",
+    body="""
+GLOSSARY:
+{glossary}
+
+Issues: {issues}
+{context}
+English: "{source}"
+Machine translation: "{candidate}"
+""",
+)
+
+_TARGET_TEMPLATES = {}
+
+
+def target_template(code):
+    """
+    Plain-text translation prompt from (improved) English into one target
+    language. Used by the multi-target fan-out; Dutch-only runs keep the
+    JSON pipeline above.
+    """
+    if code not in _TARGET_TEMPLATES:
+        language, formal = TARGET_LANGUAGES[code]
+        _TARGET_TEMPLATES[code] = PromptTemplate(
+            name=f"translate_{code}",
+            system=f"""
+Role: Expert technical translator (English -> {language}).
+Task: Translate the English text you are given into idiomatic {language}.
+
+RULES:
+- Use the GLOSSARY terms exactly when they apply.
+- NEVER translate brand names (Driver-i, Driver•i, Netradyne).
+- Always use the formal form of address ({formal}).
+- Mirror the English capitalization; do not capitalize words the English writes in lowercase
+  unless {language} grammar requires it.
+- Tokens like ⟦0⟧ stand for markup or placeholders: copy each one unchanged, where it belongs.
+
+Return ONLY the {language} translation, no explanations.
+""",
+            body="""
+GLOSSARY:
+{glossary}
+
+Input: "{source}"
+""",
+        )
+    return _TARGET_TEMPLATES[code]
+
+
+BATCH_TEMPLATE = PromptTemplate(
+    name="translate_batch",
+    system=JSON_TEMPLATE.system + """
+
+BATCH MODE:
+You receive several numbered segments instead of a single Input Text. Apply every rule above to each
+segment independently and answer with
+{ "translations": [ { "id": <segment id>, "improved_english": "...", "dutch_translation": "..." } ] }
+containing exactly one entry per segment id.
+""",
+    body="""
+GLOSSARY:
+{glossary}
+
+SEGMENTS:
+{segments}
+""",
+    response_schema=BATCH_TRANSLATION_SCHEMA,
+)
+
+
+class TranslatorBackend(TranslationPipeline):
+    """
+    The pipeline (pipeline.py) for the app, jobs and the service: Gemini
+    through a transport and a hedged caller, plus batch calls, multi-target
+    fan-out and the MT engine mode.
+    """
+    verify_template = VERIFY_TEMPLATE
+    fallback_template = FALLBACK_TEMPLATE
+    marker_repair_template = MARKER_REPAIR_TEMPLATE
+
+    def __init__(self, api_key, model_factory=None, call_deadline=DEFAULT_CALL_DEADLINE, hedge=False,
+                 defer_retries=False, transport=None, engine=None, echo_source=True, improve_engine_rows=False):
+        # Run report counters (see run_report), translation memory and the
+        # piece pool live on the pipeline
+        super().__init__(defer_retries=defer_retries)
+        self.api_key = api_key
+        # echo_source=False drops original_english from the JSON answer (a third less output)
+        self.json_template = JSON_TEMPLATE if echo_source else JSON_NO_ECHO_TEMPLATE
+        # Two-stage mode: an MT engine (engines.py) translates first, the LLM
+        # only post-edits rows that fail the glossary or rule checks
+        self.engine = engine
+        # Engine rows keep the cleaned source as improved_english unless this
+        # is set, which costs one improve_english call per engine row
+        self.improve_engine_rows = improve_engine_rows
+        self._glossaries = {}
+        self.generation_config = {
+            "temperature": 0.2,
+            "top_p": 0.8,
+            "top_k": 40,
+            "max_output_tokens": 1024,
+        }
+        self.safety_settings = [
+            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+        ]
+        # Static rule blocks live in each template's system_instruction, so one
+        # model per template is created once and reused for every row.
+        # The transport can record every call to a cassette, or answer from one
+        # (see transport.py); by default it reads TRANSLATOR_TRANSPORT
+        self.transport = transport or Transport.from_env()
+        self.model_factory = self.transport.wrap(model_factory or self._default_model_factory)
+        self._models = {}
+        # Every model call gets a deadline; hedging duplicates calls slower than p95
+        self.caller = HedgedCaller(deadline=call_deadline, hedge=hedge)
+
+    @property
+    def model(self):
+        return self._model_for(self.json_template)
+
+    def _default_model_factory(self, system_instruction, response_schema=None):
+        # Imported on first use: the SDK takes about a second to import
+        import google.generativeai as genai
+
+        genai.configure(api_key=self.api_key)
+        generation_config = dict(self.generation_config)
+        if response_schema:
+            # Structured output: the API constrains the answer to this schema
+            generation_config["response_mime_type"] = "application/json"
+            generation_config["response_schema"] = response_schema
+        return genai.GenerativeModel(
+            model_name="gemini-2.5-flash", 
+            generation_config=generation_config,
+            safety_settings=self.safety_settings,
+            system_instruction=system_instruction
+        )
+
+    def _model_for(self, template):
+        if template.name not in self._models:
+            self._models[template.name] = self.model_factory(
+                system_instruction=template.system,
+                response_schema=template.response_schema
+            )
+        return self._models[template.name]
+
+    def _generate(self, template, max_output_tokens=None, **values):
         """
-        Repairs common UTF-8 encoding errors (Mojibake).
-        Specifically targets Windows-1252 artifacting.
+        Sends only the per-row part of the template; the static part is
+        already on the model as its system instruction. The call runs under
+        the backend's deadline (and hedging, when enabled). max_output_tokens
+        defaults to the expected answer size for this input (output_budget).
         """
-        if not isinstance(text, str):
-            return str(text)
-        
-        replacements = {
-            "Ã¢â‚¬Â¢": "•",  # Bullet (Standard encoding error)
-            "â€¢": "•",      # Bullet (alt)
-            "Ã¢": "â",       # Partial artifact
-            "â¢": "•",       # Screenshot variant
-            "Ã©": "é",       # e acute
-            "Ã": "à",        # a grave (partial) - be careful here, usually context dependent
-            "â€™": "'",      # Smart quote
-            "â€œ": '"',      # Smart open quote
-            "â€": '"',       # Smart close quote
-            "Ã«": "ë",       # e diaeresis
-            "Ã¯": "ï",       # i diaeresis
-            "â€“": "-",      # En dash
-        }
-        
-        for bad, good in replacements.items():
-            text = text.replace(bad, good)
-        return text
+        model = self._model_for(template)
+        prompt = template.render(**values)
+        config = {"max_output_tokens": max_output_tokens or output_budget(template.name, values)}
+        return self.caller.call(
+            lambda timeout: model.generate_content(prompt, generation_config=config, request_options={"timeout": timeout})
+        )
 
     def _post_process_enforcement(self, dutch_text, source_english):
         """
@@ -141,147 +350,372 @@ Instruction:
 
         return dutch_text
 
-    def clean_text_for_prompt(self, text):
-        if not isinstance(text, str):
-            return str(text)
-        
-        # 1. Fix encoding first
-        text = self.fix_utf8_mojibake(text)
-        
-        # 2. Normalize whitespace
-        text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-        text = re.sub(r'\s+', ' ', text).strip()
-        return text
-
-    def translate_row_robust(self, source_text, glossary_text, reference_examples=""):
-        clean_noline_source = self.clean_text_for_prompt(source_text)
-        safe_json_source = clean_noline_source.replace('"', '\\"')
-        
-        # --- STRATEGY A: Strict JSON ---
-        prompt_json = f"""
-You are an expert technical translator converting English to Dutch.
+    def _translate_pieces(self, items, glossary_dict, reference_examples=""):
+        if self.engine is not None:
+            # All pieces of the cell go to the engine in one call
+            return self._translate_pieces_with_engine(items, glossary_dict, reference_examples)
+        return super()._translate_pieces(items, glossary_dict, reference_examples)
 
-STRICT INSTRUCTIONS:
-1. Output JSON ONLY. No markdown.
-2. Structure: {{ "original_english": "...", "improved_english": "...", "dutch_translation": "..." }}
-3. Rephrase 'Input Text' to be grammatically correct (improved_english). **CRITICAL: Add missing articles (the, a) if the source sounds broken (e.g. "I am Driver-i" -> "I am THE Driver-i").**
-4. Translate to Dutch using the Glossary (dutch_translation).
+    def _translate_piece(self, text, glossary_dict, reference_examples="", context=""):
+        if self.engine is not None:
+            return self._translate_pieces_with_engine([(text, context)], glossary_dict, reference_examples)[0]
+        return super()._translate_piece(text, glossary_dict, reference_examples, context)
 
-LINGUISTIC RULES (CRITICAL):
-- **BRANDING (INVIOLABLE)**: NEVER translate 'Driver-i'. It is ALWAYS 'Driver-i', never 'Bestuurder-i'.
-- **PUNCTUATION**: You MAY add commas or semicolons if it improves natural Dutch flow/readability.
-- **CAPITALIZATION (STRICT)**: MIRROR English casing EXACTLY.
-    - If English is "feedback" (lowercase), Dutch MUST be "feedback" (lowercase).
-    - If English is "Feedback" (Title), Dutch MUST be "Feedback".
-    - DO NOT capitalize nouns mid-sentence (German style) unless they are capitalized in English.
-- **Compound Words**: ALWAYS combine nouns in Dutch. (e.g., 'Account Meldingen' -> 'Accountmeldingen').
-- **Word Order**: Use natural Dutch syntax (SOV).
-- **Ellipsis**: Use 'koppelteken' correctly (e.g., 'Bestuurders- en Voertuiggroepen').
+    def _translate_pieces_with_engine(self, items, glossary_dict, reference_examples=""):
+        """
+        Engine mode for the pieces of one cell, items = [(text, context)].
+        Local and cached pieces are answered as in _translate_piece; the rest
+        share one engine call. Returns [(result, local)] in item order.
+        """
+        outcomes = [None] * len(items)
+        remote = []
+        for i, (text, context) in enumerate(items):
+            local = self._local_or_cached(text, glossary_dict, context)
+            if local is not None:
+                outcomes[i] = (local, True)
+            else:
+                remote.append(i)
+        if remote:
+            results = self._translate_with_engine(
+                [items[i][0] for i in remote], glossary_dict, reference_examples, [items[i][1] for i in remote]
+            )
+            for i, result in zip(remote, results):
+                text, context = items[i]
+                if not is_failed(result):
+                    self.memory.put(text, result, context)
+                outcomes[i] = (result, False)
+        return outcomes
 
-GLOSSARY:
-{glossary_text}
+    def improve_english(self, source_text):
+        """
+        The improved-English step on its own (for fan-out jobs without Dutch).
+        Cached in self.memory; falls back to the cleaned source on failure.
+        """
+        clean = self.clean_text_for_prompt(source_text)
+        if not clean or FastPath({}).classify(clean):
+            return clean
+        cached = self.memory.get(clean, context="improve")
+        if cached is not None:
+            self._count("memory_hits")
+            return cached["improved_english"]
+        masked = mask(clean)
+        try:
+            response = self._generate(IMPROVE_TEMPLATE, source=masked.text)
+            improved, problems = masked.restore(response.text.strip().strip('"'))
+            self._count("improve_calls")
+        except Exception as e:
+            if self.defer_retries and classify_error(e) == TRANSIENT:
+                self._count("deferred")
+                raise RetryLater(e)
+            improved, problems = clean, ["call failed"]
+        if problems or not improved:
+            return clean
+        if is_all_caps(source_text):
+            improved = upper_outside_markup(improved)
+        self.memory.put(clean, {"improved_english": improved}, context="improve")
+        return improved
 
-EXAMPLES:
-{reference_examples}
+    def _translate_target(self, code, text, glossary_dict):
+        """
+        Translates one (improved English) piece into a non-Dutch target.
+        Returns None when the piece could not be translated.
+        """
+        clean = self.clean_text_for_prompt(text)
+        if not clean:
+            return ""
+        resolved = self._fast_path_for(glossary_dict).resolve(clean)
+        if resolved is not None:
+            self._count("fast_path")
+            return resolved[0]
+        context = f"target:{code}"
+        cached = self.memory.get(clean, context)
+        if cached is not None:
+            self._count("memory_hits")
+            return cached["translation"]
 
-Input Text: "{safe_json_source}"
-"""
-        retries = 3
-        last_error = None
-        
-        for attempt in range(retries):
+        masked = mask(clean)
+        glossary_text = self.find_relevant_terms(clean, glossary_dict)
+        for _ in range(2):
             try:
-                # Exponential backoff for rate limits
-                if attempt > 0:
-                    time.sleep(2 ** attempt)
-                    
-                response = self.model.generate_content(prompt_json)
-                if not response.parts:
-                    raise ValueError("Blocked by safety filters or empty response")
-                
-                txt = response.text.strip()
-                if "```" in txt:
-                    txt = re.sub(r"```json\s*", "", txt, flags=re.IGNORECASE).replace("```", "")
-                
-                # Sanitize newlines inside JSON strings if they break parsing
-                # (Simple approach: assume strict JSON structure from model)
-                
-                data = json.loads(txt)
-                
-                if "improved_english" not in data or "dutch_translation" not in data:
-                    raise ValueError("Missing JSON keys")
-                
-                # --- VERIFICATION STEP (New) ---
-                verified_dutch = self._verify_and_correct(data["dutch_translation"], source_text)
-
-                # --- POST-PROCESSING ENFORCEMENT ---
-                final_dutch = self._post_process_enforcement(verified_dutch, source_text)
-
-                # --- ALL CAPS ENFORCEMENT ---
-                if source_text.isupper() and len(source_text) > 1:
-                    data["improved_english"] = data["improved_english"].upper()
-                    final_dutch = final_dutch.upper()
-
-                return {
-                    "original_english": source_text,
-                    "improved_english": data["improved_english"],
-                    "dutch_translation": final_dutch
-                }
+                response = self._generate(
+                    target_template(code), glossary=glossary_text, source=masked.text
+                )
+                translation, problems = masked.restore(response.text.strip().strip('"'))
             except Exception as e:
-                last_error = e
-                # If it's a 429/ResourceExhausted, we really want to retry/wait
-                err_str = str(e).lower()
-                if "429" in err_str or "quota" in err_str or "exhausted" in err_str:
-                    time.sleep(5) # Extra wait for quota
+                if self.defer_retries and classify_error(e) == TRANSIENT:
+                    self._count("deferred")
+                    raise RetryLater(e)
                 continue
+            self._count("target_calls")
+            if translation and not problems:
+                break
+        else:
+            self._count("target_failures")
+            return None
+        if is_all_caps(text):
+            translation = upper_outside_markup(translation)
+        self.memory.put(clean, {"translation": translation}, context)
+        return translation
 
-        # --- STRATEGY B: Fallback Text-Only ---
-        # If we are here, Strategy A failed all retries.
-        
-        prompt_text = f"""
-Role: Technical Translator (English -> Dutch).
-Task: Translate the following English text to Dutch.
-Use these terms if present: {glossary_text}
+    def translate_cell_targets(self, source_text, glossary_dicts, targets, reference_examples=""):
+        """
+        Fan-out mode: the improved English is computed once (by the Dutch
+        pipeline when Dutch is a target, otherwise by improve_english) and
+        every other target is then translated from it concurrently.
 
-Input: "{clean_noline_source}"
+        glossary_dicts: {code: glossary dict} (see build_glossary_dict(df, target=code))
+        Returns original_english, improved_english and one result column per target.
+        """
+        result = {"original_english": source_text}
+        improved = None
+        if "nl" in targets:
+            nl = self.translate_cell(source_text, glossary_dicts.get("nl", {}), reference_examples)
+            result["improved_english"] = nl["improved_english"]
+            result["dutch_translation"] = nl["dutch_translation"]
+            if not is_failed(nl):
+                improved = nl["improved_english"]
+        if improved is None:
+            improved = self.improve_english(source_text)
+            result.setdefault("improved_english", improved)
 
-Return ONLY the Dutch translation. do not include any other text.
-"""
+        others = [code for code in targets if code != "nl"]
+        # Long texts are split as in translate_cell; every (target, piece) pair is one task
+        pieces = split_segments(improved)
+        futures = {
+            code: [
+                self._piece_pool.submit(self._translate_target, code, piece, glossary_dicts.get(code, {}))
+                for piece, _ in pieces
+            ]
+            for code in others
+        }
+        for code, piece_futures in futures.items():
+            translations = [f.result() for f in piece_futures]
+            if any(t is None for t in translations):
+                result[result_column(code)] = FAILED
+            else:
+                result[result_column(code)] = join_segments(pieces, translations)
+        return result
+
+    def translate_batch(self, texts, glossary_dict, reference_examples=""):
+        """
+        Translates several segments with one shared model call.
+        Returns results in input order (same dicts as translate_row_robust).
+
+        The per-row verify pass is skipped in batch mode; the post-processor and
+        ALL CAPS rule still apply. Segments missing from the answer, or a
+        batch answer that cannot be parsed, fall back to translate_row_robust.
+        Segments the local fast path can answer never reach the model.
+        """
+        texts = [str(t) for t in texts]
+        self._count("cells", len(texts))
+        results = [self._resolve_locally(t, glossary_dict) for t in texts]
+        remote = [i for i, r in enumerate(results) if r is None]
+        self._count("local_cells", len(texts) - len(remote))
+        translate_remote = self._translate_with_engine if self.engine is not None else self._translate_remote_batch
+        remote_results = translate_remote([texts[i] for i in remote], glossary_dict, reference_examples)
+        for i, result in zip(remote, remote_results):
+            results[i] = result
+        return results
+
+    def _translate_remote_batch(self, texts, glossary_dict, reference_examples=""):
+        if len(texts) <= 1:
+            return [
+                self.translate_row_robust(t, self.find_relevant_terms(t, glossary_dict), reference_examples)
+                for t in texts
+            ]
+
+        glossary_text = self.find_relevant_terms(
+            "\n".join(texts), glossary_dict, token_budget=DEFAULT_TERM_TOKEN_BUDGET * min(len(texts), 4)
+        )
+        masks = [mask(self.clean_text_for_prompt(t)) for t in texts]
+        segments = json.dumps(
+            [{"id": i, "text": m.text} for i, m in enumerate(masks)],
+            ensure_ascii=False, indent=0
+        )
+        by_id = {}
         try:
-            # Short pause before fallback attempt
-            time.sleep(1)
-            response = self.model.generate_content(prompt_text)
-            dutch_text = response.text.strip()
-            
-            final_dutch = self._post_process_enforcement(dutch_text, source_text)
+            response = self._generate(BATCH_TEMPLATE, glossary=glossary_text, segments=segments)
+            data = parse_complete_json(response.text)
+            for item in data.get("translations", []):
+                by_id[int(item["id"])] = item
+            self._count("batch_calls")
+        except Exception:
+            self._count("batch_fallbacks")
 
-            if source_text.isupper() and len(source_text) > 1:
-                clean_noline_source = clean_noline_source.upper()
-                final_dutch = final_dutch.upper()
-            
-            return {
+        results = []
+        for i, source_text in enumerate(texts):
+            item = by_id.get(i)
+            dutch, problems = masks[i].restore(item.get("dutch_translation") or "") if item else ("", [])
+            if not dutch or problems:
+                # Missing from the answer, or markers lost: translate this row on its own
+                results.append(self.translate_row_robust(
+                    source_text, self.find_relevant_terms(source_text, glossary_dict), reference_examples
+                ))
+                continue
+            improved, problems = masks[i].restore(item.get("improved_english") or "")
+            if not improved or problems:
+                improved = self.clean_text_for_prompt(source_text)
+            final_dutch = self._post_process_enforcement(dutch, source_text)
+            if is_all_caps(source_text):
+                improved = upper_outside_markup(improved)
+                final_dutch = upper_outside_markup(final_dutch)
+            self._count("rows")
+            self._count("batched_rows")
+            results.append({
                 "original_english": source_text,
-                "improved_english": clean_noline_source,
+                "improved_english": improved,
                 "dutch_translation": final_dutch
-            }
+            })
+        return results
+
+    def _compiled_glossary(self, glossary_dict):
+        compiled = self._glossaries.get(id(glossary_dict))
+        if compiled is None or compiled[0] is not glossary_dict:
+            compiled = self._glossaries[id(glossary_dict)] = (glossary_dict, CompiledGlossary(glossary_dict))
+        return compiled[1]
+
+    def _engine_issues(self, clean, draft, problems, glossary):
+        """
+        Why an engine draft needs a post-edit (empty list: accept it as is).
+        """
+        if not draft.strip():
+            return ["no translation"]
+        issues = []
+        if problems:
+            issues.append("lost markers: " + "; ".join(problems))
+        missing = glossary.missing_terms(clean, draft)
+        if missing:
+            issues.append("glossary terms not used: " + ", ".join(f"'{t}' -> '{tr}'" for t, tr in missing))
+        if " ".join(draft.split()) == " ".join(clean.split()) and len(re.findall(r"[A-Za-z]{2,}", clean)) >= 3:
+            issues.append("left untranslated")
+        return issues
+
+    def _translate_with_engine(self, texts, glossary_dict, reference_examples="", contexts=None):
+        """
+        Two-stage mode: one engine call for the whole batch, then an LLM
+        post-edit only for rows whose draft fails the checks (missing glossary
+        terms, lost markers, empty or untranslated). Rows the post-edit cannot
+        fix go through translate_row_robust. Same result dicts as translate_row_robust;
+        improved_english is the cleaned source unless improve_engine_rows is set.
+        contexts: surrounding text per segment (pieces of one long cell).
+        """
+        glossary = self._compiled_glossary(glossary_dict)
+        cleans = [self.clean_text_for_prompt(t) for t in texts]
+        masks = [mask(clean) for clean in cleans]
+        contexts = contexts or [""] * len(texts)
+        try:
+            # Pieces of one cell share the cell as context
+            drafts = self.engine.translate([m.text for m in masks], context=next((c for c in contexts if c), ""))
         except Exception as e:
-            # FINAL FAIL
-            error_msg = f"ERROR: {str(e)}"
-            if last_error:
-               error_msg += f" | JSON Error: {str(last_error)}"
-               
-            return {
+            if self.defer_retries and classify_error(e) == TRANSIENT:
+                self._count("deferred")
+                raise RetryLater(e)
+            self._count("engine_errors")
+            drafts = [""] * len(texts)
+
+        results = []
+        for source_text, clean, masked, draft, context in zip(texts, cleans, masks, drafts, contexts):
+            dutch, problems = masked.restore(draft)
+            issues = self._engine_issues(clean, dutch, problems, glossary)
+            if issues:
+                dutch = self._post_edit(clean, masked, draft, issues, glossary_dict, context)
+                if dutch is None:
+                    self._count("post_edit_fallbacks")
+                    results.append(self.translate_row_robust(
+                        source_text, self.find_relevant_terms(source_text, glossary_dict), reference_examples,
+                        context=context
+                    ))
+                    continue
+            self._count("rows")
+            self._count("mt_rows")
+            final_dutch = self._post_process_enforcement(dutch, source_text)
+            improved = self.improve_english(source_text) if self.improve_engine_rows else clean
+            if is_all_caps(source_text):
+                improved = upper_outside_markup(improved)
+                final_dutch = upper_outside_markup(final_dutch)
+            results.append({
                 "original_english": source_text,
-                "improved_english": error_msg[:1000],  # Limit length
-                "dutch_translation": "ERROR_FAILED"
-            }
+                "improved_english": improved,
+                "dutch_translation": final_dutch
+            })
+        return results
+
+    def _post_edit(self, clean, masked, draft, issues, glossary_dict, context=""):
+        """
+        LLM post-edit of an engine draft (masked form). Returns the restored
+        Dutch, or None when the call fails or markers are still missing.
+        """
+        try:
+            response = self._generate(
+                POST_EDIT_TEMPLATE,
+                glossary=self.find_relevant_terms(clean, glossary_dict),
+                issues="; ".join(issues),
+                context=self._format_context(context),
+                source=masked.text,
+                candidate=draft,
+            )
+            edited = response.text.strip().strip('"')
+        except Exception as e:
+            if self.defer_retries and classify_error(e) == TRANSIENT:
+                self._count("deferred")
+                raise RetryLater(e)
+            return None
+        dutch, problems = masked.restore(edited)
+        if not dutch or problems:
+            return None
+        self._count("post_edits")
+        return dutch
+
+    def run_report(self):
+        """
+        Summary of the rows translated by this backend. Parse recoveries are
+        rows that succeeded after a local JSON repair; they are not failures.
+        """
+        stats = self.stats_snapshot()
+        return {
+            "rows": stats["rows"],
+            "json_ok": stats["json_ok"],
+            "parse_recovered": stats["parse_recovered"],
+            "parse_retries": stats["parse_retries"],
+            "strategy_b": stats["strategy_b"],
+            "failed": stats["failed"],
+            "transient_errors": stats["transient_errors"],
+            "permanent_errors": stats["permanent_errors"],
+            "deferred": stats["deferred"],
+            "timeouts": self.caller.stats["timeouts"],
+            "hedges": self.caller.stats["hedges"],
+            "hedge_wins": self.caller.stats["hedge_wins"],
+            "batch_calls": stats["batch_calls"],
+            "batched_rows": stats["batched_rows"],
+            "segmented_cells": stats["segmented_cells"],
+            "memory_hits": stats["memory_hits"],
+            "cells": stats["cells"],
+            "local_cells": stats["local_cells"],
+            "fast_path": stats["fast_path"],
+            "local_pct": round(100.0 * stats["local_cells"] / stats["cells"], 1) if stats["cells"] else 0.0,
+            "improve_calls": stats["improve_calls"],
+            "target_calls": stats["target_calls"],
+            "target_failures": stats["target_failures"],
+            "marker_repairs": stats["marker_repairs"],
+            "marker_failures": stats["marker_failures"],
+            "truncations": stats["truncations"],
+            "truncation_splits": stats["truncation_splits"],
+            "mt_rows": stats["mt_rows"],
+            "post_edits": stats["post_edits"],
+            "post_edit_fallbacks": stats["post_edit_fallbacks"],
+            "engine_errors": stats["engine_errors"],
+            "engine": self.engine.report() if self.engine is not None else None,
+            # What improved_english holds for the mt_rows
+            "mt_improved_english": "improved" if self.improve_engine_rows else "cleaned source",
+        }
 
     @staticmethod
-    def build_glossary_dict(df_glossary):
+    def build_glossary_dict(df_glossary, target="nl"):
         if df_glossary is None or df_glossary.empty: return {}
         
         term_col = next((c for c in df_glossary.columns if 'term' in c.lower()), None)
-        trans_col = next((c for c in df_glossary.columns if 'translation_nl' in c.lower() or 'dutch' in c.lower()), None)
+        aliases = [glossary_column(target)] + (['dutch'] if target == "nl" else [])
+        trans_col = next((c for c in df_glossary.columns if any(a in c.lower() for a in aliases)), None)
         
         if not term_col or not trans_col:
             return {}
@@ -297,13 +731,3 @@ Return ONLY the Dutch translation. do not include any other text.
         df_clean = df_clean[df_clean[term_col] != '']
 
         return df_clean.set_index(term_col)[trans_col].to_dict()
-
-    @staticmethod
-    def find_relevant_terms(text, glossary_dict):
-        if not isinstance(text, str): return ""
-        text_lower = text.lower()
-        found = []
-        for term, trans in glossary_dict.items():
-            if str(term).lower() in text_lower:
-                found.append(f"- '{term}' -> '{trans}'")
-        return "\n".join(found[:15])
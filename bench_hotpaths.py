@@ -0,0 +1,212 @@
+"""
+Microbenchmarks for the CPU-side hot paths that run on every row.
+
+Covers find_relevant_terms, _post_process_enforcement, fix_utf8_mojibake,
+clean_text_for_prompt and build_glossary_dict, over the real glossary_data.csv /
+source_doc_data.csv and over synthetic large inputs (100k rows, 50k terms).
+
+Usage:
+    python bench_hotpaths.py                  # run and compare against the baseline
+    python bench_hotpaths.py --save-baseline  # store this run as the new baseline
+    python bench_hotpaths.py --quick          # smaller synthetic inputs
+    python bench_hotpaths.py --threshold 0.5  # fail only above +50%
+
+Exit code is 1 when any benchmark is slower than baseline * (1 + threshold),
+and 2 when there is no baseline to compare against (timings are machine
+specific, so the baseline is not committed; record it with --save-baseline).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import pandas as pd
+
+from backend import TranslatorBackend
+
+BASELINE_FILE = "bench_baseline.json"
+RESULTS_FILE = "bench_results.json"
+GLOSSARY_FILE = "glossary_data.csv"
+SOURCE_FILE = "source_doc_data.csv"
+
+MOJIBAKE_SAMPLES = ["Ã¢â‚¬Â¢", "â€™", "Ã©", "â€œ", "â€“"]
+
+
+def load_real_data():
+    df_glossary = pd.read_csv(GLOSSARY_FILE)
+    df_doc = pd.read_csv(SOURCE_FILE)
+    source_col = next((c for c in df_doc.columns if 'source' in c.lower() or 'en_us' in c.lower()), df_doc.columns[0])
+    target_col = next((c for c in df_doc.columns if c != source_col), source_col)
+    rows = df_doc[source_col].dropna().astype(str).tolist()
+    dutch = df_doc[target_col].fillna("").astype(str).tolist()
+    return df_glossary, rows, dutch
+
+
+def make_synthetic_rows(real_rows, n, seed=42):
+    """
+    Builds n rows by recombining real source rows, with some mojibake
+    and newlines sprinkled in so the cleaning paths have work to do.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        text = rng.choice(real_rows)
+        if i % 7 == 0:
+            text = text + " " + rng.choice(MOJIBAKE_SAMPLES) + " " + rng.choice(real_rows)
+        if i % 5 == 0:
+            text = text.replace(". ", ".\n", 1)
+        rows.append(text)
+    return rows
+
+
+def make_synthetic_glossary(df_glossary, n, seed=42):
+    """
+    Builds an n-term glossary DataFrame in the same shape as glossary_data.csv.
+    """
+    rng = random.Random(seed)
+    terms = df_glossary["term"].dropna().astype(str).tolist()
+    trans = df_glossary["translation_nl"].fillna("").astype(str).tolist()
+    records = []
+    for i in range(n):
+        j = rng.randrange(len(terms))
+        suffix = "" if i < len(terms) else f" {i}"
+        records.append({
+            "term": terms[j] + suffix,
+            "pos": "noun",
+            "notes": "",
+            "is_case_sensitive": False,
+            "translation_nl": trans[j] + suffix,
+        })
+    return pd.DataFrame(records)
+
+
+def time_call(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def build_cases(backend, quick=False):
+    """
+    Returns a list of (name, callable) pairs. Each callable runs one full pass
+    of a hot path over its input set.
+    """
+    df_glossary, rows, dutch = load_real_data()
+    n_rows = 10_000 if quick else 100_000
+    n_terms = 5_000 if quick else 50_000
+    # find_relevant_terms is rows x terms, so the synthetic pass uses a row sample
+    n_lookup_rows = 100 if quick else 500
+
+    synthetic_rows = make_synthetic_rows(rows, n_rows)
+    synthetic_dutch = make_synthetic_rows(dutch, n_rows)
+    df_big_glossary = make_synthetic_glossary(df_glossary, n_terms)
+
+    glossary_dict = backend.build_glossary_dict(df_glossary)
+    big_glossary_dict = backend.build_glossary_dict(df_big_glossary)
+    lookup_rows = synthetic_rows[:n_lookup_rows]
+
+    cases = [
+        ("fix_utf8_mojibake[real]", lambda: [backend.fix_utf8_mojibake(t) for t in rows]),
+        (f"fix_utf8_mojibake[{n_rows}]", lambda: [backend.fix_utf8_mojibake(t) for t in synthetic_rows]),
+        ("clean_text_for_prompt[real]", lambda: [backend.clean_text_for_prompt(t) for t in rows]),
+        (f"clean_text_for_prompt[{n_rows}]", lambda: [backend.clean_text_for_prompt(t) for t in synthetic_rows]),
+        ("_post_process_enforcement[real]", lambda: [backend._post_process_enforcement(d, s) for d, s in zip(dutch, rows)]),
+        (f"_post_process_enforcement[{n_rows}]", lambda: [backend._post_process_enforcement(d, s) for d, s in zip(synthetic_dutch, synthetic_rows)]),
+        ("build_glossary_dict[real]", lambda: backend.build_glossary_dict(df_glossary)),
+        (f"build_glossary_dict[{n_terms}]", lambda: backend.build_glossary_dict(df_big_glossary)),
+        ("find_relevant_terms[real]", lambda: [backend.find_relevant_terms(t, glossary_dict) for t in rows]),
+        (f"find_relevant_terms[{n_lookup_rows}x{n_terms}]", lambda: [backend.find_relevant_terms(t, big_glossary_dict) for t in lookup_rows]),
+    ]
+    return cases
+
+
+def run_benchmarks(quick=False, repeat=5):
+    backend = TranslatorBackend("benchmark")
+    results = {}
+    for name, fn in build_cases(backend, quick=quick):
+        fn()  # warm-up (regex cache, lazy pandas paths)
+        timings = time_call(fn, repeat)
+        results[name] = {
+            "median_ms": round(statistics.median(timings) * 1000, 3),
+            "min_ms": round(min(timings) * 1000, 3),
+            "repeat": repeat,
+        }
+        print(f"  {name:<45} median {results[name]['median_ms']:>10.2f} ms   min {results[name]['min_ms']:>10.2f} ms")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the list of benchmark names slower than baseline * (1 + threshold).
+    Benchmarks missing from the baseline are reported but never fail.
+    """
+    regressions = []
+    print("\nComparison against baseline:")
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"  {name:<45} (no baseline)")
+            continue
+        ratio = res["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  <-- REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<45} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-row hot paths.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = +25%%).")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark.")
+    parser.add_argument("--quick", action="store_true", help="Use smaller synthetic inputs.")
+    args = parser.parse_args()
+
+    if not args.save_baseline and not os.path.exists(args.baseline):
+        # Without a baseline there is nothing to compare; do not pass silently
+        print(f"No baseline at {args.baseline}; record one on the base branch with --save-baseline.")
+        return 2
+
+    print(f"--- Hot path benchmarks ({'quick' if args.quick else 'full'}) ---")
+    results = run_benchmarks(quick=args.quick, repeat=args.repeat)
+    report = {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results,
+    }
+    with open(RESULTS_FILE, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("quick") != args.quick:
+        print("Warning: baseline was recorded with a different --quick setting.")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} hot path(s) regressed past +{args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\n✅ No hot path regressed past +{args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
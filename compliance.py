@@ -0,0 +1,127 @@
+"""
+Glossary compliance scanner for finished results.
+
+A row complies when every glossary term found in its English source has the
+glossary translation somewhere in the Dutch output. The glossary is compiled
+once into an index keyed by each term's first word, so a scan looks up the
+words of a row instead of testing every term against it, and thousands of
+rows take milliseconds. Terms match on word boundaries ("LED" is not in
+"enabled"); the translation may sit inside a Dutch compound ("camera" in
+"camerabeelden").
+"""
+import re
+
+TERM_REPAIR_BATCH = 10
+
+
+def _usable(translation):
+    return isinstance(translation, str) and translation.strip() and translation.strip().lower() != "nan"
+
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _first_token(term_lower):
+    match = _TOKEN_RE.match(term_lower)
+    return match.group(0) if match else term_lower[:1]
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _normalise(text):
+    return " ".join(str(text).split()).lower()
+
+
+class CompiledGlossary:
+    """
+    Term index for fast lookups. Case variants of a term: the variant written
+    exactly as in the source wins, otherwise the first one listed. Where terms
+    overlap, the longest one at the leftmost position is used ("Driver•i app"
+    rather than "app").
+    """
+    def __init__(self, glossary_dict):
+        self.exact = {}
+        self.by_lower = {}
+        for term, translation in (glossary_dict or {}).items():
+            term = " ".join(str(term).split())
+            if not term or not _usable(translation):
+                continue
+            self.exact[term] = translation.strip()
+            self.by_lower.setdefault(term.lower(), (term, translation.strip()))
+        # first word (or first character) -> terms starting with it, longest first
+        self.by_first = {}
+        for term_lower in sorted(self.by_lower, key=len, reverse=True):
+            self.by_first.setdefault(_first_token(term_lower), []).append(term_lower)
+
+    def terms_in(self, text):
+        """
+        Distinct (term, translation) pairs whose term occurs in `text`.
+        """
+        if not self.by_first or not isinstance(text, str):
+            return []
+        text = " ".join(text.split())
+        lower = text.lower()
+        found = {}
+        end = 0
+        for token in _TOKEN_RE.finditer(lower):
+            start = token.start()
+            if start < end:
+                continue
+            for term_lower in self.by_first.get(token.group(0), ()):
+                stop = start + len(term_lower)
+                if not lower.startswith(term_lower, start):
+                    continue
+                if stop < len(lower) and _is_word(lower[stop]) and _is_word(lower[stop - 1]):
+                    # "LED" at the start of "ledger"
+                    continue
+                if term_lower not in found:
+                    exact = text[start:stop]
+                    found[term_lower] = (exact, self.exact[exact]) if exact in self.exact else self.by_lower[term_lower]
+                end = stop
+                break
+        return list(found.values())
+
+    def missing_terms(self, source, translation):
+        """
+        Glossary pairs used in `source` whose translation is absent from `translation`.
+        """
+        target = _normalise(translation) if isinstance(translation, str) else ""
+        return [(term, trans) for term, trans in self.terms_in(source) if _normalise(trans) not in target]
+
+
+def scan(sources, translations, glossary):
+    """
+    Returns {row index: [(term, translation), ...]} for non-compliant rows,
+    plus a report dict. `glossary` is a CompiledGlossary or a glossary dict.
+    Rows without a translation (empty or failed) are skipped.
+    """
+    if not isinstance(glossary, CompiledGlossary):
+        glossary = CompiledGlossary(glossary)
+    violations = {}
+    report = {"rows": 0, "rows_with_terms": 0, "term_uses": 0, "missing_terms": 0, "violations": 0}
+    for index, (source, translation) in enumerate(zip(sources, translations)):
+        if not isinstance(translation, str) or not translation.strip() or translation.startswith("ERROR"):
+            continue
+        report["rows"] += 1
+        used = glossary.terms_in(source)
+        if not used:
+            continue
+        report["rows_with_terms"] += 1
+        report["term_uses"] += len(used)
+        missing = glossary.missing_terms(source, translation)
+        if missing:
+            violations[index] = missing
+            report["missing_terms"] += len(missing)
+    report["violations"] = len(violations)
+    uses = report["term_uses"]
+    report["compliance_pct"] = round(100.0 * (uses - report["missing_terms"]) / uses, 1) if uses else 100.0
+    return violations, report
+
+
+def format_report(report):
+    return (
+        f"{report['compliance_pct']}% of glossary term uses translated as listed "
+        f"({report['missing_terms']} missing in {report['violations']} of {report['rows_with_terms']} rows with terms)"
+    )
@@ -0,0 +1,79 @@
+"""
+Shared pytest helpers: a local stand-in for genai.GenerativeModel so backend
+code can be exercised without an API key or network access.
+"""
+import json
+
+import pytest
+
+from backend import TranslatorBackend
+
+
+class FakeCandidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+
+
+class FakeResponse:
+    def __init__(self, text, finish_reason="STOP"):
+        self.text = text
+        self.parts = [text] if text else []
+        self.candidates = [FakeCandidate(finish_reason)]
+
+
+class FakeModel:
+    """
+    Mimics GenerativeModel.generate_content. `responder(prompt, model)` returns
+    the response text; every request is recorded with its size.
+    """
+    def __init__(self, system_instruction, responder, log):
+        self.system_instruction = system_instruction
+        self.responder = responder
+        self.log = log
+
+    def generate_content(self, contents, **kwargs):
+        self.log.append({
+            "system": self.system_instruction,
+            "prompt": contents,
+            "prompt_chars": len(contents),
+            "kwargs": kwargs,
+        })
+        result = self.responder(contents, self)
+        if isinstance(result, Exception):
+            raise result
+        if isinstance(result, FakeResponse):
+            return result
+        return FakeResponse(result)
+
+
+def default_responder(prompt, model):
+    if model.system_instruction.startswith("You are an expert"):
+        return json.dumps({
+            "original_english": "x",
+            "improved_english": "Improved text",
+            "dutch_translation": "Vertaalde tekst",
+        })
+    # verify / fallback prompts: echo a fixed Dutch string
+    return "Vertaalde tekst"
+
+
+class FakeModelFactory:
+    def __init__(self, responder=default_responder):
+        self.responder = responder
+        self.log = []
+        self.created = []
+
+    def __call__(self, system_instruction, **kwargs):
+        model = FakeModel(system_instruction, self.responder, self.log)
+        self.created.append(model)
+        return model
+
+
+@pytest.fixture
+def fake_factory():
+    return FakeModelFactory()
+
+
+@pytest.fixture
+def fake_backend(fake_factory):
+    return TranslatorBackend("test-key", model_factory=fake_factory)
@@ -0,0 +1,196 @@
+"""
+Machine translation engines behind one interface.
+
+An engine takes a batch of segments and returns one translation per segment,
+in order. TranslatorBackend(engine=...) uses it for a cheap first pass and
+sends only the rows that fail the glossary or rule checks to the LLM for a
+post-edit (see TranslatorBackend._translate_with_engine). Every engine meters
+its own calls, characters and busy time, so runs can compare throughput and
+cost per engine.
+
+Engines receive masked text (markup and names as ⟦n⟧ markers) and no
+glossary; glossary compliance is checked afterwards.
+"""
+import json
+import threading
+import time
+from collections import Counter
+
+from glossary import estimate_tokens
+
+# USD per million characters (API_COST_COMPARISON.md)
+ENGINE_PRICES = {"azure": 10.0, "amazon": 15.0, "google": 20.0, "deepl": 25.0}
+
+
+class MTEngine:
+    """
+    Base class. Subclasses implement _translate(segments, target, context) and set
+    `name` and `price_per_m_chars` (or override cost()).
+    """
+    name = "engine"
+    price_per_m_chars = 0.0
+
+    def __init__(self):
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def translate(self, segments, target="nl", context=""):
+        """
+        Returns one translation per segment. `context` is surrounding text
+        the segments belong to (not translated; engines may ignore it).
+        Raises when the engine fails or answers with the wrong number of
+        translations.
+        """
+        segments = list(segments)
+        if not segments:
+            return []
+        start = time.perf_counter()
+        try:
+            translations = self._translate(segments, target, context)
+            if len(translations) != len(segments):
+                raise ValueError(f"{self.name}: {len(translations)} translations for {len(segments)} segments")
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["segments"] += len(segments)
+            self.stats["chars"] += sum(len(s) for s in segments)
+            self.stats["seconds"] += time.perf_counter() - start
+        return translations
+
+    def _translate(self, segments, target, context):
+        raise NotImplementedError
+
+    def cost(self):
+        return self.stats["chars"] / 1e6 * self.price_per_m_chars
+
+    def report(self):
+        seconds = self.stats["seconds"]
+        return {
+            "engine": self.name,
+            "calls": self.stats["calls"],
+            "segments": self.stats["segments"],
+            "chars": self.stats["chars"],
+            "errors": self.stats["errors"],
+            "seconds": round(seconds, 2),
+            "segments_per_second": round(self.stats["segments"] / seconds, 1) if seconds else 0.0,
+            "cost_usd": round(self.cost(), 4),
+        }
+
+
+class LocalEngine(MTEngine):
+    """
+    Offline stand-in: answers from a lookup table (source -> translation,
+    whitespace-insensitive), e.g. a loaded TMX. Unknown segments come back
+    unchanged, which the post-edit checks treat as untranslated.
+    `latency` seconds are slept per call to mimic a remote engine.
+    """
+    name = "local"
+
+    def __init__(self, table=None, latency=0.0):
+        super().__init__()
+        self.table = {" ".join(str(k).split()): v for k, v in (table or {}).items()}
+        self.latency = latency
+
+    def _translate(self, segments, target, context):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self.table.get(" ".join(s.split()), s) for s in segments]
+
+
+class DeepLEngine(MTEngine):
+    """
+    DeepL API v2. Free-tier keys (ending in ":fx") use the free endpoint.
+    """
+    name = "deepl"
+    price_per_m_chars = ENGINE_PRICES["deepl"]
+    MAX_TEXTS = 50  # per request, API limit
+
+    def __init__(self, auth_key, timeout=30):
+        super().__init__()
+        self.auth_key = auth_key
+        self.timeout = timeout
+        host = "api-free.deepl.com" if auth_key.endswith(":fx") else "api.deepl.com"
+        self.url = f"https://{host}/v2/translate"
+
+    def _translate(self, segments, target, context):
+        import requests
+
+        translations = []
+        for start in range(0, len(segments), self.MAX_TEXTS):
+            payload = {"text": segments[start:start + self.MAX_TEXTS], "source_lang": "EN", "target_lang": target.upper()}
+            if context:
+                # Influences the translation, is not translated or billed
+                payload["context"] = context
+            response = requests.post(
+                self.url,
+                headers={"Authorization": f"DeepL-Auth-Key {self.auth_key}"},
+                json=payload,
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            translations.extend(t["text"] for t in response.json()["translations"])
+        return translations
+
+
+class GeminiEngine(MTEngine):
+    """
+    Gemini as a bulk engine: one batch call per batch (BATCH_TEMPLATE), no
+    verify pass. Dutch only. Priced per token, from the response's usage
+    metadata when present and from estimate_tokens otherwise.
+    """
+    name = "gemini"
+
+    def __init__(self, backend):
+        super().__init__()
+        self.backend = backend
+
+    def _translate(self, segments, target, context):
+        # BATCH_TEMPLATE has no context slot; the post-edit still gets it
+        from backend import BATCH_TEMPLATE
+        from json_recovery import parse_complete_json
+
+        if target != "nl":
+            raise ValueError("The Gemini engine translates to Dutch only")
+        payload = json.dumps([{"id": i, "text": s} for i, s in enumerate(segments)], ensure_ascii=False, indent=0)
+        response = self.backend._generate(BATCH_TEMPLATE, glossary="", segments=payload)
+        usage = getattr(response, "usage_metadata", None)
+        with self._lock:
+            self.stats["input_tokens"] += (
+                getattr(usage, "prompt_token_count", 0) or estimate_tokens(BATCH_TEMPLATE.system + payload)
+            )
+            self.stats["output_tokens"] += getattr(usage, "candidates_token_count", 0) or estimate_tokens(response.text)
+        data = parse_complete_json(response.text)
+        by_id = {int(item["id"]): item.get("dutch_translation") or "" for item in data.get("translations", [])}
+        return [by_id.get(i, "") for i in range(len(segments))]
+
+    def cost(self):
+        from estimator import PRICE_PER_M_INPUT, PRICE_PER_M_OUTPUT
+
+        return (self.stats["input_tokens"] / 1e6 * PRICE_PER_M_INPUT
+                + self.stats["output_tokens"] / 1e6 * PRICE_PER_M_OUTPUT)
+
+
+def make_engine(name, backend=None, auth_key=None):
+    """
+    Engine by name: "deepl" (needs auth_key), "gemini" (needs backend) or "local".
+    """
+    if name == "deepl":
+        if not auth_key:
+            raise ValueError("The DeepL engine needs an API key (DEEPL_AUTH_KEY)")
+        return DeepLEngine(auth_key)
+    if name == "gemini":
+        return GeminiEngine(backend)
+    if name == "local":
+        return LocalEngine()
+    raise KeyError(f"Unknown engine '{name}'")
+
+
+def format_engine_report(report):
+    return (
+        f"{report['engine']}: {report['segments']} segments in {report['calls']} calls, "
+        f"{report['segments_per_second']} segments/s, ${report['cost_usd']:.4f}"
+        + (f", {report['errors']} failed calls" if report["errors"] else "")
+    )
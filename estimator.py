@@ -0,0 +1,203 @@
+"""
+Dry-run estimate of a translation run: model calls, tokens, cost and wall time.
+
+Walks the source the way the pipeline does (clean, segment, local fast path,
+translation memory, repeated segments) and renders the real prompt templates
+for every segment that would reach the model, without making a network call.
+Token counts use glossary.estimate_tokens (~4 characters per token), so the
+numbers are planning figures, not a bill.
+"""
+from fastpath import FastPath
+from glossary import estimate_tokens
+from memory import TranslationMemory
+from scheduler import longest_first, makespan
+from segmenter import needs_context, split_segments
+
+# Gemini 2.5 Flash, paid tier (USD per million tokens). Thinking tokens are not included.
+PRICE_PER_M_INPUT = 0.30
+PRICE_PER_M_OUTPUT = 2.50
+
+# Default rate limits for the model (requests and tokens per minute)
+DEFAULT_RPM = 1000
+DEFAULT_TPM = 1_000_000
+
+# Latency model for one call: fixed floor plus generation speed
+CALL_LATENCY = 1.0
+OUTPUT_TOKENS_PER_SECOND = 200.0
+
+# Piece pool of a segmented cell (TranslatorBackend._piece_pool)
+PIECE_WORKERS = 4
+
+# The JSON answer repeats the text three times (original, improved, Dutch);
+# Dutch runs ~10% longer than English. The verify pass returns the Dutch once.
+JSON_OUTPUT_FACTOR = 3.3
+# Without the original_english echo: improved English plus Dutch
+JSON_NO_ECHO_OUTPUT_FACTOR = 2.2
+JSON_OUTPUT_OVERHEAD = 25
+VERIFY_OUTPUT_FACTOR = 1.15
+
+# max_output_tokens per call. The floor is the old fixed setting, so short
+# segments behave as before (thinking tokens count against it too); long ones
+# get their expected answer size with headroom, up to the model limit.
+MIN_OUTPUT_TOKENS = 1024
+MAX_OUTPUT_TOKENS = 8192
+OUTPUT_HEADROOM = 1.5
+
+# template name -> (field the answer is produced from, output factor, overhead)
+OUTPUT_SIZES = {
+    "translate_json": ("source", JSON_OUTPUT_FACTOR, JSON_OUTPUT_OVERHEAD),
+    "translate_json_no_echo": ("source", JSON_NO_ECHO_OUTPUT_FACTOR, JSON_OUTPUT_OVERHEAD),
+    "translate_batch": ("segments", JSON_NO_ECHO_OUTPUT_FACTOR, JSON_OUTPUT_OVERHEAD),
+    "verify": ("candidate", 1.0, 10),
+    "repair_markers": ("candidate", 1.0, 10),
+    "repair_terms": ("rows", 1.0, JSON_OUTPUT_OVERHEAD),
+    "improve_english": ("source", 1.0, 10),
+}
+DEFAULT_OUTPUT_SIZE = ("source", VERIFY_OUTPUT_FACTOR, 10)
+
+
+def output_budget(template_name, values):
+    """
+    max_output_tokens for one call of a template, from the size of the
+    text its answer is produced from (`values` as passed to render()).
+    """
+    field, factor, overhead = OUTPUT_SIZES.get(template_name, DEFAULT_OUTPUT_SIZE)
+    expected = estimate_tokens(str(values.get(field) or "")) * factor + overhead
+    return int(min(MAX_OUTPUT_TOKENS, max(MIN_OUTPUT_TOKENS, expected * OUTPUT_HEADROOM)))
+
+
+class Estimator:
+    """
+    Built from the pipeline's own pieces so the estimate follows the prompts
+    that would really be sent:
+
+    clean:           text cleaner (clean_text_for_prompt)
+    find_terms:      glossary selection (find_relevant_terms)
+    json_template / verify_template: the PromptTemplates of the two calls per segment
+    """
+    def __init__(self, clean, find_terms, json_template, verify_template):
+        self.clean = clean
+        self.find_terms = find_terms
+        self.json_template = json_template
+        self.verify_template = verify_template
+
+    @classmethod
+    def for_backend(cls, backend):
+        from backend import VERIFY_TEMPLATE
+
+        return cls(backend.clean_text_for_prompt, backend.find_relevant_terms, backend.json_template, VERIFY_TEMPLATE)
+
+    def _segment_calls(self, piece, glossary_dict, reference_examples, context):
+        """
+        Returns [(input_tokens, output_tokens), ...] for the JSON and verify calls.
+        """
+        piece_tokens = estimate_tokens(piece)
+        json_prompt = self.json_template.render_full(
+            glossary=self.find_terms(piece, glossary_dict),
+            examples=reference_examples,
+            context=f"\nCONTEXT:\n{context[:1500]}\n" if context else "",
+            source=piece,
+        )
+        _, factor, overhead = OUTPUT_SIZES.get(self.json_template.name, OUTPUT_SIZES["translate_json"])
+        json_out = int(piece_tokens * factor) + overhead
+        verify_out = int(piece_tokens * VERIFY_OUTPUT_FACTOR) + 1
+        # The candidate is the Dutch the first call produced; a placeholder of the same size stands in
+        verify_prompt = self.verify_template.render_full(source=piece, candidate="x" * (verify_out * 4))
+        return [
+            (estimate_tokens(json_prompt), json_out),
+            (estimate_tokens(verify_prompt), verify_out),
+        ]
+
+    def estimate(self, texts, glossary_dict, reference_examples="", memory=None,
+                 concurrency=1, row_pause=0.0, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        """
+        texts:       source cells in job order
+        memory:      a TranslationMemory whose entries count as already translated
+        concurrency: rows translated at the same time; row_pause: sleep after each row
+        Returns a dict of counts, tokens, cost_usd and wall_seconds.
+        """
+        fast_path = FastPath(glossary_dict)
+        seen = set()
+        counts = dict(cells=0, empty_cells=0, segments=0, unique_segments=0, repeats=0,
+                      memory_hits=0, fast_path=0, model_segments=0, model_calls=0)
+        input_tokens = output_tokens = 0
+        cell_seconds = []
+
+        for text in texts:
+            if not isinstance(text, str) or not text.strip():
+                counts["empty_cells"] += 1
+                continue
+            counts["cells"] += 1
+            pieces = split_segments(text)
+            whole_context = self.clean(text) if len(pieces) > 1 else ""
+            piece_seconds = []
+            for piece, _ in pieces:
+                counts["segments"] += 1
+                context = whole_context if whole_context and needs_context(piece) else ""
+                clean = self.clean(piece)
+                key = TranslationMemory.key(clean, context)
+                if key in seen:
+                    counts["repeats"] += 1
+                    continue
+                seen.add(key)
+                counts["unique_segments"] += 1
+                if fast_path.classify(clean):
+                    counts["fast_path"] += 1
+                    continue
+                if memory is not None and memory.get(piece, context) is not None:
+                    counts["memory_hits"] += 1
+                    continue
+                counts["model_segments"] += 1
+                seconds = 0.0
+                for call_in, call_out in self._segment_calls(clean, glossary_dict, reference_examples, context):
+                    counts["model_calls"] += 1
+                    input_tokens += call_in
+                    output_tokens += call_out
+                    seconds += CALL_LATENCY + call_out / OUTPUT_TOKENS_PER_SECOND
+                piece_seconds.append(seconds)
+            cell_seconds.append(makespan(piece_seconds, PIECE_WORKERS) + row_pause if piece_seconds else row_pause)
+
+        work_seconds = makespan(cell_seconds, concurrency, longest_first(cell_seconds))
+        # Whichever limit binds: worker time, requests per minute, or tokens per minute
+        rate_seconds = max(
+            60.0 * counts["model_calls"] / rpm if rpm else 0.0,
+            60.0 * (input_tokens + output_tokens) / tpm if tpm else 0.0,
+        )
+        cost = input_tokens / 1e6 * PRICE_PER_M_INPUT + output_tokens / 1e6 * PRICE_PER_M_OUTPUT
+        return {
+            **counts,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": round(cost, 4),
+            "wall_seconds": round(max(work_seconds, rate_seconds), 1),
+            "bound": "rate limit" if rate_seconds > work_seconds else "latency",
+            "concurrency": concurrency,
+        }
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {seconds:02d}s"
+    return f"{seconds}s"
+
+
+def format_estimate(est):
+    """
+    Report lines for the CLI and the app.
+    """
+    return [
+        f"Cells:                  {est['cells']} (+{est['empty_cells']} empty)",
+        f"Segments:               {est['segments']} ({est['unique_segments']} unique, {est['repeats']} repeats)",
+        f"  Fast path:            {est['fast_path']}",
+        f"  Memory hits:          {est['memory_hits']}",
+        f"  Sent to the model:    {est['model_segments']} ({est['model_calls']} calls)",
+        f"Tokens:                 {est['input_tokens']:,} prompt / {est['output_tokens']:,} output",
+        f"Estimated cost:         ${est['cost_usd']:.2f}",
+        f"Estimated wall time:    {format_duration(est['wall_seconds'])} "
+        f"at concurrency {est['concurrency']} ({est['bound']} bound)",
+    ]
@@ -0,0 +1,154 @@
+"""
+Export formats for translation results (CSV / Excel / XLIFF / TMX).
+
+ExportCache builds export bytes only when a download is requested and keeps
+them keyed by a hash of the result set and the format, so reruns of the app
+do not rebuild a workbook nobody asked for. Autosaved job files that are
+still unchanged on disk are served as they are.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from languages import TARGET_LANGUAGES, result_column
+from tmx import write_results as write_tmx
+
+RESULT_COLUMNS = ["original_english", "improved_english", "dutch_translation"]
+
+
+def _xml_escape(value):
+    return str(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def generate_xliff(df, target_language="nl", target_column="dutch_translation"):
+    xliff = ['<?xml version="1.0" encoding="UTF-8"?>']
+    xliff.append('<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">')
+    xliff.append(f'  <file source-language="en" target-language="{target_language}" datatype="plaintext" original="translation_job">')
+    xliff.append('    <body>')
+    for i, r in df.iterrows():
+        src = _xml_escape(r.get("original_english", ""))
+        tgt = _xml_escape(r.get(target_column, ""))
+        xliff.append(f'      <trans-unit id="{i+1}">')
+        xliff.append(f'        <source>{src}</source>')
+        xliff.append(f'        <target>{tgt}</target>')
+        xliff.append('      </trans-unit>')
+    xliff.append('    </body>')
+    xliff.append('  </file>')
+    xliff.append('</xliff>')
+    return "\n".join(xliff)
+
+
+def generate_csv_bytes(df):
+    # BOM so Excel opens UTF-8 correctly
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+
+def generate_excel_bytes(df):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Translations')
+    return output.getvalue()
+
+
+def generate_xliff_bytes(df):
+    return generate_xliff(df).encode("utf-8")
+
+
+def generate_tmx_bytes(df):
+    output = io.StringIO()
+    write_tmx(output, df)
+    return output.getvalue().encode("utf-8")
+
+
+# format -> (generator, file extension, mime type)
+EXPORT_FORMATS = {
+    "csv": (generate_csv_bytes, "csv", "text/csv"),
+    "xlsx": (generate_excel_bytes, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "xlf": (generate_xliff_bytes, "xlf", "application/x-xliff+xml"),
+    "tmx": (generate_tmx_bytes, "tmx", "application/x-tmx+xml"),
+}
+
+
+def export_format(fmt):
+    """
+    (generator, extension, mime) for a format key. Besides the keys of
+    EXPORT_FORMATS, "xlf_<code>" is the XLIFF file of one target language.
+    """
+    if fmt in EXPORT_FORMATS:
+        return EXPORT_FORMATS[fmt]
+    code = fmt[len("xlf_"):] if fmt.startswith("xlf_") else None
+    if code not in TARGET_LANGUAGES:
+        raise KeyError(f"Unknown export format '{fmt}'")
+    generator = lambda df: generate_xliff(df, code, result_column(code)).encode("utf-8")
+    return generator, "xlf", EXPORT_FORMATS["xlf"][2]
+
+
+def result_fingerprint(df):
+    """
+    Content hash of a result frame (column names and cell values, not the index).
+    """
+    h = hashlib.sha1("|".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df.astype(str), index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ExportCache:
+    """
+    Export bytes keyed by (fingerprint, format), generated on first request.
+    Files registered with register_files() are read from disk instead, as
+    long as their size and modification time are what they were when the job
+    wrote them.
+    """
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "files": 0, "generated": 0}
+        self._entries = OrderedDict()
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def register_files(self, fingerprint, outputs):
+        """
+        outputs: {format: path} of files that hold exactly this result set.
+        """
+        with self._lock:
+            for fmt, path in outputs.items():
+                if (fmt in EXPORT_FORMATS or fmt.startswith("xlf_")) and os.path.exists(path):
+                    self._files[(fingerprint, fmt)] = (path, file_signature(path))
+
+    def get(self, df, fmt, fingerprint=None):
+        key = (fingerprint or result_fingerprint(df), fmt)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+            registered = self._files.get(key)
+
+        data = None
+        if registered is not None:
+            path, signature = registered
+            try:
+                if file_signature(path) == signature:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    self.stats["files"] += 1
+            except OSError:
+                pass
+        if data is None:
+            data = export_format(fmt)[0](df)
+            self.stats["generated"] += 1
+
+        with self._lock:
+            self._entries[key] = data
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
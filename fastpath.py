@@ -0,0 +1,94 @@
+"""
+Local fast path for segments that do not need the model.
+
+Numbers, version strings, URLs, e-mail addresses, placeholders, brand-only
+strings and cells that are exactly a glossary term are resolved here instead
+of costing a JSON call plus a verify call. Casing follows the same rules as
+the post-processor: ALL CAPS sources give ALL CAPS output, and the first
+letter mirrors the source.
+"""
+import re
+
+from masking import is_all_caps, mask
+
+_MARKER_RE = re.compile(r"⟦\d+⟧")
+# Whole numbers, times, ranges, fractions and percentages: "12", "12:30", "3/4", "10 %"
+_NUMBER_RE = re.compile(r"[+-]?\d+(?:\s?[:/x×–-]\s?\d+)*\s?%?")
+# Decimals are left to the model: 1.5 must become 1,5 in Dutch
+_DECIMAL_RE = re.compile(r"\d[.,]\d")
+# "v2.1", "2.1.0"; a bare "1.5" is a decimal, not a version
+_VERSION_RE = re.compile(r"(?:[vV]\d+(?:\.\d+){1,3}|\d+(?:\.\d+){2,3})(?:[-+][\w.]+)?")
+
+
+def _normalise(text):
+    return " ".join(str(text).split())
+
+
+def match_casing(translation, source):
+    """
+    ALL CAPS source -> ALL CAPS translation; otherwise the first letter
+    follows the source ("settings" -> "instellingen", "Settings" -> "Instellingen").
+    """
+    if is_all_caps(source):
+        return translation.upper()
+    if not translation or not source:
+        return translation
+    if source[0].islower():
+        return translation[0].lower() + translation[1:]
+    if source[0].isupper():
+        return translation[0].upper() + translation[1:]
+    return translation
+
+
+class FastPath:
+    """
+    Resolves segments locally. Built once per glossary dict.
+    """
+    def __init__(self, glossary_dict):
+        self.glossary_dict = glossary_dict
+        self._exact = {}
+        self._terms = {}
+        for term, translation in (glossary_dict or {}).items():
+            if not isinstance(translation, str) or not translation.strip() or translation.lower() == "nan":
+                continue
+            term = _normalise(term)
+            self._exact[term] = translation.strip()
+            # Case variants of a term: the first one listed answers case-insensitive lookups
+            self._terms.setdefault(term.lower(), translation.strip())
+
+    def classify(self, text):
+        """
+        Returns the reason a segment can be resolved locally, or None.
+        """
+        if not isinstance(text, str):
+            return None
+        clean = _normalise(text)
+        if not clean:
+            return None
+        if clean.lower() in self._terms:
+            return "glossary"
+        if _VERSION_RE.fullmatch(clean):
+            return "version"
+        if _NUMBER_RE.fullmatch(clean):
+            return "number"
+        # Nothing left to translate once markup, URLs, e-mails and brands are masked
+        rest = _MARKER_RE.sub("", mask(clean).text)
+        if not any(ch.isalpha() for ch in rest) and not _DECIMAL_RE.search(rest):
+            return "markup"
+        return None
+
+    def resolve(self, text):
+        """
+        Returns (dutch, reason) for a locally resolvable segment, else None.
+        """
+        reason = self.classify(text)
+        if reason is None:
+            return None
+        clean = _normalise(text)
+        if reason == "glossary":
+            if clean in self._exact:
+                # Exact match: the glossary casing is authoritative
+                translation = self._exact[clean]
+                return (translation.upper() if is_all_caps(clean) else translation), reason
+            return match_casing(self._terms[clean.lower()], clean), reason
+        return clean, reason
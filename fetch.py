@@ -0,0 +1,114 @@
+"""
+Conditional download of the Google Sheets CSV exports, with a local cache.
+
+Each source keeps a small metadata file (ETag, Last-Modified, SHA-256 of the
+CSV) and a pickled DataFrame snapshot in the cache directory. A refresh sends
+a conditional request; when the server answers 304, or the body hashes to the
+same content as last time, the snapshot is loaded instead of re-parsing the
+CSV. Without network the snapshot (or the old local CSV) is used.
+"""
+import hashlib
+import io
+import json
+import os
+
+CACHE_DIR = ".fetch_cache"
+
+NOT_MODIFIED = "not_modified"   # 304 from the server
+UNCHANGED = "unchanged"         # 200, but same content hash as the snapshot
+UPDATED = "updated"             # new content, parsed and cached
+OFFLINE = "offline"             # request failed, cached data used
+
+
+def _paths(filename, cache_dir):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return (
+        os.path.join(cache_dir, f"{name}.meta.json"),
+        os.path.join(cache_dir, f"{name}.pkl"),
+    )
+
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _load_snapshot(snapshot_path):
+    import pandas as pd
+
+    try:
+        return pd.read_pickle(snapshot_path)
+    except Exception:
+        return None
+
+
+def fetch_csv(url, filename, cache_dir=CACHE_DIR, timeout=10, offline=False):
+    """
+    Returns (DataFrame, status). `filename` is the CSV copy kept next to the
+    script, as before; it is only rewritten when the content changed.
+    With offline=True no request is made: the snapshot (or the local CSV) is used.
+    """
+    import pandas as pd
+    import requests
+
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path, snapshot_path = _paths(filename, cache_dir)
+    if offline:
+        df = _load_snapshot(snapshot_path)
+        if df is None:
+            df = pd.read_csv(filename)
+        return df, OFFLINE
+    meta = _load_meta(meta_path) if os.path.exists(snapshot_path) else {}
+
+    headers = {}
+    if meta.get("url") == url:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            df = _load_snapshot(snapshot_path)
+            if df is not None:
+                return df, NOT_MODIFIED
+            # Snapshot vanished: ask again without validators
+            response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+    except Exception as e:
+        print(f"Error downloading {filename}: {e}")
+        df = _load_snapshot(snapshot_path)
+        if df is not None:
+            print(f"Using cached snapshot of {filename}...")
+            return df, OFFLINE
+        if os.path.exists(filename):
+            print(f"Falling back to local file {filename}...")
+            return pd.read_csv(filename), OFFLINE
+        raise
+
+    content = response.content
+    digest = hashlib.sha256(content).hexdigest()
+    new_meta = {
+        "url": url,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "sha256": digest,
+    }
+
+    df = _load_snapshot(snapshot_path) if meta.get("sha256") == digest else None
+    status = UNCHANGED
+    if df is None:
+        df = pd.read_csv(io.StringIO(content.decode("utf-8")))
+        with open(filename, "wb") as f:
+            f.write(content)
+        df.to_pickle(snapshot_path)
+        status = UPDATED
+
+    # Validators may change even when the content does not
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(new_meta, f)
+    return df, status
@@ -0,0 +1,109 @@
+"""
+Glossary context selection.
+
+Picks the glossary entries that go into a prompt: every matched term, minus
+terms that only appear inside a longer matched term, ranked by specificity
+and position, and trimmed to a token budget.
+"""
+
+# Roughly 15 glossary lines, which is what the old `found[:15]` cap allowed.
+DEFAULT_TERM_TOKEN_BUDGET = 200
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (~4 characters per token for English/Dutch text).
+    Good enough for budgeting; not meant to match the tokenizer exactly.
+    """
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+def _find_spans(haystack, needle):
+    spans = []
+    start = haystack.find(needle)
+    while start != -1:
+        spans.append((start, start + len(needle)))
+        start = haystack.find(needle, start + 1)
+    return spans
+
+
+def match_terms(text, glossary_dict):
+    """
+    Returns one match per distinct (case-insensitive) term found in text:
+    a list of dicts with term, translation and the character spans it covers.
+    When the glossary has case variants of the same term, the variant whose
+    casing appears verbatim in the text wins.
+    """
+    if not isinstance(text, str) or not glossary_dict:
+        return []
+    text_lower = text.lower()
+    matches = {}
+    for term, trans in glossary_dict.items():
+        term_lower = str(term).lower()
+        if not term_lower or term_lower not in text_lower:
+            continue
+        existing = matches.get(term_lower)
+        if existing is not None and (existing["term"] in text or str(term) not in text):
+            continue
+        matches[term_lower] = {
+            "term": str(term),
+            "translation": trans,
+            "spans": _find_spans(text_lower, term_lower),
+        }
+    return list(matches.values())
+
+
+def _drop_contained(matches):
+    """
+    Drops a term when every occurrence sits inside an occurrence of a longer
+    matched term ("app" inside "Driver•i app"). The longer entry already
+    carries the terminology, so coverage is unchanged.
+    """
+    kept = []
+    for m in matches:
+        m_len = len(m["term"])
+        longer_spans = [
+            span
+            for other in matches
+            if len(other["term"]) > m_len
+            for span in other["spans"]
+        ]
+        covered = all(
+            any(s2 <= s and e <= e2 for s2, e2 in longer_spans)
+            for s, e in m["spans"]
+        )
+        if not covered:
+            kept.append(m)
+    return kept
+
+
+def select_terms(text, glossary_dict, token_budget=DEFAULT_TERM_TOKEN_BUDGET):
+    """
+    Returns (term, translation) pairs for the prompt, most specific first.
+
+    Ranking: more words, then longer term, then earlier first match.
+    Entries are added greedily until the token budget is spent; an entry that
+    does not fit is skipped so smaller ones further down can still use the room.
+    """
+    matches = _drop_contained(match_terms(text, glossary_dict))
+    matches.sort(key=lambda m: (-len(m["term"].split()), -len(m["term"]), m["spans"][0][0]))
+
+    selected = []
+    used = 0
+    for m in matches:
+        cost = estimate_tokens(format_term_line(m["term"], m["translation"])) + 1
+        if token_budget is not None and used + cost > token_budget:
+            continue
+        selected.append((m["term"], m["translation"]))
+        used += cost
+    return selected
+
+
+def format_term_line(term, translation):
+    return f"- '{term}' -> '{translation}'"
+
+
+def format_terms(pairs):
+    return "\n".join(format_term_line(term, trans) for term, trans in pairs)
@@ -0,0 +1,346 @@
+"""
+Background translation jobs.
+
+Translations run on a worker thread pool owned by a process-wide JobManager,
+not inside the Streamlit script run. The UI only submits jobs and polls their
+progress, so a browser refresh or a widget click no longer kills a run,
+several jobs can run side by side, and every job autosaves to output/.
+"""
+import csv
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from exports import ExportCache, generate_xliff, result_fingerprint
+from languages import DEFAULT_TARGETS, normalise_targets, result_column, result_columns
+from results import ResultStore
+from retry_queue import RetryLater, RetryQueue
+from scheduler import DEFAULT_ROW_WORKERS, ReorderBuffer, estimate_costs, longest_first, makespan
+from store import write_results
+from tmx import write_results as write_tmx
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class TranslationJob:
+    def __init__(self, name, texts, glossary_dict, output_dir, targets=DEFAULT_TARGETS, glossary_dicts=None,
+                 workers=DEFAULT_ROW_WORKERS, workbook=None):
+        self.id = uuid.uuid4().hex[:8]
+        self.name = name
+        self.texts = texts
+        self.glossary_dict = glossary_dict
+        # Target languages; one translation column (and XLIFF file) per target
+        self.targets = normalise_targets(targets)
+        self.glossary_dicts = glossary_dicts or {"nl": glossary_dict}
+        # Rows translated concurrently
+        self.workers = max(1, workers)
+        self.total = len(texts)
+        self.done = 0
+        self.status = QUEUED
+        # Columnar store indexed by row id; see results.py
+        self.results = ResultStore(texts, result_columns(self.targets))
+        self.errors = []
+        self.report = {}
+        # Hash of the final result set; the autosaved files hold exactly this
+        self.fingerprint = None
+        self.log = deque(maxlen=50)
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+        # Set when the run stopped on a cancel; the status follows once the files are written
+        self.stopped = False
+
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
+        self.base_filename = f"translation_results_{timestamp}_{self.id}"
+        self.output_dir = output_dir
+        self.outputs = {
+            "csv": os.path.join(output_dir, f"{self.base_filename}.csv"),
+            "xlsx": os.path.join(output_dir, f"{self.base_filename}.xlsx"),
+            "tmx": os.path.join(output_dir, f"{self.base_filename}.tmx"),
+            # Working copy for reporting: columnar, loads only the columns asked for
+            "parquet": os.path.join(output_dir, f"{self.base_filename}.parquet"),
+        }
+        for code in self.targets:
+            # Dutch keeps the original file name; other targets get a suffix
+            key, suffix = ("xlf", "") if code == "nl" else (f"xlf_{code}", f"_{code}")
+            self.outputs[key] = os.path.join(output_dir, f"{self.base_filename}{suffix}.xlf")
+        # Workbook jobs: texts are the unique cells of a WorkbookSource, and a
+        # translated copy of the workbook is written per target
+        self.workbook = workbook
+        if workbook is not None:
+            for code in self.targets:
+                key, suffix = ("workbook", "") if code == "nl" else (f"workbook_{code}", f"_{code}")
+                self.outputs[key] = os.path.join(output_dir, f"{self.base_filename}_workbook{suffix}.xlsx")
+        self._lock = threading.Lock()
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def is_active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def add_log(self, message):
+        self.log.append(f"{time.strftime('%H:%M:%S')} {message}")
+
+    def results_frame(self):
+        """
+        DataFrame view over the finished rows (no copy of the result data).
+        A cancelled job covers every row: rows finished after one that never
+        ran are kept, and the rows never reached stay blank.
+        """
+        if self.stopped:
+            return self.results.full_frame()
+        return self.results.frame()
+
+    def _store(self, index, result):
+        self.results.put(index, result)
+        with self._lock:
+            self.done += 1
+
+
+def translate_one(backend, text, glossary_dict, targets=DEFAULT_TARGETS, glossary_dicts=None):
+    """
+    Translates a single cell. Empty cells produce an empty row so the output
+    stays aligned with the source.
+    """
+    if pd.isna(text) or str(text).strip() == "":
+        empty = {"original_english": text, "improved_english": ""}
+        empty.update({result_column(code): "" for code in targets})
+        return empty
+    if tuple(targets) == ("nl",):
+        # Long cells are segmented; repeated cells/sentences come from translation memory
+        return backend.translate_cell(str(text), glossary_dict)
+    return backend.translate_cell_targets(str(text), glossary_dicts or {"nl": glossary_dict}, targets)
+
+
+def _csv_value(value):
+    # Same output as DataFrame.to_csv: missing values become empty fields
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return value
+
+
+def _failed_row(job, text, message, marker="ERROR_FAILED"):
+    row = {"original_english": str(text), "improved_english": message}
+    row.update({result_column(code): marker for code in job.targets})
+    return row
+
+
+def _write_csv(job, rows):
+    """
+    Rewrites the autosave CSV with the first `rows` rows (deferred rows that
+    were retried at the end land in their original position).
+    """
+    with open(job.outputs["csv"], "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(job.results.columns)
+        for index in range(rows):
+            writer.writerow([_csv_value(v) for v in job.results.row(index).values()])
+
+
+def _retry_deferred(job, backend, retries):
+    """
+    Retries the rows that hit a transient error during the main pass.
+    """
+    job.add_log(f"🔁 Retrying {len(retries)} deferred rows...")
+
+    def retry(index):
+        return translate_one(backend, job.texts[index], job.glossary_dict, job.targets, job.glossary_dicts)
+
+    for index, result, error in retries.drain(retry):
+        if error is not None:
+            result = _failed_row(job, job.texts[index], f"ERROR: {error} (gave up after {retries.max_attempts} retries)")
+        job._store(index, result)
+        if index in job.results.errors:
+            job.add_log(f"⚠️ Row {index+1} failed: {job.results.errors[index][:120]}")
+        if job.cancel_requested:
+            job.stopped = True
+            job.add_log(f"Cancelled with {len(retries)} deferred rows left.")
+            break
+
+
+def run_translation_job(job, backend, exports=None):
+    """
+    Worker body: translates every row, appending each result to the autosave
+    CSV as it goes, then writes the Excel and XLIFF files. The written files
+    are registered with `exports` (an ExportCache) so downloads can serve them.
+
+    Rows run on job.workers threads, longest first (see scheduler.py); the
+    autosave still receives them in input order. Rows that hit a transient
+    error (backend.defer_retries) are queued and retried once the other rows
+    are done, instead of blocking the run.
+    """
+    job.status = RUNNING
+    job.started = time.time()
+    job.add_log("Initializing translation engine...")
+    retries = RetryQueue()
+    reorder = ReorderBuffer(job.total)
+    try:
+        os.makedirs(job.output_dir, exist_ok=True)
+        # Expensive cells are dispatched first so they do not end up as a long tail
+        costs = estimate_costs(job.texts, job.glossary_dict)
+        order = longest_first(costs)
+        job.add_log(
+            f"🗂️ Scheduled {job.total} rows on {job.workers} workers "
+            f"(estimated wall time {makespan(costs, job.workers, order) / max(1, makespan(costs, 1)):.0%} of sequential)"
+        )
+        def translate_row(index):
+            # Checked before every row, so a cancelled job starts no new model calls
+            if job.cancel_requested:
+                return None
+            return translate_one(backend, job.texts[index], job.glossary_dict, job.targets, job.glossary_dicts)
+
+        pool = ThreadPoolExecutor(max_workers=job.workers, thread_name_prefix=f"job-{job.id}")
+        futures = {pool.submit(translate_row, index): index for index in order}
+        try:
+            with open(job.outputs["csv"], "w", newline="", encoding="utf-8-sig") as autosave:
+                writer = csv.writer(autosave, lineterminator="\n")
+                writer.writerow(job.results.columns)
+                job.add_log(f"💾 Autosave active: {os.path.abspath(job.outputs['csv'])}")
+
+                for finished, future in enumerate(as_completed(futures)):
+                    if job.cancel_requested:
+                        job.stopped = True
+                        job.add_log(f"Cancelled after {job.done}/{job.total} rows.")
+                        break
+                    if finished % 10 == 0:
+                        job.add_log(f"⏱️ {finished}/{job.total} rows done...")
+                    index = futures[future]
+                    try:
+                        current_result = future.result()
+                    except RetryLater as transient:
+                        delay = retries.defer(index, transient)
+                        job.add_log(f"⏳ Row {index+1} deferred ({str(transient)[:80]}); retry in {delay:.0f}s")
+                        current_result = None
+                    except Exception as row_error:
+                        err_msg = f"❌ Error on row {index+1}: {str(row_error)}"
+                        job.errors.append(err_msg)
+                        job.add_log(err_msg)
+                        # Create a dummy failed row so we don't lose alignment
+                        current_result = _failed_row(job, job.texts[index], "ERROR", "ERROR_FAILED_PROCESSING")
+                    if current_result is not None:
+                        job._store(index, current_result)
+                    if index in job.results.errors:
+                        job.add_log(f"⚠️ Row {index+1} failed: {job.results.errors[index][:120]}")
+                    # --- REAL-TIME AUTOSAVE --- in input order (a deferred row is written blank for now)
+                    for ready in reorder.complete(index):
+                        writer.writerow([_csv_value(v) for v in job.results.row(ready).values()])
+                    autosave.flush()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        deferred = bool(retries)
+        if deferred and not job.stopped:
+            _retry_deferred(job, backend, retries)
+
+        df = job.results_frame()
+        if deferred or job.stopped:
+            # The fingerprint below covers df, so every registered file holds df's rows
+            _write_csv(job, len(df))
+        with pd.ExcelWriter(job.outputs["xlsx"], engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Translations')
+        write_results(df, job.outputs["parquet"])
+        for code in job.targets:
+            key = "xlf" if code == "nl" else f"xlf_{code}"
+            with open(job.outputs[key], "w", encoding="utf-8") as f:
+                f.write(generate_xliff(df, code, result_column(code)))
+        with open(job.outputs["tmx"], "w", encoding="utf-8") as f:
+            write_tmx(f, df)
+        if job.workbook is not None:
+            for code in job.targets:
+                key = "workbook" if code == "nl" else f"workbook_{code}"
+                replaced = job.workbook.write(job.outputs[key], job.results.arrays[result_column(code)])
+                job.add_log(f"📘 {code}: {replaced}/{len(job.workbook.cells)} workbook cells translated")
+        job.fingerprint = result_fingerprint(df)
+        if exports is not None:
+            exports.register_files(job.fingerprint, job.outputs)
+
+        job.report = backend.run_report()
+        job.report.update({f"retry_{k}": v for k, v in retries.stats.items()})
+        job.add_log(f"✅ Finished. Files saved to '{job.output_dir}/{job.base_filename}.*'")
+        # Only now: a job stops being active once its files and fingerprint exist
+        job.status = CANCELLED if job.stopped else DONE
+    except Exception as e:
+        job.status = FAILED
+        job.errors.append(f"🔥 FATAL ERROR: {e}")
+        job.add_log(traceback.format_exc())
+    finally:
+        job.finished = time.time()
+
+
+class JobManager:
+    """
+    Process-wide registry of translation jobs. In the app it lives in
+    st.cache_resource so it survives reruns and browser refreshes.
+    """
+    def __init__(self, output_dir="output", max_jobs=2):
+        self.output_dir = output_dir
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="translation-job")
+        # Download bytes for finished results, generated on demand
+        self.exports = ExportCache()
+
+    def submit(self, backend, texts, glossary_dict, name="translation", targets=DEFAULT_TARGETS, glossary_dicts=None,
+               workers=DEFAULT_ROW_WORKERS):
+        job = TranslationJob(name, list(texts), glossary_dict, self.output_dir, targets, glossary_dicts, workers)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.add_log("Queued.")
+        self._pool.submit(run_translation_job, job, backend, self.exports)
+        return job
+
+    def submit_workbook(self, backend, workbook, glossary_dict, name=None, targets=DEFAULT_TARGETS,
+                        glossary_dicts=None, workers=DEFAULT_ROW_WORKERS):
+        """
+        Translates the selected columns of a WorkbookSource in one job: each
+        unique text once, written back into a copy of the workbook.
+        """
+        job = TranslationJob(name or workbook.name, list(workbook.texts), glossary_dict, self.output_dir,
+                             targets, glossary_dicts, workers, workbook=workbook)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.add_log(f"Queued workbook: {workbook.summary()}.")
+        if workbook.dropped:
+            job.add_log(f"⚠️ The translated workbook will not contain: {', '.join(workbook.dropped)}.")
+        self._pool.submit(run_translation_job, job, backend, self.exports)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job and job.is_active:
+            job.cancel_requested = True
+
+    def list_saved_outputs(self):
+        """
+        Result files in the output directory, newest first, including those
+        of jobs from earlier app sessions.
+        """
+        if not os.path.isdir(self.output_dir):
+            return []
+        files = [
+            os.path.join(self.output_dir, f)
+            for f in os.listdir(self.output_dir)
+            if f.startswith("translation_results_") and f.endswith((".csv", ".xlsx", ".xlf", ".tmx", ".parquet"))
+        ]
+        return sorted(files, key=os.path.getmtime, reverse=True)
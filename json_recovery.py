@@ -0,0 +1,182 @@
+"""
+Tolerant parsing of the model's JSON answers.
+
+Structured output (response_mime_type="application/json") removes most
+malformed responses, but a few defects still show up: markdown fences,
+unescaped quotes inside values, raw newlines and truncated tails. Instead of
+paying a full retry for those, parse_model_json() tries strict json.loads
+first and then falls back to an incremental scanner for the flat
+{"key": "string", ...} objects our prompts ask for.
+"""
+import json
+import re
+
+
+
+class ParseError(ValueError):
+    """The model answered, but no usable JSON object could be read from it."""
+
+
+class OutputTruncated(ParseError):
+    """The answer stopped at max_output_tokens (finish_reason MAX_TOKENS)."""
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*", re.IGNORECASE)
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def _strip_wrapping(text):
+    text = _FENCE_RE.sub("", text).replace("```", "").strip()
+    start = text.find("{")
+    return text[start:] if start != -1 else text
+
+
+def _skip_ws(text, i):
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return i
+
+
+def _closes_value(text, i):
+    """
+    Decides whether the quote at text[i] really ends a string value: it must be
+    followed by '}' / end of text, or by ',' and the start of the next key.
+    """
+    j = _skip_ws(text, i + 1)
+    if j >= len(text) or text[j] == "}":
+        return True
+    if text[j] == ",":
+        k = _skip_ws(text, j + 1)
+        return k >= len(text) or text[k] in '"}'
+    if text[j] == ":":
+        return True  # end of a key
+    return False
+
+
+def _scan_string(text, i, issues, is_key):
+    """
+    Reads a string starting at the opening quote text[i].
+    Returns (value, next_index). Never raises on bad input; defects are
+    appended to `issues`.
+    """
+    out = []
+    i += 1
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\" and i + 1 < len(text):
+            nxt = text[i + 1]
+            if nxt == "u" and i + 5 < len(text):
+                try:
+                    out.append(chr(int(text[i + 2:i + 6], 16)))
+                    i += 6
+                    continue
+                except ValueError:
+                    pass
+            out.append(_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        if ch == '"':
+            if is_key or _closes_value(text, i):
+                return "".join(out), i + 1
+            issues.add("unescaped_quote")
+            out.append(ch)
+            i += 1
+            continue
+        if ch in "\r\n":
+            issues.add("raw_newline")
+        out.append(ch)
+        i += 1
+    issues.add("truncated")
+    return "".join(out), i
+
+
+def _scan_object(text, issues):
+    data = {}
+    i = _skip_ws(text, 0)
+    if i >= len(text) or text[i] != "{":
+        raise ParseError("No JSON object found in response")
+    i += 1
+    while True:
+        i = _skip_ws(text, i)
+        if i >= len(text):
+            issues.add("truncated")
+            break
+        if text[i] == "}":
+            break
+        if text[i] == ",":
+            i += 1
+            continue
+        if text[i] != '"':
+            raise ParseError(f"Unexpected character {text[i]!r} at {i}")
+        key, i = _scan_string(text, i, issues, is_key=True)
+        i = _skip_ws(text, i)
+        if i >= len(text):
+            issues.add("truncated")
+            break
+        if text[i] != ":":
+            raise ParseError(f"Expected ':' after key {key!r}")
+        i = _skip_ws(text, i + 1)
+        if i >= len(text):
+            issues.add("truncated")
+            break
+        if text[i] == '"':
+            value, i = _scan_string(text, i, issues, is_key=False)
+        else:
+            # Non-string scalar (number/bool/null): read up to the next delimiter
+            end = i
+            while end < len(text) and text[end] not in ",}":
+                end += 1
+            raw = text[i:end].strip()
+            try:
+                value = json.loads(raw)
+            except ValueError:
+                value = raw
+            i = end
+        data[key] = value
+    return data
+
+
+def parse_model_json(text):
+    """
+    Returns (data, issues). `issues` is an empty set when the text was valid
+    JSON (markdown fences are stripped silently); otherwise it names the
+    defects that were repaired ("unescaped_quote", "raw_newline", "truncated").
+    Raises ValueError when no object can be recovered.
+    """
+    if not text or not text.strip():
+        raise ParseError("Empty response")
+    issues = set()
+    cleaned = _strip_wrapping(text)
+    try:
+        data = json.loads(cleaned)
+        if isinstance(data, dict):
+            return data, issues
+    except ValueError:
+        pass
+    data = _scan_object(cleaned, issues)
+    if not data:
+        raise ParseError("No JSON keys could be recovered")
+    return data, issues
+
+
+def response_finish_reason(response):
+    """
+    Returns the first candidate's finish reason as a plain string
+    ("STOP", "MAX_TOKENS", "SAFETY", ...) or "" when unavailable.
+    """
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        return ""
+    return getattr(reason, "name", str(reason or ""))
+
+
+def parse_complete_json(text):
+    """
+    Like parse_model_json, but an answer whose tail was cut off is rejected:
+    a half sentence must not be stored as a translation. Returns the data.
+    """
+    data, issues = parse_model_json(text)
+    if "truncated" in issues:
+        raise ParseError("Answer cut off mid-value")
+    return data
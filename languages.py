@@ -0,0 +1,45 @@
+"""
+Target languages for fan-out jobs.
+
+Dutch is the original target and keeps its own pipeline and column name
+(dutch_translation). Every other target gets a translation_<code> result
+column and reads its terms from the glossary column of the same name.
+"""
+# code -> (language name, formal form of address)
+TARGET_LANGUAGES = {
+    "nl": ("Dutch", "u/uw"),
+    "de": ("German", "Sie/Ihr"),
+    "fr": ("French", "vous/votre"),
+}
+
+DEFAULT_TARGETS = ("nl",)
+
+
+def language_name(code):
+    return TARGET_LANGUAGES[code][0]
+
+
+def result_column(code):
+    return "dutch_translation" if code == "nl" else f"translation_{code}"
+
+
+def glossary_column(code):
+    return f"translation_{code}"
+
+
+def result_columns(targets):
+    return ["original_english", "improved_english"] + [result_column(code) for code in targets]
+
+
+def normalise_targets(targets):
+    """
+    Lower-cased, de-duplicated target codes in the given order; unknown codes raise ValueError.
+    """
+    codes = []
+    for code in targets or DEFAULT_TARGETS:
+        code = code.strip().lower()
+        if code not in TARGET_LANGUAGES:
+            raise ValueError(f"Unsupported target language '{code}' (supported: {', '.join(TARGET_LANGUAGES)})")
+        if code not in codes:
+            codes.append(code)
+    return tuple(codes)
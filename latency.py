@@ -0,0 +1,119 @@
+"""
+Per-call deadlines and optional request hedging for model calls.
+
+Every call gets a deadline: the SDK is told to give up after `deadline`
+seconds (request_options timeout) and we stop waiting at the same moment, so
+one hung request can no longer stall a run. With hedging enabled, a call that
+is still running after the observed p95 latency gets a duplicate request and
+whichever answer arrives first wins. Hedges are capped to a fraction of all
+calls so a slow period cannot double the quota spend.
+"""
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_CALL_DEADLINE = 60.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """A model call did not finish within its deadline."""
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful call latencies (seconds).
+    """
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(p * (len(samples) - 1))))
+        return samples[idx]
+
+
+class HedgedCaller:
+    """
+    Runs `fn(timeout)` with a deadline and, optionally, a hedge request.
+
+    deadline:      seconds before the call is abandoned (DeadlineExceeded)
+    hedge:         send a duplicate once the call passes the hedge percentile
+    hedge_percentile / min_samples: when a call counts as slow, and how many
+                   samples are needed before hedging starts
+    hedge_budget:  max hedges as a fraction of all calls (0.05 = 5%)
+    """
+    def __init__(self, deadline=DEFAULT_CALL_DEADLINE, hedge=False, hedge_percentile=0.95,
+                 min_samples=20, hedge_budget=0.05, max_workers=16):
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.hedge_budget = hedge_budget
+        self.tracker = LatencyTracker()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+
+    def _hedge_delay(self):
+        if not self.hedge or len(self.tracker) < self.min_samples:
+            return None
+        return self.tracker.percentile(self.hedge_percentile)
+
+    def _take_hedge_slot(self):
+        with self._lock:
+            if self.stats["hedges"] + 1 > self.hedge_budget * self.stats["calls"]:
+                return False
+            self.stats["hedges"] += 1
+            return True
+
+    def call(self, fn):
+        with self._lock:
+            self.stats["calls"] += 1
+        start = time.monotonic()
+        deadline_at = start + self.deadline
+        primary = self._pool.submit(fn, self.deadline)
+        pending = {primary}
+
+        delay = self._hedge_delay()
+        if delay is not None and delay < self.deadline:
+            done, _ = wait(pending, timeout=delay)
+            if not done and self._take_hedge_slot():
+                remaining = max(0.0, deadline_at - time.monotonic())
+                pending.add(self._pool.submit(fn, remaining))
+
+        last_error = None
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    self.tracker.record(time.monotonic() - start)
+                    if future is not primary:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                last_error = future.exception()
+
+        if last_error is not None and not pending:
+            raise last_error
+        for other in pending:
+            other.cancel()
+        with self._lock:
+            self.stats["timeouts"] += 1
+        raise DeadlineExceeded(f"Model call exceeded its {self.deadline:.0f}s deadline")
@@ -0,0 +1,133 @@
+"""
+Placeholder and markup masking around the translation prompts.
+
+Tags (<strong>), placeholders ({count}, [text], %s), URLs, e-mail addresses
+and brand names are swapped for compact markers like ⟦0⟧ before a row is sent
+to the model, and put back afterwards. The model no longer has to copy the
+markup (fewer tokens, fewer corrections), and a lost or damaged marker is
+detected exactly so it can be repaired on its own instead of re-translating
+the whole row.
+"""
+import re
+from collections import Counter
+
+# Proper nouns that must never be translated or "fixed"
+BRAND_TOKENS = ("Driver•i", "Driver-i", "Netradyne")
+
+MARKER_FMT = "⟦{}⟧"
+# Tolerates the small variations models produce: ⟦ 0 ⟧, [[0]]
+_MARKER_RE = re.compile(r"(?:⟦|\[\[)\s*(\d+)\s*(?:⟧|\]\])")
+
+_MARKUP_PATTERNS = [
+    r"</?[A-Za-z][^<>]*>",                              # HTML/XML tags
+    r"(?:https?://|www\.)[^\s<>\"']+[^\s<>\"'.,;:!?)]",  # URLs (no trailing punctuation)
+    r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+",                    # e-mail addresses
+    r"\{\{?\s*[\w.]+\s*\}?\}",                          # {count}, {{name}}
+    r"\[[A-Za-z_][\w.]*\]",                             # [text]
+    r"%(?:\(\w+\)|\d+\$)?[sd]\b",                       # %s, %(name)s, %1$d
+]
+
+
+def _build_regex(brands):
+    patterns = list(_MARKUP_PATTERNS)
+    # Longest brand first so "Driver•i" is not cut short by a shorter variant
+    patterns += [re.escape(b) + r"(?!\w)" for b in sorted(brands, key=len, reverse=True)]
+    return re.compile("|".join(f"(?:{p})" for p in patterns))
+
+
+_FULL_RE = _build_regex(BRAND_TOKENS)
+_MARKUP_RE = _build_regex(())
+
+
+class MaskedText:
+    """
+    A masked string plus what is needed to restore it.
+
+    text:   the string with markers, as sent to the model
+    tokens: original token per marker index (identical tokens share a marker)
+    counts: how often each marker occurs in `text`
+    brands: marker indexes that are brand names (they may legitimately occur
+            a different number of times in the translation)
+    """
+    def __init__(self, original, text, tokens, counts, brands):
+        self.original = original
+        self.text = text
+        self.tokens = tokens
+        self.counts = counts
+        self.brands = brands
+
+    def markers(self):
+        return [MARKER_FMT.format(i) for i in range(len(self.tokens))]
+
+    def check(self, translated):
+        """
+        Returns a list of problems (empty when every marker survived). A marker
+        the model replaced by its original token verbatim is not a problem.
+        """
+        found = Counter(int(m) for m in _MARKER_RE.findall(translated))
+        problems = []
+        for i, token in enumerate(self.tokens):
+            if found[i] == 0 and token not in translated:
+                problems.append(f"missing {MARKER_FMT.format(i)} ({token})")
+            elif found[i] and i not in self.brands and found[i] != self.counts[i]:
+                problems.append(f"{MARKER_FMT.format(i)} ({token}) appears {found[i]}x, expected {self.counts[i]}x")
+        for i in found:
+            if i >= len(self.tokens):
+                problems.append(f"unknown marker {MARKER_FMT.format(i)}")
+        return problems
+
+    def restore(self, translated):
+        """
+        Puts the original tokens back. Returns (text, problems).
+        """
+        problems = self.check(translated)
+
+        def put_back(match):
+            i = int(match.group(1))
+            return self.tokens[i] if i < len(self.tokens) else match.group(0)
+
+        return _MARKER_RE.sub(put_back, translated), problems
+
+    def __bool__(self):
+        return bool(self.tokens)
+
+
+def mask(text, brands=True):
+    """
+    Replaces markup, placeholders, URLs, e-mails and (optionally) brand names
+    with ⟦n⟧ markers. Returns a MaskedText.
+    """
+    regex = _FULL_RE if brands else _MARKUP_RE
+    tokens, index, counts, brand_ids = [], {}, Counter(), set()
+
+    def swap(match):
+        token = match.group(0)
+        if token not in index:
+            index[token] = len(tokens)
+            tokens.append(token)
+            if token in BRAND_TOKENS:
+                brand_ids.add(index[token])
+        counts[index[token]] += 1
+        return MARKER_FMT.format(index[token])
+
+    if not isinstance(text, str) or "⟦" in text:
+        # Nothing to do, or text that already uses our marker syntax
+        return MaskedText(text, text, [], Counter(), set())
+    return MaskedText(text, regex.sub(swap, text), tokens, counts, brand_ids)
+
+
+def is_all_caps(text):
+    """
+    ALL CAPS check that ignores markup: "<b>SAVE</b>" counts as capitals.
+    """
+    bare = _MARKUP_RE.sub("", text) if isinstance(text, str) else ""
+    return bare.isupper() and len(bare.strip()) > 1
+
+
+def upper_outside_markup(text):
+    """
+    Upper-cases text without touching tags, placeholders, URLs or e-mails.
+    """
+    masked = mask(text, brands=False)
+    restored, _ = masked.restore(masked.text.upper())
+    return restored
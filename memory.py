@@ -0,0 +1,56 @@
+"""
+Translation memory: finished results keyed by their source segment.
+
+Shared by the row pipeline and the long-cell segmenter so a sentence that was
+already translated (in this job, or another cell) is never sent again.
+"""
+import hashlib
+import threading
+
+
+class TranslationMemory:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text, context=""):
+        """
+        Whitespace-normalised source text; pieces translated with surrounding
+        context are kept apart from the same text translated on its own.
+        """
+        norm = " ".join(str(text).split())
+        if context:
+            norm += "\x00" + hashlib.sha1(context.encode("utf-8")).hexdigest()
+        return norm
+
+    def get(self, text, context=""):
+        with self._lock:
+            entry = self._entries.get(self.key(text, context))
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, text, result, context=""):
+        with self._lock:
+            self._entries[self.key(text, context)] = result
+
+    def items(self):
+        """(key, entry) pairs, for persisting the memory (see store.save_memory)."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def update(self, pairs):
+        """Adds (key, entry) pairs as returned by items()."""
+        with self._lock:
+            self._entries.update(pairs)
+
+    def __contains__(self, text):
+        return self.key(text) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
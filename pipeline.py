@@ -0,0 +1,464 @@
+"""
+The row translation pipeline shared by TranslatorBackend (app, jobs, service)
+and translate_script.py.
+
+TranslationPipeline holds everything between "a source cell" and "a result
+dict": the JSON attempt with retries, the verify pass, marker restore, the
+text fallback, truncation splits, long-cell segmentation, the fast path and
+the translation memory. An entry point subclasses it and supplies how a model
+is called (_generate), its prompt templates and its post-processing rules
+(_post_process_enforcement).
+
+Every path returns the same result shape; a row that could not be translated
+is failed_row(): dutch_translation "ERROR_FAILED" and the error message in
+improved_english.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from estimator import MAX_OUTPUT_TOKENS, output_budget
+from fastpath import FastPath
+from glossary import DEFAULT_TERM_TOKEN_BUDGET, format_terms, select_terms
+from json_recovery import OutputTruncated, ParseError, parse_model_json, response_finish_reason
+from masking import is_all_caps, mask, upper_outside_markup
+from memory import TranslationMemory
+from retry_queue import PERMANENT, TRANSIENT, RetryLater, backoff_delay, classify_error, retry_after
+from segmenter import join_segments, needs_context, split_segments
+
+FAILED = "ERROR_FAILED"
+# JSON attempts per row before the text fallback
+JSON_RETRIES = 3
+
+
+def failed_row(source_text, message):
+    """The result of a row that could not be translated."""
+    return {
+        "original_english": source_text,
+        "improved_english": message[:1000],
+        "dutch_translation": FAILED
+    }
+
+
+def is_failed(result):
+    return result["dutch_translation"] == FAILED
+
+
+class TranslationPipeline:
+    """
+    Subclasses provide _generate(template, max_output_tokens=None, **values),
+    _post_process_enforcement(dutch, source) and the templates below.
+
+    stats:  Counter for the run report (a new one by default); rows run on
+            several threads, so it is only updated through _count()
+    memory: TranslationMemory of finished rows and pieces
+    defer_retries: transient errors raise RetryLater instead of sleeping
+                   inline; the caller queues the row (see retry_queue.py)
+    """
+    json_template = None
+    verify_template = None
+    fallback_template = None
+    marker_repair_template = None
+    json_retries = JSON_RETRIES
+
+    def __init__(self, stats=None, memory=None, defer_retries=False):
+        self.stats = stats if stats is not None else Counter()
+        self._stats_lock = threading.Lock()
+        self.memory = memory if memory is not None else TranslationMemory()
+        self.defer_retries = defer_retries
+        # Pieces of long cells are translated in parallel
+        self._piece_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cell-piece")
+        # FastPath per glossary dict (one per target language in fan-out jobs)
+        self._fast_paths = {}
+
+    def _generate(self, template, max_output_tokens=None, **values):
+        raise NotImplementedError
+
+    def _post_process_enforcement(self, dutch_text, source_english):
+        raise NotImplementedError
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def stats_snapshot(self):
+        """Copy of the stats, consistent across keys."""
+        with self._stats_lock:
+            return Counter(self.stats)
+
+    def _note(self, message):
+        """Progress remarks (the CLI prints them)."""
+
+    # --- Text helpers ---
+
+    def fix_utf8_mojibake(self, text):
+        """
+        Repairs common UTF-8 encoding errors (Mojibake).
+        Specifically targets Windows-1252 artifacting.
+        """
+        if not isinstance(text, str):
+            return str(text)
+
+        replacements = {
+            "Ã¢â‚¬Â¢": "•",  # Bullet (Standard encoding error)
+            "â€¢": "•",      # Bullet (alt)
+            "Ã¢": "â",       # Partial artifact
+            "â¢": "•",       # Screenshot variant
+            "Ã©": "é",       # e acute
+            "Ã": "à",        # a grave (partial) - be careful here, usually context dependent
+            "â€™": "'",      # Smart quote
+            "â€œ": '"',      # Smart open quote
+            "â€": '"',       # Smart close quote
+            "Ã«": "ë",       # e diaeresis
+            "Ã¯": "ï",       # i diaeresis
+            "â€“": "-",      # En dash
+        }
+
+        for bad, good in replacements.items():
+            text = text.replace(bad, good)
+        return text
+
+    def clean_text_for_prompt(self, text):
+        """
+        Flattens text to a single line for safer JSON prompting.
+        """
+        if not isinstance(text, str):
+            return str(text)
+
+        # 1. Fix encoding first
+        text = self.fix_utf8_mojibake(text)
+
+        # 2. Normalize whitespace
+        text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+        text = re.sub(r'\s+', ' ', text).strip()
+        return text
+
+    @staticmethod
+    def find_relevant_terms(text, glossary_dict, token_budget=DEFAULT_TERM_TOKEN_BUDGET):
+        """
+        Keyword matching, ranked by specificity and fitted to a token budget.
+        Terms nested inside a longer matched term (e.g. 'app' in 'Driver-i app') are dropped.
+        """
+        if not isinstance(text, str):
+            return ""
+        return format_terms(select_terms(text, glossary_dict, token_budget))
+
+    @staticmethod
+    def _format_context(context, limit=1500):
+        if not context:
+            return ""
+        return (
+            "\nCONTEXT (the full text the Input Text belongs to; for reference only, "
+            f"translate ONLY the Input Text):\n{context[:limit]}\n"
+        )
+
+    # --- Model passes ---
+
+    def _verify_and_correct(self, candidate_translation, original_english):
+        """
+        Secondary pass to enforce Dutch linguistic rules (compounds,
+        koppelteken, word order, capitalization). Keeps the candidate when the
+        call fails or is cut off.
+        """
+        try:
+            response = self._generate(self.verify_template, source=original_english, candidate=candidate_translation)
+            if response_finish_reason(response) == "MAX_TOKENS":
+                # A cut-off correction is worse than none
+                self._count("truncations")
+                return candidate_translation
+            return response.text.strip()
+        except Exception:
+            return candidate_translation
+
+    def _restore_markers(self, masked, candidate):
+        """
+        Puts masked tokens back into a model answer. Lost or damaged markers
+        get one short targeted repair call instead of a full re-translation.
+        Returns (text, problems); problems is empty when all markers survived.
+        """
+        restored, problems = masked.restore(candidate)
+        if not problems:
+            return restored, problems
+        self._count("marker_repairs")
+        try:
+            response = self._generate(
+                self.marker_repair_template,
+                source=masked.text,
+                candidate=candidate,
+                markers=" ".join(masked.markers())
+            )
+            repaired, repair_problems = masked.restore(response.text.strip())
+            if not repair_problems:
+                return repaired, repair_problems
+        except Exception:
+            pass
+        self._count("marker_failures")
+        return restored, problems
+
+    def _defer(self, error):
+        # The row is counted again when it is retried
+        self._count("rows", -1)
+        self._count("deferred")
+        raise RetryLater(error)
+
+    def translate_row_robust(self, source_text, glossary_text, reference_examples="", context=""):
+        """
+        JSON answer first (with verify pass and marker restore), retried on
+        malformed or cut-off answers; then a plain-text fallback. Returns the
+        result dict, failed_row() when both strategies fail.
+        """
+        # The prompt gets a single-line copy; the result keeps the original source
+        clean_noline_source = self.clean_text_for_prompt(source_text)
+        # Tags, placeholders, URLs and brand names travel as compact ⟦n⟧ markers
+        masked = mask(clean_noline_source)
+        safe_json_source = masked.text.replace('"', '\\"')
+        all_caps = is_all_caps(source_text)
+
+        # --- STRATEGY A: Strict JSON ---
+        retries = self.json_retries
+        last_error = None
+        self._count("rows")
+        # Sized from the segment; doubled when an answer is cut off
+        budget = output_budget(self.json_template.name, {"source": safe_json_source})
+
+        for attempt in range(retries):
+            try:
+                response = self._generate(
+                    self.json_template,
+                    max_output_tokens=budget,
+                    glossary=glossary_text,
+                    examples=reference_examples,
+                    context=self._format_context(context),
+                    source=safe_json_source
+                )
+                if response_finish_reason(response) == "MAX_TOKENS":
+                    raise OutputTruncated(f"Response truncated at max_output_tokens={budget}")
+                if not response.parts:
+                    raise ValueError("Blocked by safety filters or empty response")
+
+                # Tolerant parse: fences, stray quotes and raw newlines are repaired
+                # locally instead of costing another round trip. A cut-off tail is
+                # not: the half sentence would be stored as the translation.
+                data, issues = parse_model_json(response.text)
+                if "truncated" in issues:
+                    raise ParseError("Answer cut off mid-value")
+
+                if "improved_english" not in data or "dutch_translation" not in data:
+                    raise ParseError("Missing JSON keys")
+                if issues:
+                    self._count("parse_recovered")
+
+                # --- VERIFICATION STEP ---
+                verified_dutch = self._verify_and_correct(data["dutch_translation"], masked.text)
+                if masked and masked.check(verified_dutch) and not masked.check(data["dutch_translation"]):
+                    # The editor pass dropped a marker the translation still had
+                    verified_dutch = data["dutch_translation"]
+
+                # --- MARKER RESTORE ---
+                verified_dutch, problems = self._restore_markers(masked, verified_dutch)
+                if problems:
+                    raise ParseError(f"Placeholders lost: {'; '.join(problems)}")
+                improved, problems = masked.restore(data["improved_english"])
+                if problems:
+                    improved = clean_noline_source
+
+                # --- POST-PROCESSING ENFORCEMENT ---
+                final_dutch = self._post_process_enforcement(verified_dutch, source_text)
+
+                # --- ALL CAPS ENFORCEMENT ---
+                if all_caps:
+                    improved = upper_outside_markup(improved)
+                    final_dutch = upper_outside_markup(final_dutch)
+
+                self._count("json_ok")
+                return {
+                    "original_english": source_text,
+                    "improved_english": improved,
+                    "dutch_translation": final_dutch
+                }
+            except OutputTruncated as e:
+                last_error = e
+                self._count("truncations")
+                if budget >= MAX_OUTPUT_TOKENS:
+                    break
+                # Same request again only with room for the whole answer
+                budget = min(MAX_OUTPUT_TOKENS, budget * 2)
+            except Exception as e:
+                last_error = e
+                kind = classify_error(e)
+                if kind == TRANSIENT:
+                    self._count("transient_errors")
+                    if self.defer_retries:
+                        self._defer(e)
+                    if attempt + 1 < retries:
+                        time.sleep(backoff_delay(attempt, retry_after(e)))
+                elif kind == PERMANENT:
+                    # Safety blocks and rejected requests: asking again will not help
+                    self._count("permanent_errors")
+                    break
+                else:
+                    # Malformed answer: retry straight away
+                    self._count("parse_retries")
+
+        if isinstance(last_error, OutputTruncated):
+            # Too long for one answer: translate it in halves at sentence boundaries
+            split = self._translate_split(source_text, glossary_text, reference_examples, context)
+            if split is not None:
+                return split
+
+        # --- STRATEGY B: Fallback Text-Only ---
+        # Strategy A failed all retries: ask for the Dutch text directly
+        self._note(f"    [!] Switches to Strategy B (Text fallback) for: {clean_noline_source[:30]}...")
+        try:
+            response = self._generate(self.fallback_template, glossary=glossary_text, source=masked.text)
+            if response_finish_reason(response) == "MAX_TOKENS":
+                raise OutputTruncated("Text fallback truncated at max_output_tokens")
+            dutch_text, _ = self._restore_markers(masked, response.text.strip())
+
+            final_dutch = self._post_process_enforcement(dutch_text, source_text)
+
+            if all_caps:
+                clean_noline_source = upper_outside_markup(clean_noline_source)
+                final_dutch = upper_outside_markup(final_dutch)
+
+            self._count("strategy_b")
+            return {
+                "original_english": source_text,
+                "improved_english": clean_noline_source,
+                "dutch_translation": final_dutch
+            }
+        except Exception as e:
+            if self.defer_retries and classify_error(e) == TRANSIENT:
+                self._defer(e)
+            self._note(f"    [Strategy B] Failed: {e}")
+            error_msg = f"ERROR: {str(e)}"
+            if last_error:
+                error_msg += f" | JSON Error: {str(last_error)}"
+            self._count("failed")
+            return failed_row(source_text, error_msg)
+
+    def _translate_split(self, source_text, glossary_text, reference_examples="", context=""):
+        """
+        Translates a segment whose answer did not fit in max_output_tokens as
+        two or more pieces (sentence boundaries, about half the length each)
+        and joins them. Returns None when the segment has no sentence boundary.
+        """
+        pieces = split_segments(source_text, long_cell_chars=0, max_piece_chars=max(1, len(source_text) // 2))
+        if len(pieces) < 2:
+            return None
+        self._note(f"    [!] Answer too long; translating in {len(pieces)} pieces")
+        self._count("truncation_splits")
+        # Each piece is counted as a row of its own
+        self._count("rows", -1)
+        whole_context = context or self.clean_text_for_prompt(source_text)
+        results = [
+            self.translate_row_robust(piece, glossary_text, reference_examples,
+                                      context=whole_context if needs_context(piece) else "")
+            for piece, _ in pieces
+        ]
+        return self._join(source_text, pieces, results)
+
+    @staticmethod
+    def _join(source_text, pieces, results):
+        failed = next((r for r in results if is_failed(r)), None)
+        if failed is not None:
+            return {**failed, "original_english": source_text}
+        return {
+            "original_english": source_text,
+            "improved_english": join_segments(pieces, [r["improved_english"] for r in results]),
+            "dutch_translation": join_segments(pieces, [r["dutch_translation"] for r in results])
+        }
+
+    # --- Cells ---
+
+    def translate_cell(self, source_text, glossary_dict, reference_examples=""):
+        """
+        Translates one source cell. Short cells go through translate_row_robust;
+        long cells are split into sentence/paragraph pieces that are translated
+        in parallel and re-joined with the original line breaks. Short
+        fragments get the whole cell as context. Every piece (and every whole
+        cell) is cached in self.memory.
+        """
+        self._count("cells")
+        pieces = split_segments(source_text)
+        if len(pieces) == 1:
+            result, local = self._translate_piece(source_text, glossary_dict, reference_examples)
+            if local:
+                self._count("local_cells")
+            return result
+
+        self._count("segmented_cells")
+        whole_context = self.clean_text_for_prompt(source_text)
+        # Identical pieces (repeated sentences) are translated once
+        contexts = [whole_context if needs_context(piece) else "" for piece, _ in pieces]
+        keys = [TranslationMemory.key(piece, context) for (piece, _), context in zip(pieces, contexts)]
+        unique = {}
+        # Longest pieces first, so the slowest call starts straight away
+        ordered = sorted(zip(pieces, contexts, keys), key=lambda item: -len(item[0][0]))
+        for (piece, _), context, key in ordered:
+            unique.setdefault(key, (piece, context))
+        by_key = dict(zip(unique, self._translate_pieces(list(unique.values()), glossary_dict, reference_examples)))
+        outcomes = [by_key[key] for key in keys]
+        if all(local for _, local in outcomes):
+            self._count("local_cells")
+        return self._join(source_text, pieces, [result for result, _ in outcomes])
+
+    def _translate_pieces(self, items, glossary_dict, reference_examples=""):
+        """
+        items = [(text, context)]; returns [(result, local)] in item order.
+        """
+        futures = [
+            self._piece_pool.submit(self._translate_piece, text, glossary_dict, reference_examples, context)
+            for text, context in items
+        ]
+        return [future.result() for future in futures]
+
+    def _translate_piece(self, text, glossary_dict, reference_examples="", context=""):
+        """
+        Returns (result, local); local is True when no model call was needed.
+        """
+        local = self._local_or_cached(text, glossary_dict, context)
+        if local is not None:
+            return local, True
+        result = self.translate_row_robust(
+            text, self.find_relevant_terms(text, glossary_dict), reference_examples, context=context
+        )
+        if not is_failed(result):
+            self.memory.put(text, result, context)
+        return result, False
+
+    def _local_or_cached(self, text, glossary_dict, context=""):
+        local = self._resolve_locally(text, glossary_dict)
+        if local is not None:
+            return local
+        cached = self.memory.get(text, context)
+        if cached is not None:
+            self._count("memory_hits")
+            return {**cached, "original_english": text}
+        return None
+
+    def _fast_path_for(self, glossary_dict):
+        fast_path = self._fast_paths.get(id(glossary_dict))
+        if fast_path is None or fast_path.glossary_dict is not glossary_dict:
+            fast_path = self._fast_paths[id(glossary_dict)] = FastPath(glossary_dict)
+        return fast_path
+
+    def _resolve_locally(self, source_text, glossary_dict):
+        """
+        Numbers, URLs, placeholders, brand-only strings and exact glossary
+        terms are answered without the model (see fastpath.py).
+        """
+        clean = self.clean_text_for_prompt(source_text)
+        resolved = self._fast_path_for(glossary_dict).resolve(clean)
+        if resolved is None:
+            return None
+        dutch, reason = resolved
+        self._count("fast_path")
+        self._count(f"fast_path_{reason}")
+        return {
+            "original_english": source_text,
+            "improved_english": clean,
+            "dutch_translation": self._post_process_enforcement(dutch, source_text)
+        }
@@ -0,0 +1,115 @@
+"""
+Reusable prompt templates.
+
+A PromptTemplate splits a prompt into a static part (rules, policies, fixed
+examples) and a small per-row part. The static part is sent once as the
+model's system_instruction; each request only carries the rendered row part.
+"""
+import string
+
+
+class PromptTemplate:
+    def __init__(self, name, system, body, response_schema=None):
+        self.name = name
+        # When set, the model is asked for JSON constrained to this schema
+        self.response_schema = response_schema
+        self.system = system.strip()
+        self.body = body.strip()
+        # Parse the row template once; render() just joins literals and values.
+        self._parts = []
+        self.fields = []
+        for literal, field, spec, conversion in string.Formatter().parse(self.body):
+            if spec or conversion:
+                raise ValueError(f"Template '{name}': format specs are not supported ({field})")
+            self._parts.append((literal, field))
+            if field is not None and field not in self.fields:
+                self.fields.append(field)
+
+    def render(self, **values):
+        """
+        Renders the per-row part. Every template field must be supplied.
+        """
+        missing = [f for f in self.fields if f not in values]
+        if missing:
+            raise KeyError(f"Template '{self.name}' is missing fields: {missing}")
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(values[field]))
+        return "".join(out)
+
+    def render_full(self, **values):
+        """
+        Static part plus row part, i.e. what a single self-contained prompt
+        would look like. Used for size estimates and for models without
+        system instruction support.
+        """
+        return f"{self.system}\n\n{self.render(**values)}"
+
+    def __repr__(self):
+        return f"PromptTemplate({self.name!r}, system={len(self.system)} chars, fields={self.fields})"
+
+
+# Response schema for the JSON translation prompts (structured output).
+TRANSLATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "original_english": {"type": "string"},
+        "improved_english": {"type": "string"},
+        "dutch_translation": {"type": "string"},
+    },
+    "required": ["improved_english", "dutch_translation"],
+}
+
+
+# Same without the original_english echo (TranslatorBackend(echo_source=False))
+TRANSLATION_SCHEMA_NO_ECHO = {
+    "type": "object",
+    "properties": {
+        "improved_english": {"type": "string"},
+        "dutch_translation": {"type": "string"},
+    },
+    "required": ["improved_english", "dutch_translation"],
+}
+
+
+# Response schema for batched translation prompts: one entry per segment id.
+BATCH_TRANSLATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "translations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "improved_english": {"type": "string"},
+                    "dutch_translation": {"type": "string"},
+                },
+                "required": ["id", "improved_english", "dutch_translation"],
+            },
+        },
+    },
+    "required": ["translations"],
+}
+
+
+# Response schema for targeted glossary repairs: corrected Dutch per row id.
+TERM_REPAIR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "fixes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "dutch_translation": {"type": "string"},
+                },
+                "required": ["id", "dutch_translation"],
+            },
+        },
+    },
+    "required": ["fixes"],
+}
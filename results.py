@@ -0,0 +1,131 @@
+"""
+Compact columnar storage for translation results.
+
+A job used to keep one dict per row and rebuild a DataFrame from that list
+for every preview, autosave and export. ResultStore preallocates one object
+array per column plus an int8 status array, all indexed by row id, and hands
+out DataFrame views over those arrays without copying them. Error messages
+of failed rows live in a separate sparse dict instead of the text columns.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from exports import RESULT_COLUMNS
+
+PENDING = 0
+OK = 1
+EMPTY = 2
+FAILED = 3
+
+FAILED_MARKERS = ("ERROR_FAILED", "ERROR_FAILED_PROCESSING")
+MAX_ERROR_CHARS = 300
+
+
+def _object_array(n, fill=""):
+    arr = np.empty(n, dtype=object)
+    arr[:] = fill
+    return arr
+
+
+class ResultStore:
+    """
+    Results of one job, preallocated for `sources` (the source texts, which
+    are referenced, not copied). Rows may be filled in any order; frame()
+    covers the filled prefix so output stays in input order.
+
+    columns: original_english, improved_english, then one translation column
+    per target language (see languages.result_columns).
+    """
+    def __init__(self, sources, columns=RESULT_COLUMNS):
+        self.size = len(sources)
+        self.columns = list(columns)
+        self.original = _object_array(self.size, None)
+        self.original[:] = list(sources)
+        self.arrays = {self.columns[0]: self.original}
+        for column in self.columns[1:]:
+            self.arrays[column] = _object_array(self.size)
+        self.improved = self.arrays["improved_english"]
+        self.dutch = self.arrays.get("dutch_translation")
+        self.translation_columns = self.columns[2:]
+        self.status = np.zeros(self.size, dtype=np.int8)
+        self.errors = {}
+        self.count = 0
+        self._prefix = 0
+        self._frame = None
+        self._lock = threading.Lock()
+
+    def put(self, row, result):
+        """
+        Stores a result dict (as returned by the backend) for row `row`.
+        """
+        improved = result.get("improved_english") or ""
+        translations = [result.get(column) or "" for column in self.translation_columns]
+        if improved == "ERROR_FAILED" or any(t in FAILED_MARKERS for t in translations):
+            status = FAILED
+            if improved.startswith("ERROR"):
+                # The backend reports the error in place of the improved English
+                self.errors[row] = improved[:MAX_ERROR_CHARS]
+                improved = ""
+            else:
+                failed = [c for c, t in zip(self.translation_columns, translations) if t in FAILED_MARKERS]
+                self.errors[row] = f"Failed: {', '.join(failed)}"
+            translations = [t or FAILED_MARKERS[0] for t in translations]
+        elif not improved and not any(translations):
+            status = EMPTY
+        else:
+            status = OK
+        with self._lock:
+            if self.status[row] == PENDING:
+                self.count += 1
+            self.improved[row] = improved
+            for column, translation in zip(self.translation_columns, translations):
+                self.arrays[column][row] = translation
+            self.status[row] = status
+            while self._prefix < self.size and self.status[self._prefix] != PENDING:
+                self._prefix += 1
+
+    def row(self, row):
+        return {column: self.arrays[column][row] for column in self.columns}
+
+    def _view(self, start, end, copy):
+        data = {column: self.arrays[column][start:end] for column in self.columns}
+        return pd.DataFrame(data, index=range(start, end), dtype=object, copy=copy)
+
+    def frame(self):
+        """
+        DataFrame view over the filled prefix. No column data is copied; once
+        every row is filled the same view is returned again.
+        """
+        with self._lock:
+            end = self._prefix
+            if self._frame is not None and len(self._frame) == end:
+                return self._frame
+            frame = self._view(0, end, copy=False)
+            if end == self.size:
+                self._frame = frame
+            return frame
+
+    def full_frame(self):
+        """
+        DataFrame view over every row, also those never filled (their result
+        columns are empty). A cancelled job exports this instead of the prefix.
+        """
+        return self._view(0, self.size, copy=False)
+
+    def tail(self, n=3):
+        """
+        Small preview of the last filled rows (built from n rows only).
+        """
+        with self._lock:
+            end = self._prefix
+        return self._view(max(0, end - n), end, copy=True)
+
+    def status_counts(self):
+        counts = np.bincount(self.status, minlength=FAILED + 1)
+        return {"pending": int(counts[PENDING]), "ok": int(counts[OK]),
+                "empty": int(counts[EMPTY]), "failed": int(counts[FAILED])}
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,196 @@
+"""
+Error classification and a deferred retry queue for model calls.
+
+A failed call used to be retried inline: the row slept 2 s, 4 s (plus 5 s on
+quota errors) while every other row waited behind it. Errors are now sorted
+into three kinds:
+
+    transient  rate limits (429), timeouts, 5xx, dropped connections
+    parse      the model answered, but not in the expected shape
+    permanent  safety blocks and rejected requests (4xx)
+
+Parse errors are retried straight away, permanent errors are not retried.
+Transient errors raise RetryLater; the pipeline puts the row on a RetryQueue
+and carries on, and the queue retries it at the end of the run after a
+jittered backoff (or the server's Retry-After, when it sent one).
+"""
+import heapq
+import itertools
+import random
+import re
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+
+from json_recovery import ParseError
+
+TRANSIENT = "transient"
+PARSE = "parse"
+PERMANENT = "permanent"
+
+TRANSIENT_CODES = {408, 429, 500, 502, 503, 504}
+PERMANENT_CODES = {400, 401, 403, 404}
+
+_TRANSIENT_WORDS = (
+    "429", "quota", "exhausted", "rate limit", "timeout", "timed out", "deadline",
+    "unavailable", "overloaded", "500", "502", "503", "504", "internal error", "connection",
+)
+_PERMANENT_WORDS = ("safety", "blocked", "prohibited", "recitation", "permission", "api key not valid")
+# "Please retry in 12.3s" (Gemini 429 message), "retry_delay { seconds: 12 }" (gRPC RetryInfo)
+_RETRY_IN_RE = re.compile(r"retry (?:in|after) (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+_RETRY_DELAY_RE = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+MAX_RETRY_AFTER = 300.0
+
+
+class RetryLater(Exception):
+    """
+    A transient failure the caller should retry later instead of waiting now.
+    `error` is the original exception; `delay` the server's Retry-After, if any.
+    """
+    def __init__(self, error, delay=None):
+        super().__init__(str(error))
+        self.error = error
+        self.delay = delay if delay is not None else retry_after(error)
+
+
+def _status_code(error):
+    code = getattr(error, "code", None)
+    if callable(code):
+        # grpc errors expose code() instead of an attribute
+        try:
+            code = code()
+        except Exception:
+            code = None
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def classify_error(error):
+    """
+    Returns TRANSIENT, PARSE or PERMANENT. Errors that give no hint are
+    treated as a bad answer (PARSE): retried at once, a bounded number of times.
+    """
+    if isinstance(error, RetryLater):
+        return TRANSIENT
+    if isinstance(error, ParseError):
+        return PARSE
+    code = _status_code(error)
+    if code in TRANSIENT_CODES:
+        return TRANSIENT
+    if code in PERMANENT_CODES:
+        return PERMANENT
+    # DeadlineExceeded (latency.py) is a TimeoutError
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return TRANSIENT
+    message = str(error).lower()
+    if any(word in message for word in _PERMANENT_WORDS):
+        return PERMANENT
+    if any(word in message for word in _TRANSIENT_WORDS):
+        return TRANSIENT
+    return PARSE
+
+
+def retry_after(error):
+    """
+    Seconds the server asked us to wait (Retry-After header, gRPC RetryInfo,
+    or the delay quoted in the error message), or None.
+    """
+    if error is None:
+        return None
+    delay = getattr(error, "delay", None)
+    if isinstance(delay, (int, float)):
+        return min(float(delay), MAX_RETRY_AFTER)
+
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return min(max(float(value), 0.0), MAX_RETRY_AFTER)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+                return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+            except (TypeError, ValueError):
+                pass
+
+    try:
+        details = getattr(error, "details", None) or ()
+    except Exception:
+        details = ()
+    for detail in details if isinstance(details, (list, tuple)) else ():
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            seconds = getattr(retry_delay, "seconds", 0) + getattr(retry_delay, "nanos", 0) / 1e9
+            return min(float(seconds), MAX_RETRY_AFTER)
+
+    match = _RETRY_IN_RE.search(str(error)) or _RETRY_DELAY_RE.search(str(error))
+    if match:
+        return min(float(match.group(1)), MAX_RETRY_AFTER)
+    return None
+
+
+def backoff_delay(attempt, server_delay=None, base=2.0, cap=60.0, rng=random):
+    """
+    Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt)).
+    A server-supplied delay is honoured, plus up to `base` seconds of jitter
+    so queued rows do not all fire at the same moment.
+    """
+    if server_delay is not None:
+        return server_delay + rng.uniform(0, base)
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RetryQueue:
+    """
+    Rows (any hashable key) waiting to be retried, ordered by when they are due.
+
+    defer(key, error) schedules a retry; drain(fn) waits for each row in turn,
+    calls fn(key) and yields (key, result, None). A row that keeps raising
+    RetryLater is re-queued until max_attempts, then yielded as
+    (key, None, error).
+    """
+    def __init__(self, max_attempts=4, base=2.0, cap=60.0, clock=time.monotonic, sleep=time.sleep, rng=random):
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.stats = Counter()
+        self._clock = clock
+        self._sleep = sleep
+        self._rng = rng
+        self._heap = []
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def defer(self, key, error, attempt=1):
+        """
+        Queues `key` for retry number `attempt`; returns the delay in seconds.
+        """
+        delay = backoff_delay(attempt, retry_after(error), self.base, self.cap, self._rng)
+        heapq.heappush(self._heap, (self._clock() + delay, next(self._seq), key, attempt))
+        self.stats["deferred"] += 1
+        return delay
+
+    def drain(self, fn):
+        while self._heap:
+            due, _, key, attempt = heapq.heappop(self._heap)
+            wait = due - self._clock()
+            if wait > 0:
+                self._sleep(wait)
+            self.stats["retries"] += 1
+            try:
+                result = fn(key)
+            except RetryLater as e:
+                if attempt >= self.max_attempts:
+                    self.stats["gave_up"] += 1
+                    yield key, None, e
+                else:
+                    self.defer(key, e, attempt + 1)
+                continue
+            self.stats["recovered"] += 1
+            yield key, result, None
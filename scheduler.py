@@ -0,0 +1,95 @@
+"""
+Length-aware scheduling of translation work.
+
+Sheets mix one-word labels with 300-word video scripts. Dispatched in input
+order, a couple of giant cells near the end keep one worker busy while the
+others sit idle. Each cell gets a cost estimate instead (output tokens it
+will produce, glossary terms and markup it carries, model calls it needs)
+and work is handed out longest-first, which keeps the total wall time close
+to total work / workers. A ReorderBuffer puts finished rows back in input
+order for the autosave.
+"""
+import threading
+
+from compliance import CompiledGlossary
+from fastpath import FastPath
+from glossary import estimate_tokens
+from masking import mask
+
+DEFAULT_ROW_WORKERS = 4
+
+# Cost units are output-token equivalents. A model call has a fixed latency
+# floor; the JSON answer writes the text about three times (original,
+# improved, Dutch) and the verify pass once more.
+CALL_OVERHEAD = 40
+OUTPUT_FACTOR = 4
+TERM_COST = 3
+MARKER_COST = 2
+
+
+def estimate_cost(text, glossary=None, fast_path=None):
+    """
+    Estimated cost of translating one cell; 0 for cells that never reach the
+    model (empty, or answered by the fast path). `glossary` is a
+    CompiledGlossary or a glossary dict.
+    """
+    if not isinstance(text, str) or not text.strip():
+        return 0
+    if fast_path is not None and fast_path.classify(text):
+        return 0
+    if glossary and not isinstance(glossary, CompiledGlossary):
+        glossary = CompiledGlossary(glossary)
+    terms = len(glossary.terms_in(text)) if glossary else 0
+    markers = len(mask(text).tokens)
+    return 2 * CALL_OVERHEAD + OUTPUT_FACTOR * estimate_tokens(text) + TERM_COST * terms + MARKER_COST * markers
+
+
+def estimate_costs(texts, glossary_dict=None):
+    # Compiled once: each row looks up its own words instead of testing every term
+    glossary = CompiledGlossary(glossary_dict)
+    fast_path = FastPath(glossary_dict)
+    return [estimate_cost(text, glossary, fast_path) for text in texts]
+
+
+def longest_first(costs):
+    """
+    Row indices in dispatch order: most expensive first, ties in input order.
+    """
+    return sorted(range(len(costs)), key=lambda i: (-costs[i], i))
+
+
+def makespan(costs, workers, order=None):
+    """
+    Simulated wall time (in cost units) when `workers` take rows in `order`
+    (input order by default), each starting the next row as soon as it is free.
+    """
+    loads = [0] * max(1, workers)
+    for i in (range(len(costs)) if order is None else order):
+        slot = loads.index(min(loads))
+        loads[slot] += costs[i]
+    return max(loads)
+
+
+class ReorderBuffer:
+    """
+    Collects rows finished in any order and releases them in input order.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.next = 0
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def complete(self, index):
+        """
+        Marks `index` finished; returns the indices that can now be written,
+        in order (empty while an earlier row is still running).
+        """
+        with self._lock:
+            self._done.add(index)
+            ready = []
+            while self.next in self._done:
+                self._done.discard(self.next)
+                ready.append(self.next)
+                self.next += 1
+            return ready
@@ -0,0 +1,81 @@
+"""
+Sentence/paragraph segmentation for long cells.
+
+Long multi-line cells (video scripts, help articles) used to be flattened to
+one line and sent in a single request, where they hit max_output_tokens and
+broke the JSON. split_segments() cuts such cells into pieces at sentence
+boundaries, remembering the exact whitespace between pieces so that
+join_segments() can put the translation back together with the original
+line breaks. Soft wraps inside a sentence are still flattened, as before.
+"""
+import re
+
+# Cells up to this size are translated whole.
+LONG_CELL_CHARS = 600
+# Target size of a piece; consecutive sentences on the same line are merged up to this.
+MAX_PIECE_CHARS = 400
+# Pieces shorter than this (or starting lowercase) get the whole cell as context.
+MIN_CONTEXT_FREE_CHARS = 40
+
+# Whitespace after sentence-final punctuation (optionally closed by quotes/brackets),
+# or a blank line.
+_BOUNDARY_RE = re.compile(r'(?<=[.!?…:;])(?:["\'”’)\]]*)(\s+)|(\n\s*\n\s*)')
+
+
+def _split_sentences(text):
+    """
+    Returns [(sentence, separator_after), ...] covering text exactly.
+    """
+    units = []
+    pos = 0
+    for m in _BOUNDARY_RE.finditer(text):
+        sep_start = m.start(1) if m.group(1) is not None else m.start(2)
+        sentence = text[pos:sep_start]
+        if not sentence.strip():
+            continue
+        units.append((sentence, text[sep_start:m.end()]))
+        pos = m.end()
+    if pos < len(text):
+        units.append((text[pos:], ""))
+    return units
+
+
+def split_segments(text, long_cell_chars=LONG_CELL_CHARS, max_piece_chars=MAX_PIECE_CHARS):
+    """
+    Returns [(piece, separator_after), ...]. A cell that is not long comes back
+    as a single piece. Sentences are merged while they fit in max_piece_chars
+    and are separated by plain spaces; a separator containing a line break
+    always starts a new piece so the break survives reassembly.
+    """
+    if not isinstance(text, str) or len(text) <= long_cell_chars:
+        return [(text, "")]
+
+    pieces = []
+    for sentence, sep in _split_sentences(text):
+        if pieces:
+            prev_piece, prev_sep = pieces[-1]
+            if "\n" not in prev_sep and len(prev_piece) + len(prev_sep) + len(sentence) <= max_piece_chars:
+                pieces[-1] = (prev_piece + prev_sep + sentence, sep)
+                continue
+        pieces.append((sentence, sep))
+    return pieces
+
+
+def needs_context(piece):
+    """
+    Short fragments and pieces that continue a previous sentence are hard to
+    translate alone; those get the whole cell as reference context.
+    """
+    stripped = piece.strip()
+    return len(stripped) < MIN_CONTEXT_FREE_CHARS or stripped[:1].islower()
+
+
+def join_segments(pieces, translations):
+    """
+    Re-joins translated pieces with the separators recorded by split_segments.
+    """
+    out = []
+    for (_, sep), translated in zip(pieces, translations):
+        out.append(translated)
+        out.append(sep)
+    return "".join(out)
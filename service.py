@@ -0,0 +1,231 @@
+"""
+HTTP translation service around TranslatorBackend.
+
+Endpoints:
+    POST /translate        {"text": "..."}            -> one JSON result
+    POST /translate/batch  {"texts": ["...", ...]}    -> NDJSON, one line per text as it completes
+    GET  /health                                      -> {"status": "ok", ...}
+
+Concurrent requests are micro-batched: segments arriving within a few
+milliseconds of each other share one model call (TranslatorBackend.translate_batch),
+and identical segments already in flight are collapsed into a single request.
+
+Run:
+    python service.py --port 8080 --glossary glossary_data.csv
+    python service.py --engine deepl     # DeepL first pass, Gemini post-edits failing rows
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backend import TranslatorBackend
+from engines import format_engine_report, make_engine
+
+
+class MicroBatcher:
+    """
+    Collects segments for up to `window` seconds (or `max_batch` segments)
+    and translates them together. submit() returns a Future.
+    """
+    def __init__(self, backend, glossary_dict, window=0.005, max_batch=16, workers=4):
+        self.backend = backend
+        self.glossary_dict = glossary_dict
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = {"submitted": 0, "collapsed": 0, "batches": 0}
+        self._pending = []
+        self._inflight = {}
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        with self._cond:
+            self.stats["submitted"] += 1
+            future = self._inflight.get(text)
+            if future is not None:
+                # Same segment already queued or running: share its answer
+                self.stats["collapsed"] += 1
+                return future
+            future = Future()
+            self._inflight[text] = future
+            self._pending.append((text, future))
+            self._cond.notify()
+        return future
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+                # First segment arrived: keep the window open for companions
+                deadline = time.monotonic() + self.window
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                self._pending = self._pending[self.max_batch:]
+                self.stats["batches"] += 1
+            self._pool.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            results = self.backend.translate_batch(texts, self.glossary_dict)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self._cond:
+                for text, _ in batch:
+                    self._inflight.pop(text, None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
+
+
+def make_handler(batcher):
+    class TranslationHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, format, *args):
+            pass  # keep the console quiet; errors are returned to the client
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+
+        def do_GET(self):
+            if self.path == "/health":
+                health = {"status": "ok", **batcher.stats}
+                if batcher.backend.engine is not None:
+                    health["engine"] = batcher.backend.engine.report()
+                self._send_json(200, health)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            try:
+                payload = self._read_json()
+            except ValueError:
+                self._send_json(400, {"error": "invalid JSON body"})
+                return
+            if not isinstance(payload, dict):
+                self._send_json(400, {"error": "JSON body must be an object"})
+                return
+
+            if self.path == "/translate":
+                text = payload.get("text")
+                if not isinstance(text, str) or not text.strip():
+                    self._send_json(400, {"error": "'text' must be a non-empty string"})
+                    return
+                try:
+                    self._send_json(200, batcher.submit(text).result())
+                except Exception as e:
+                    self._send_json(502, {"error": str(e)})
+
+            elif self.path == "/translate/batch":
+                texts = payload.get("texts")
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    self._send_json(400, {"error": "'texts' must be a list of strings"})
+                    return
+                # Repeated texts share one future: keep every index it answers
+                futures = {}
+                for i, t in enumerate(texts):
+                    futures.setdefault(batcher.submit(t), []).append(i)
+                # Stream NDJSON: each line is written as soon as its segment is done
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+                self.end_headers()
+                for future in as_completed(futures):
+                    try:
+                        answer = future.result()
+                    except Exception as e:
+                        answer = {"error": str(e)}
+                    for index in futures[future]:
+                        line = {"index": index, **answer}
+                        self.wfile.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+            else:
+                self._send_json(404, {"error": "not found"})
+
+    return TranslationHandler
+
+
+def create_server(backend, glossary_dict, host="127.0.0.1", port=8080, window=0.005, max_batch=16):
+    """
+    Builds (but does not start) the HTTP server. Use port=0 for a free port.
+    """
+    batcher = MicroBatcher(backend, glossary_dict, window=window, max_batch=max_batch)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher))
+    server.daemon_threads = True
+    server.batcher = batcher
+    return server
+
+
+def main():
+    import pandas as pd
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Glossary-aware English->Dutch translation service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--glossary", default="glossary_data.csv", help="Glossary CSV (term, translation_nl).")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="Micro-batching window in milliseconds.")
+    parser.add_argument("--max-batch", type=int, default=16, help="Max segments per model call.")
+    parser.add_argument("--engine", choices=["llm", "deepl", "gemini", "local"], default="llm",
+                        help="First-pass MT engine; the LLM then only post-edits rows failing the glossary/rule checks.")
+    args = parser.parse_args()
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        print("Warning: GOOGLE_API_KEY not found in environment variables.")
+    backend = TranslatorBackend(api_key)
+    if args.engine != "llm":
+        backend.engine = make_engine(args.engine, backend=backend, auth_key=os.getenv("DEEPL_AUTH_KEY"))
+    glossary_dict = {}
+    if os.path.exists(args.glossary):
+        glossary_dict = backend.build_glossary_dict(pd.read_csv(args.glossary))
+    print(f"Glossary loaded: {len(glossary_dict)} terms")
+
+    server = create_server(backend, glossary_dict, args.host, args.port, args.window_ms / 1000.0, args.max_batch)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+        if backend.engine is not None:
+            print(format_engine_report(backend.engine.report()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,25 @@
 import pandas as pd
 import os
 
+from store import ResultsStore
+
+store_path = "TRANSLATION_RESULTS_V2.parquet"
 file_path = "TRANSLATION_RESULTS_V2.csv"
-if os.path.exists(file_path):
+store = ResultsStore(store_path)
+if store.exists() or os.path.exists(file_path):
     try:
-        df = pd.read_csv(file_path)
+        if store.exists():
+            # Only the first row group is read; the total comes from the footers
+            df, total = store.read(limit=20), store.count()
+        else:
+            df = pd.read_csv(file_path)
+            total = len(df)
         # Display first 20 rows
         with open("table_output_utf8.txt", "w", encoding="utf-8") as f:
             f.write(df.head(20).to_markdown(index=False))
-            f.write(f"\n... (Total rows: {len(df)})")
+            f.write(f"\n... (Total rows: {total})")
         print("Table saved to table_output_utf8.txt")
     except Exception as e:
-        print(f"Error reading CSV: {e}")
+        print(f"Error reading results: {e}")
 else:
     print("File not found.")
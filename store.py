@@ -0,0 +1,244 @@
+"""
+Parquet working store for results, reference data and translation memory.
+
+CSV, Excel, XLIFF and TMX stay the export formats; this is what the tools
+read back. A results store is a directory of Parquet parts: every append
+writes one new part (one row group) next to the others, so incremental
+writes never rewrite what is already on disk. Row counts come from the part
+footers without reading any data, reads are memory-mapped and load only the
+requested columns. Once there are many parts the small trailing ones are
+merged, and compact() folds everything into a single file.
+"""
+import glob
+import os
+
+# As exports.RESULT_COLUMNS; exports itself would load pandas on import
+RESULT_COLUMNS = ["original_english", "improved_english", "dutch_translation"]
+
+PART_PATTERN = "part-*.parquet"
+# Appends beyond this many parts trigger a compaction into one file
+MAX_PARTS = 64
+ROW_GROUP_ROWS = 4096
+CACHE_DIR = ".fetch_cache"
+
+
+def _cell(value):
+    # Parquet columns are typed; results are strings with None for missing
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def _seq(part):
+    return int(os.path.basename(part)[len("part-"):-len(".parquet")])
+
+
+def results_table(rows, columns=RESULT_COLUMNS):
+    """Arrow table of result dicts; every column is a string column."""
+    import pyarrow as pa
+
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    data = {column: [_cell(row.get(column)) for row in rows] for column in columns}
+    return pa.Table.from_pydict(data, schema=schema)
+
+
+def write_results(df, path):
+    """Writes a result frame to a single Parquet file (job outputs)."""
+    import pyarrow.parquet as pq
+
+    pq.write_table(results_table(df.to_dict("records"), list(df.columns)), path, row_group_size=ROW_GROUP_ROWS)
+
+
+class ResultsStore:
+    """
+    path:    directory holding the parts (created on first append)
+    columns: result columns, in order
+    """
+    def __init__(self, path, columns=RESULT_COLUMNS):
+        self.path = path
+        self.columns = list(columns)
+        self._recover()
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, PART_PATTERN)))
+
+    def _recover(self):
+        """
+        Finishes or discards a compaction that was interrupted. A merged file
+        renamed to ".merge-<first>-<last>.ready" is complete and replaces
+        parts first..last; a ".merge.tmp" one is incomplete and dropped.
+        """
+        for ready in glob.glob(os.path.join(self.path, ".merge-*.ready")):
+            first, last = (int(n) for n in os.path.basename(ready)[len(".merge-"):-len(".ready")].split("-"))
+            for part in self._parts():
+                if first <= _seq(part) <= last:
+                    os.remove(part)
+            os.replace(ready, os.path.join(self.path, f"part-{first:06d}.parquet"))
+        tmp = os.path.join(self.path, ".merge.tmp")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    def exists(self):
+        return bool(self._parts())
+
+    def _schema(self):
+        import pyarrow as pa
+
+        return pa.schema([(column, pa.string()) for column in self.columns])
+
+    def _table(self, rows):
+        return results_table(rows, self.columns)
+
+    def append(self, rows):
+        """
+        Appends result dicts (or a DataFrame) as one new part.
+        """
+        import pyarrow.parquet as pq
+
+        if hasattr(rows, "to_dict"):
+            rows = rows.to_dict("records")
+        if not rows:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        parts = self._parts()
+        path = os.path.join(self.path, f"part-{_seq(parts[-1]) + 1 if parts else 0:06d}.parquet")
+        pq.write_table(self._table(rows), f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        if len(parts) + 1 > MAX_PARTS:
+            self._merge_tail()
+
+    def _merge_tail(self):
+        """
+        Merges the trailing parts that are smaller than a row group into one.
+        Full parts are never rewritten, so appends stay cheap on large stores.
+        """
+        import pyarrow.parquet as pq
+
+        tail = []
+        for part in reversed(self._parts()):
+            if pq.read_metadata(part).num_rows >= ROW_GROUP_ROWS:
+                break
+            tail.insert(0, part)
+        if len(tail) > 1:
+            self._merge(tail)
+
+    def count(self):
+        """Number of stored rows, from the Parquet footers only."""
+        import pyarrow.parquet as pq
+
+        return sum(pq.read_metadata(part).num_rows for part in self._parts())
+
+    def read(self, columns=None, limit=None):
+        """
+        DataFrame of the stored rows in append order, with only `columns`
+        loaded. `limit` stops after that many rows (whole row groups are read).
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = list(columns) if columns else self.columns
+        tables = []
+        rows = 0
+        for part in self._parts():
+            pf = pq.ParquetFile(part, memory_map=True)
+            for group in range(pf.num_row_groups):
+                if limit is not None and rows >= limit:
+                    break
+                table = pf.read_row_group(group, columns=columns)
+                tables.append(table)
+                rows += table.num_rows
+        if not tables:
+            return self._schema().empty_table().select(columns).to_pandas()
+        df = pa.concat_tables(tables).to_pandas()
+        return df.head(limit) if limit is not None else df
+
+    def replace(self, df):
+        """
+        Rewrites the store with the rows of `df` (repair mode), as one file.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        self._merge(self._parts(), self._table(df.to_dict("records")))
+
+    def compact(self):
+        """Merges all parts into one file with ROW_GROUP_ROWS-sized row groups."""
+        parts = self._parts()
+        if len(parts) > 1:
+            self._merge(parts)
+
+    def _merge(self, parts, table=None):
+        """
+        Replaces `parts` (consecutive) by one file holding `table`, by default
+        their concatenated rows.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if table is None:
+            table = pa.concat_tables([pq.read_table(part, memory_map=True) for part in parts])
+        first, last = (_seq(parts[0]), _seq(parts[-1])) if parts else (0, 0)
+        tmp = os.path.join(self.path, ".merge.tmp")
+        pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS)
+        # Once renamed to .ready the merged file is complete; _recover finishes the swap, also after a crash
+        os.replace(tmp, os.path.join(self.path, f".merge-{first:06d}-{last:06d}.ready"))
+        self._recover()
+
+    def export_csv(self, path):
+        """Writes the store as the CSV deliverable."""
+        self.read().to_csv(path, index=False)
+
+
+def read_csv_cached(path, columns=None, cache_dir=CACHE_DIR):
+    """
+    Reads a local CSV through a Parquet copy in `cache_dir` that is rebuilt
+    whenever the CSV changes (size or modification time), so repeated reads
+    skip CSV parsing and load only `columns`.
+    """
+    import pandas as pd
+
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    cached = os.path.join(cache_dir, f"{name}.{stat.st_size}.{stat.st_mtime_ns}.parquet")
+    if not os.path.exists(cached):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        os.makedirs(cache_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(cache_dir, f"{name}.*.*.parquet")):
+            os.remove(stale)
+        df.to_parquet(f"{cached}.tmp", index=False)
+        os.replace(f"{cached}.tmp", cached)
+    return pd.read_parquet(cached, columns=list(columns) if columns else None, memory_map=True)
+
+
+def save_memory(memory, path):
+    """
+    Writes a TranslationMemory to a Parquet file (key, JSON entry).
+    """
+    import json
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    keys, entries = [], []
+    for key, entry in memory.items():
+        keys.append(key)
+        entries.append(json.dumps(entry, ensure_ascii=False))
+    table = pa.table({"key": pa.array(keys, pa.string()), "entry": pa.array(entries, pa.string())})
+    pq.write_table(table, f"{path}.tmp", row_group_size=ROW_GROUP_ROWS)
+    os.replace(f"{path}.tmp", path)
+    return len(keys)
+
+
+def load_memory(memory, path):
+    """
+    Loads entries saved by save_memory into `memory`. Returns the number loaded.
+    """
+    import json
+
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(path):
+        return 0
+    table = pq.read_table(path, memory_map=True)
+    keys = table.column("key").to_pylist()
+    entries = [json.loads(entry) for entry in table.column("entry").to_pylist()]
+    memory.update(zip(keys, entries))
+    return len(keys)
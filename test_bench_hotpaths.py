@@ -0,0 +1,30 @@
+"""
+Smoke run of the hot path benchmarks (bench_hotpaths.py).
+"""
+import json
+import sys
+
+import pytest
+
+import bench_hotpaths
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["bench_hotpaths.py", *args])
+    return bench_hotpaths.main()
+
+
+def test_missing_baseline_fails_before_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench_hotpaths, "run_benchmarks", lambda **kwargs: pytest.fail("ran without a baseline"))
+    assert run_main(monkeypatch, "--baseline", str(tmp_path / "missing.json")) == 2
+    assert not (tmp_path / "missing.json").exists()
+
+
+def test_quick_run_saves_and_compares_a_baseline(tmp_path, monkeypatch):
+    baseline = tmp_path / "baseline.json"
+    monkeypatch.setattr(bench_hotpaths, "RESULTS_FILE", str(tmp_path / "results.json"))
+    assert run_main(monkeypatch, "--quick", "--repeat", "1", "--save-baseline", "--baseline", str(baseline)) == 0
+    saved = json.loads(baseline.read_text())
+    assert saved["quick"] and len(saved["results"]) == 10
+    # Every benchmark ran and compared; the threshold only keeps timing noise out
+    assert run_main(monkeypatch, "--quick", "--repeat", "1", "--threshold", "100", "--baseline", str(baseline)) == 0
@@ -0,0 +1,80 @@
+"""
+Tests for the glossary compliance scanner (compliance.py) and the batched
+term repair in translate_script.
+"""
+import json
+
+import pandas as pd
+
+import translate_script
+from compliance import CompiledGlossary, format_report, scan
+
+GLOSSARY = {
+    "Driver•i app": "Driver•i-app",
+    "app": "app",
+    "camera": "camera",
+    "LED": "LED",
+    "Vehicle Groups": "Voertuiggroepen",
+    "Settings": "Instellingen",
+    "settings": "instellingen",
+}
+
+
+def test_terms_match_on_word_boundaries_longest_first():
+    glossary = CompiledGlossary(GLOSSARY)
+    assert glossary.terms_in("Privacy mode is enabled") == []
+    assert glossary.terms_in("Open the Driver•i app") == [("Driver•i app", "Driver•i-app")]
+    assert glossary.terms_in("Open Settings, then settings") == [("Settings", "Instellingen")]
+    assert glossary.terms_in("Open the\n  Vehicle   Groups") == [("Vehicle Groups", "Voertuiggroepen")]
+
+
+def test_missing_terms_accepts_compounds_and_casing():
+    glossary = CompiledGlossary(GLOSSARY)
+    assert glossary.missing_terms("Check the camera", "Controleer de camerabeelden") == []
+    assert glossary.missing_terms("Open VEHICLE GROUPS", "OPEN VOERTUIGGROEPEN") == []
+    assert glossary.missing_terms("Open Vehicle Groups", "Open voertuiggroepen") == []
+    assert glossary.missing_terms("Open Vehicle Groups", "Open de groepen") == [("Vehicle Groups", "Voertuiggroepen")]
+
+
+def test_scan_reports_violations_and_skips_failed_rows():
+    sources = ["Open the Driver•i app", "Open Vehicle Groups", "Check the camera", "Open Settings", "No terms here"]
+    dutch = ["Open de Driver•i-app", "Open de groepen", "ERROR_FAILED", None, "Geen termen"]
+    violations, report = scan(sources, dutch, GLOSSARY)
+    assert violations == {1: [("Vehicle Groups", "Voertuiggroepen")]}
+    assert report["rows"] == 3 and report["rows_with_terms"] == 2
+    assert report["compliance_pct"] == 50.0
+    assert "50.0%" in format_report(report)
+
+
+def test_repair_sends_batches_and_keeps_only_compliant_fixes(monkeypatch):
+    calls = []
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    def fake_generate(template, **values):
+        rows = json.loads(values["rows"])
+        calls.append(rows)
+        fixes = []
+        for row in rows:
+            if "lost" in row["english"]:
+                fixes.append({"id": row["id"], "dutch_translation": "Open Voertuiggroepen"})  # drops the tag
+            else:
+                fixes.append({"id": row["id"], "dutch_translation": row["dutch"].replace("groepen", "Voertuiggroepen")})
+        return Response(json.dumps({"fixes": fixes}))
+
+    monkeypatch.setattr(translate_script, "_generate", fake_generate)
+    df = pd.DataFrame({
+        "original_english": ["Open Vehicle Groups", "Open <b>lost</b> Vehicle Groups", "Open Settings", "Vehicle Groups"],
+        "improved_english": ["", "", "", ""],
+        "dutch_translation": ["Open groepen", "Open <b>kwijt</b> groepen", "Open Instellingen", "groepen"],
+    })
+    report = translate_script.repair_glossary_terms(df, GLOSSARY, batch_size=2)
+
+    assert [len(batch) for batch in calls] == [2, 1]
+    assert calls[0][0]["terms"] == ["'Vehicle Groups' -> 'Voertuiggroepen'"]
+    assert df["dutch_translation"][0] == "Open Voertuiggroepen"
+    assert df["dutch_translation"][1] == "Open <b>kwijt</b> groepen"
+    assert df["dutch_translation"][3] == "Voertuiggroepen"
+    assert report["violations"] == 1
@@ -0,0 +1,140 @@
+"""
+Tests for the MT engine interface (engines.py) and the two-stage
+engine + LLM post-edit mode of TranslatorBackend.
+"""
+import json
+
+import pytest
+
+from backend import TranslatorBackend
+from conftest import FakeModelFactory, default_responder
+from engines import GeminiEngine, LocalEngine, MTEngine, format_engine_report
+
+GLOSSARY = {"Vehicle Groups": "Voertuiggroepen", "camera": "camera"}
+
+
+def post_edit_responder(prompt, model):
+    if model.system_instruction.strip().startswith("Role: Dutch post-editor"):
+        return "Open Voertuiggroepen"
+    return "Vertaalde tekst"
+
+
+def test_engine_meters_calls_and_rejects_wrong_counts():
+    class Broken(MTEngine):
+        name = "broken"
+
+        def _translate(self, segments, target, context):
+            return segments[:1]
+
+    engine = LocalEngine({"Save  changes": "Wijzigingen opslaan"})
+    engine.price_per_m_chars = 10.0
+    assert engine.translate(["Save changes", "Unknown text"]) == ["Wijzigingen opslaan", "Unknown text"]
+    report = engine.report()
+    assert (report["calls"], report["segments"], report["chars"]) == (1, 2, 24)
+    assert report["cost_usd"] == round(24 / 1e6 * 10.0, 4)
+    assert "2 segments in 1 calls" in format_engine_report(report)
+
+    broken = Broken()
+    with pytest.raises(ValueError):
+        broken.translate(["a", "b"])
+    assert broken.report()["errors"] == 1
+
+
+def test_only_rows_failing_checks_are_post_edited():
+    factory = FakeModelFactory(post_edit_responder)
+    engine = LocalEngine({
+        "Check the camera": "Controleer de camera",
+        "Open Vehicle Groups": "Open groepen",
+        "Press ⟦0⟧Save⟦1⟧ to save": "Druk op Opslaan om op te slaan",
+    })
+    backend = TranslatorBackend("k", model_factory=factory, engine=engine)
+    results = backend.translate_batch(
+        ["Check the camera", "Open Vehicle Groups", "Press <b>Save</b> to save"], GLOSSARY
+    )
+
+    assert results[0]["dutch_translation"] == "Controleer de camera"
+    assert results[1]["dutch_translation"] == "Open Voertuiggroepen"
+    # Marker lost by the engine and not restored by the post-edit: full LLM translation
+    assert results[2]["dutch_translation"] == "Vertaalde tekst"
+    post_edits = [c for c in factory.log if "post-editor" in c["system"]]
+    assert len(post_edits) == 2
+    assert "lost markers" in post_edits[1]["prompt"]
+    assert "glossary terms not used: 'Vehicle Groups' -> 'Voertuiggroepen'" in post_edits[0]["prompt"]
+    report = backend.run_report()
+    assert (report["mt_rows"], report["post_edits"], report["post_edit_fallbacks"]) == (2, 1, 1)
+    assert report["engine"]["segments"] == 3
+
+
+def test_untranslated_and_failed_engine_output_is_post_edited():
+    factory = FakeModelFactory(post_edit_responder)
+
+    class Down(MTEngine):
+        def _translate(self, segments, target, context):
+            raise ConnectionError("engine down")
+
+    backend = TranslatorBackend("k", model_factory=factory, engine=LocalEngine())
+    backend.translate_cell("Open the Vehicle Groups page", GLOSSARY)
+    assert "left untranslated" in factory.log[-1]["prompt"]
+
+    backend = TranslatorBackend("k", model_factory=factory, engine=Down())
+    result = backend.translate_cell("Open Vehicle Groups", GLOSSARY)
+    assert result["dutch_translation"] == "Open Voertuiggroepen"
+    assert backend.run_report()["engine_errors"] == 1
+
+
+def test_gemini_engine_uses_one_batch_call():
+    def responder(prompt, model):
+        items = json.loads(prompt.split("SEGMENTS:")[1])
+        return json.dumps({"translations": [
+            {"id": item["id"], "improved_english": item["text"], "dutch_translation": f"NL {item['text']}"}
+            for item in items
+        ]})
+
+    factory = FakeModelFactory(responder)
+    engine = GeminiEngine(TranslatorBackend("k", model_factory=factory))
+    assert engine.translate(["One", "Two"]) == ["NL One", "NL Two"]
+    assert len(factory.log) == 1
+    assert engine.stats["input_tokens"] > 0 and engine.report()["cost_usd"] > 0
+
+
+def test_engine_rows_keep_the_source_unless_improvement_is_asked_for():
+    def responder(prompt, model):
+        if "English technical editor" in model.system_instruction:
+            return "Open the camera settings"
+        return default_responder(prompt, model)
+
+    engine = LocalEngine({"open camera settings": "Open camera-instellingen"})
+    factory = FakeModelFactory(responder)
+    backend = TranslatorBackend("k", model_factory=factory, engine=engine)
+    assert backend.translate_cell("open camera settings", GLOSSARY)["improved_english"] == "open camera settings"
+    assert backend.run_report()["mt_improved_english"] == "cleaned source"
+    assert not factory.log
+
+    backend = TranslatorBackend("k", model_factory=factory, engine=engine, improve_engine_rows=True)
+    result = backend.translate_cell("open camera settings", GLOSSARY)
+    assert result == {
+        "original_english": "open camera settings",
+        "improved_english": "Open the camera settings",
+        "dutch_translation": "open camera-instellingen",
+    }
+
+
+def test_pieces_of_a_long_cell_share_one_engine_call_and_their_context():
+    class Recording(LocalEngine):
+        def _translate(self, segments, target, context):
+            self.calls = getattr(self, "calls", []) + [(list(segments), context)]
+            return super()._translate(segments, target, context)
+
+    first = "Open the settings page of the fleet portal and check every option that is listed there. " * 7
+    engine = Recording()
+    factory = FakeModelFactory(post_edit_responder)
+    backend = TranslatorBackend("k", model_factory=factory, engine=engine)
+    backend.translate_cell(first + "Then open Vehicle Groups.\n\nSave your changes.", GLOSSARY)
+
+    assert len(engine.calls) == 1
+    segments, context = engine.calls[0]
+    assert len(segments) == 3 and context.startswith("Open the settings page")
+    # Untranslated drafts are post-edited; the short piece gets the whole cell as context
+    post_edits = {c["prompt"].split('English: "')[1].split('"')[0]: c["prompt"] for c in factory.log if "post-editor" in c["system"]}
+    assert "CONTEXT" in post_edits["Save your changes."]
+    assert "CONTEXT" not in post_edits[segments[0]]
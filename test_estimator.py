@@ -0,0 +1,69 @@
+"""
+Tests for the dry-run estimator (estimator.py).
+"""
+from backend import TranslatorBackend
+from conftest import FakeModelFactory
+from estimator import MAX_OUTPUT_TOKENS, MIN_OUTPUT_TOKENS, Estimator, format_duration, format_estimate, output_budget
+from memory import TranslationMemory
+
+
+def make_estimator(factory=None):
+    backend = TranslatorBackend("k", model_factory=factory or FakeModelFactory())
+    return Estimator.for_backend(backend)
+
+
+def test_counts_follow_the_pipeline():
+    memory = TranslationMemory()
+    memory.put("Already translated", {"improved_english": "x", "dutch_translation": "y"})
+    texts = ["Open the app", "Open  the app", "", None, "42", "Already translated", "Close the app"]
+    est = make_estimator().estimate(texts, {}, memory=memory)
+
+    assert est["cells"] == 5 and est["empty_cells"] == 2
+    assert est["repeats"] == 1
+    assert est["fast_path"] == 1
+    assert est["memory_hits"] == 1
+    assert est["model_segments"] == 2 and est["model_calls"] == 4
+    assert est["input_tokens"] > 0 and est["output_tokens"] > 0 and est["cost_usd"] > 0
+
+
+def test_no_model_calls_are_made():
+    factory = FakeModelFactory()
+    make_estimator(factory).estimate(["Open the app", "Close the app"], {})
+    assert factory.log == []
+
+
+def test_glossary_terms_and_long_cells_cost_tokens():
+    estimator = make_estimator()
+    plain = estimator.estimate(["Open the camera settings"], {})
+    with_terms = estimator.estimate(["Open the camera settings"], {"camera": "camera", "settings": "instellingen"})
+    assert with_terms["input_tokens"] > plain["input_tokens"]
+
+    long_cell = "Keep both hands on the wheel while the camera records the road. " * 20
+    est = estimator.estimate([long_cell], {})
+    assert est["segments"] > 1
+
+
+def test_concurrency_and_rate_limits_drive_wall_time():
+    estimator = make_estimator()
+    texts = [f"Row number {word} needs a translation" for word in ("one", "two", "three", "four", "five", "six")]
+    sequential = estimator.estimate(texts, {}, concurrency=1)
+    parallel = estimator.estimate(texts, {}, concurrency=3)
+    assert parallel["wall_seconds"] < sequential["wall_seconds"]
+    assert parallel["bound"] == "latency"
+
+    throttled = estimator.estimate(texts, {}, concurrency=3, rpm=2)
+    assert throttled["bound"] == "rate limit"
+    assert throttled["wall_seconds"] == 60.0 * throttled["model_calls"] / 2
+
+
+def test_report_lines():
+    lines = format_estimate(make_estimator().estimate(["Open the app"], {}))
+    assert any(line.startswith("Estimated cost:") for line in lines)
+    assert format_duration(3725) == "1h 02m" and format_duration(65) == "1m 05s" and format_duration(4) == "4s"
+
+
+def test_output_budget_follows_segment_length():
+    assert output_budget("translate_json", {"source": "Open the app"}) == MIN_OUTPUT_TOKENS
+    long_text = "word " * 600
+    assert output_budget("translate_json", {"source": long_text}) > output_budget("translate_json_no_echo", {"source": long_text}) > MIN_OUTPUT_TOKENS
+    assert output_budget("translate_json", {"source": long_text * 10}) == MAX_OUTPUT_TOKENS
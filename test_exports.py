@@ -0,0 +1,40 @@
+"""
+Tests for the on-demand export cache (exports.py).
+"""
+import pandas as pd
+
+from exports import ExportCache, generate_xliff, result_fingerprint
+
+
+def frame(dutch="Opslaan"):
+    return pd.DataFrame({"original_english": ["Save"], "improved_english": ["Save"], "dutch_translation": [dutch]})
+
+
+def test_exports_are_generated_once_per_result_set():
+    cache = ExportCache()
+    df = frame()
+    first = cache.get(df, "xlsx")
+    assert cache.get(df, "xlsx") is first
+    assert cache.stats == {"hits": 1, "files": 0, "generated": 1}
+    cache.get(frame("Bewaren"), "xlsx")
+    assert cache.stats["generated"] == 2
+    assert result_fingerprint(df) != result_fingerprint(frame("Bewaren"))
+
+
+def test_registered_files_are_served_while_unchanged(tmp_path):
+    df = frame()
+    path = tmp_path / "job.xlf"
+    path.write_text(generate_xliff(df), encoding="utf-8")
+    fp = result_fingerprint(df)
+
+    cache = ExportCache()
+    cache.register_files(fp, {"xlf": str(path)})
+    assert cache.get(df, "xlf", fp) == path.read_bytes()
+    assert cache.stats["files"] == 1
+
+    # an edited file is no longer trusted
+    cache = ExportCache()
+    cache.register_files(fp, {"xlf": str(path)})
+    path.write_text("edited by hand", encoding="utf-8")
+    assert cache.get(df, "xlf", fp) == generate_xliff(df).encode("utf-8")
+    assert cache.stats["generated"] == 1
@@ -0,0 +1,44 @@
+"""
+Tests for the local fast path (fastpath.py) and its use in TranslatorBackend.
+"""
+from fastpath import FastPath, match_casing
+
+GLOSSARY = {"Settings": "Instellingen", "feedback": "feedback", "Driver•i app": "Driver•i-app"}
+
+
+def test_classify_local_cases():
+    fast = FastPath(GLOSSARY)
+    assert fast.classify("2024") == "number"
+    assert fast.classify("12:30") == "number"
+    assert fast.classify("v2.1.0") == "version"
+    assert fast.classify("https://example.com/help") == "markup"
+    assert fast.classify("help@netradyne.com") == "markup"
+    assert fast.classify("Driver•i") == "markup"
+    assert fast.classify("{count}") == "markup"
+    assert fast.classify("settings") == "glossary"
+    # decimals and real sentences still go to the model
+    assert fast.classify("1.5") is None
+    assert fast.classify("Open the settings") is None
+
+
+def test_resolve_mirrors_casing():
+    fast = FastPath(GLOSSARY)
+    assert fast.resolve("Settings") == ("Instellingen", "glossary")
+    assert fast.resolve("settings") == ("instellingen", "glossary")
+    assert fast.resolve("SETTINGS") == ("INSTELLINGEN", "glossary")
+    assert fast.resolve("Feedback") == ("Feedback", "glossary")
+    assert fast.resolve("  Driver•i   app ") == ("Driver•i-app", "glossary")
+    assert fast.resolve("v2.1.0") == ("v2.1.0", "version")
+    assert match_casing("instellingen", "Settings") == "Instellingen"
+
+
+def test_backend_skips_the_model_for_local_cells(fake_backend, fake_factory):
+    results = [fake_backend.translate_cell(t, GLOSSARY) for t in ["Settings", "42", "Open the app"]]
+    assert results[0]["dutch_translation"] == "Instellingen"
+    assert results[1]["dutch_translation"] == "42"
+    # only "Open the app" reached the model (JSON call + verify call)
+    assert len(fake_factory.log) == 2
+    report = fake_backend.run_report()
+    assert report["cells"] == 3
+    assert report["local_cells"] == 2
+    assert report["local_pct"] == 66.7
@@ -0,0 +1,109 @@
+"""
+Tests for the conditional fetch cache (fetch.py) against a local HTTP server.
+"""
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fetch import NOT_MODIFIED, OFFLINE, UNCHANGED, UPDATED, fetch_csv
+
+
+class SheetServer:
+    """Serves one CSV body; honours If-None-Match when `etags` is on."""
+    def __init__(self, body, etags=True):
+        self.body = body
+        self.etags = etags
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                server.requests.append(dict(self.headers))
+                etag = '"%s"' % hashlib.md5(server.body).hexdigest()
+                if server.etags and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                if server.etags:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(server.body)))
+                self.end_headers()
+                self.wfile.write(server.body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/export?format=csv"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+@pytest.fixture
+def sheet():
+    server = SheetServer(b"term,translation_nl\nSettings,Instellingen\n")
+    yield server
+    server.close()
+
+
+def test_etag_roundtrip_uses_snapshot(sheet, tmp_path):
+    csv_path = tmp_path / "glossary_data.csv"
+    cache = tmp_path / "cache"
+
+    df, status = fetch_csv(sheet.url, str(csv_path), cache_dir=str(cache))
+    assert status == UPDATED
+    assert df["translation_nl"].tolist() == ["Instellingen"]
+    assert csv_path.exists()
+
+    df, status = fetch_csv(sheet.url, str(csv_path), cache_dir=str(cache))
+    assert status == NOT_MODIFIED
+    assert "If-None-Match" in sheet.requests[-1]
+    assert df["term"].tolist() == ["Settings"]
+
+    sheet.body = b"term,translation_nl\nSettings,Instellingen\nSave,Opslaan\n"
+    df, status = fetch_csv(sheet.url, str(csv_path), cache_dir=str(cache))
+    assert status == UPDATED
+    assert len(df) == 2
+
+
+def test_same_hash_without_etag_skips_parse(tmp_path):
+    server = SheetServer(b"a,b\n1,2\n", etags=False)
+    try:
+        csv_path = tmp_path / "source_doc_data.csv"
+        fetch_csv(server.url, str(csv_path), cache_dir=str(tmp_path))
+        csv_path.write_text("changed locally")
+        df, status = fetch_csv(server.url, str(csv_path), cache_dir=str(tmp_path))
+        assert status == UNCHANGED
+        assert df["a"].tolist() == [1]
+        # the CSV copy is only rewritten when the content changed
+        assert csv_path.read_text() == "changed locally"
+    finally:
+        server.close()
+
+
+def test_offline_falls_back_to_snapshot(sheet, tmp_path):
+    csv_path = tmp_path / "glossary_data.csv"
+    fetch_csv(sheet.url, str(csv_path), cache_dir=str(tmp_path))
+    url = sheet.url
+    sheet.close()
+    df, status = fetch_csv(url, str(csv_path), cache_dir=str(tmp_path), timeout=1)
+    assert status == OFFLINE
+    assert df["term"].tolist() == ["Settings"]
+
+
+def test_offline_mode_makes_no_request(sheet, tmp_path):
+    csv_path = tmp_path / "glossary_data.csv"
+    fetch_csv(sheet.url, str(csv_path), cache_dir=str(tmp_path))
+    requests_before = len(sheet.requests)
+    df, status = fetch_csv(sheet.url, str(csv_path), cache_dir=str(tmp_path), offline=True)
+    assert status == OFFLINE
+    assert len(sheet.requests) == requests_before
+    assert df["term"].tolist() == ["Settings"]
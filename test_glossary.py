@@ -0,0 +1,52 @@
+"""
+Tests for glossary context selection (glossary.py).
+"""
+from glossary import estimate_tokens, format_terms, match_terms, select_terms
+
+GLOSSARY = {
+    "app": "app",
+    "Driver•i app": "Driver•i-app",
+    "Driver": "Bestuurder",
+    "Vehicle Groups": "Voertuiggroepen",
+    "Alert": "Waarschuwing",
+    "alert": "waarschuwing",
+}
+
+
+def test_nested_term_is_dropped():
+    pairs = select_terms("Open the Driver•i app now", GLOSSARY)
+    terms = [t for t, _ in pairs]
+    assert "Driver•i app" in terms
+    assert "app" not in terms
+    assert "Driver" not in terms
+
+
+def test_nested_term_kept_when_it_also_appears_alone():
+    pairs = select_terms("The Driver•i app is an app for drivers", GLOSSARY)
+    terms = [t for t, _ in pairs]
+    assert "Driver•i app" in terms
+    assert "app" in terms
+
+
+def test_ranked_by_specificity_then_position():
+    pairs = select_terms("Alert for Vehicle Groups", GLOSSARY)
+    assert [t for t, _ in pairs] == ["Vehicle Groups", "Alert"]
+
+
+def test_case_variant_matching_text_wins():
+    matches = match_terms("an alert was raised", GLOSSARY)
+    assert [m["term"] for m in matches] == ["alert"]
+
+
+def test_token_budget_is_respected():
+    glossary = {f"term{i:03d}": f"vertaling{i:03d}" for i in range(100)}
+    text = " ".join(glossary)
+    pairs = select_terms(text, glossary, token_budget=50)
+    rendered = format_terms(pairs)
+    assert pairs
+    assert sum(estimate_tokens(line) + 1 for line in rendered.splitlines()) <= 50
+
+
+def test_no_match_returns_empty():
+    assert select_terms("nothing relevant here", GLOSSARY) == []
+    assert format_terms([]) == ""
@@ -0,0 +1,47 @@
+"""
+Import-time checks: importing the CLI/backend modules (and running --help)
+must not load the Gemini SDK, requests or openpyxl; those load on first use.
+"""
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LAZY_MODULES = ("google.generativeai", "requests", "openpyxl")
+# Generous ceiling; the cold import used to take well over a second with genai
+IMPORT_BUDGET_SECONDS = 1.0
+
+
+def import_times(args):
+    """
+    Runs python -X importtime and returns {module: cumulative seconds}.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=HERE, capture_output=True, text=True, timeout=60,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative) / 1e6
+        except ValueError:
+            continue  # header line
+    return times
+
+
+def test_modules_import_without_heavy_dependencies():
+    times = import_times(["-c", "import translate_script, backend, jobs, service, fetch"])
+    loaded = [m for m in LAZY_MODULES if m in times]
+    assert loaded == []
+    print(f"\ntranslate_script import: {times['translate_script'] * 1000:.0f} ms")
+    assert times["translate_script"] < IMPORT_BUDGET_SECONDS
+
+
+def test_cli_help_is_fast():
+    times = import_times(["translate_script.py", "--help"])
+    assert [m for m in LAZY_MODULES if m in times] == []
+    assert "pandas" not in times
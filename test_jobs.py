@@ -0,0 +1,118 @@
+"""
+Tests for the background job runner (jobs.py).
+"""
+import os
+import threading
+import time
+
+from conftest import FakeModelFactory, default_responder
+from exports import generate_csv_bytes, result_fingerprint
+from jobs import CANCELLED, DONE, JobManager
+
+
+def wait_for(job, timeout=10):
+    deadline = time.time() + timeout
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.02)
+    return job
+
+
+def test_job_runs_in_background_and_writes_outputs(fake_backend, tmp_path):
+    manager = JobManager(output_dir=str(tmp_path))
+    job = manager.submit(fake_backend, ["Open the app", "", "Close the app"], {"app": "app"}, name="t")
+    wait_for(job)
+
+    assert job.status == DONE
+    assert job.done == job.total == 3
+    df = job.results_frame()
+    assert list(df["dutch_translation"]) == ["Vertaalde tekst", "", "Vertaalde tekst"]
+    for path in job.outputs.values():
+        assert os.path.exists(path)
+    assert job.report["rows"] == 2
+    assert set(manager.list_saved_outputs()) == set(job.outputs.values())
+    # downloads of the finished results come straight from the autosaved files
+    with open(job.outputs["xlsx"], "rb") as f:
+        assert manager.exports.get(df, "xlsx", job.fingerprint) == f.read()
+    assert manager.exports.stats["files"] == 1
+    # the autosave CSV is byte-identical to a regenerated export
+    with open(job.outputs["csv"], "rb") as f:
+        assert f.read() == generate_csv_bytes(df)
+
+
+def test_several_jobs_and_cancel(fake_factory, tmp_path):
+    from backend import TranslatorBackend
+
+    manager = JobManager(output_dir=str(tmp_path), max_jobs=2)
+    jobs = [
+        manager.submit(TranslatorBackend("k", model_factory=fake_factory), ["a"] * 3, {}, name=f"job{i}")
+        for i in range(2)
+    ]
+    slow = manager.submit(TranslatorBackend("k", model_factory=fake_factory), ["b"] * 500, {}, name="slow")
+    manager.cancel(slow.id)
+    for job in jobs + [slow]:
+        wait_for(job)
+    assert [j.status for j in jobs] == [DONE, DONE]
+    assert slow.status == CANCELLED
+    assert slow.done < slow.total
+    assert len(manager.list_jobs()) == 3
+
+
+def test_cancel_starts_no_new_rows(tmp_path):
+    from backend import TranslatorBackend
+
+    started = threading.Event()
+
+    def slow_responder(prompt, model):
+        started.set()
+        time.sleep(0.1)
+        return default_responder(prompt, model)
+
+    factory = FakeModelFactory(slow_responder)
+    manager = JobManager(output_dir=str(tmp_path))
+    texts = [f"Open report {i} now" for i in range(20)]
+    job = manager.submit(TranslatorBackend("k", model_factory=factory), texts, {}, name="c", workers=2)
+    started.wait(5)
+    manager.cancel(job.id)
+    wait_for(job)
+    time.sleep(0.5)
+
+    assert job.status == CANCELLED
+    # Only the rows already running when the job was cancelled reached the model
+    translated = {text for text in texts for call in factory.log if text in call["prompt"]}
+    assert len(translated) <= 2
+
+
+def test_cancelled_job_exports_every_finished_row(tmp_path):
+    from backend import TranslatorBackend
+
+    long_text = "Keep both hands on the wheel while the camera records the road ahead."
+    gate = threading.Event()
+
+    def responder(prompt, model):
+        if long_text in prompt:
+            gate.wait(5)
+        return default_responder(prompt, model)
+
+    manager = JobManager(output_dir=str(tmp_path))
+    texts = [long_text] + [f"Open report {i} now" for i in range(20)]
+    job = manager.submit(TranslatorBackend("k", model_factory=FakeModelFactory(responder)), texts, {}, workers=2)
+    deadline = time.time() + 5
+    while job.done < 3 and time.time() < deadline:
+        time.sleep(0.01)
+    manager.cancel(job.id)
+    gate.set()
+    wait_for(job)
+
+    assert job.status == CANCELLED
+    df = job.results_frame()
+    # Row 0 never finished, yet the rows done after it are exported
+    assert len(df) == job.total
+    finished = [i for i in range(job.total) if job.results.status[i]]
+    assert len(finished) >= 3 and 0 not in finished
+    assert [i for i, t in enumerate(df["dutch_translation"]) if t] == finished
+    with open(job.outputs["csv"], "rb") as f:
+        assert f.read() == generate_csv_bytes(df)
+    # Downloads served from the registered files hold the fingerprinted rows
+    assert job.fingerprint == result_fingerprint(df)
+    assert manager.exports.get(df, "csv", job.fingerprint) == generate_csv_bytes(df)
+    assert manager.exports.stats["files"] == 1
@@ -0,0 +1,137 @@
+"""
+Tests for the tolerant JSON parser and how the backend counts recoveries.
+"""
+import json
+
+import pytest
+
+from conftest import FakeModelFactory, FakeResponse
+from backend import TranslatorBackend
+from json_recovery import ParseError, parse_complete_json, parse_model_json
+
+
+def test_valid_json_has_no_issues():
+    data, issues = parse_model_json('{"improved_english": "Hi", "dutch_translation": "Hoi"}')
+    assert data["dutch_translation"] == "Hoi"
+    assert issues == set()
+
+
+def test_fences_are_stripped_silently():
+    data, issues = parse_model_json('```json\n{"dutch_translation": "Hoi"}\n```')
+    assert data == {"dutch_translation": "Hoi"}
+    assert issues == set()
+
+
+def test_unescaped_quotes_are_recovered():
+    text = '{"improved_english": "Click "Save" now", "dutch_translation": "Klik op "Opslaan""}'
+    data, issues = parse_model_json(text)
+    assert data["improved_english"] == 'Click "Save" now'
+    assert data["dutch_translation"] == 'Klik op "Opslaan"'
+    assert "unescaped_quote" in issues
+
+
+def test_raw_newlines_are_recovered():
+    data, issues = parse_model_json('{"dutch_translation": "regel 1\nregel 2"}')
+    assert data["dutch_translation"] == "regel 1\nregel 2"
+    assert "raw_newline" in issues
+
+
+def test_truncated_tail_is_recovered():
+    data, issues = parse_model_json('{"improved_english": "Hello", "dutch_translation": "Hallo wer')
+    assert data["dutch_translation"] == "Hallo wer"
+    assert "truncated" in issues
+
+
+def test_garbage_raises_parse_error():
+    with pytest.raises(ParseError):
+        parse_model_json("Sorry, I cannot help with that.")
+
+
+def test_backend_counts_recovery_separately_from_failures():
+    def responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert"):
+            return '{"improved_english": "Press "OK"", "dutch_translation": "Druk op "OK""}'
+        return 'Druk op "OK"'
+
+    factory = FakeModelFactory(responder)
+    backend = TranslatorBackend("test-key", model_factory=factory)
+    result = backend.translate_row_robust('Press "OK"', "")
+    assert result["dutch_translation"] == 'Druk op "OK"'
+    report = backend.run_report()
+    assert report["parse_recovered"] == 1
+    assert report["failed"] == 0
+    json_calls = [c for c in factory.log if c["system"].startswith("You are an expert")]
+    assert len(json_calls) == 1
+
+
+def test_truncation_at_max_tokens_is_not_accepted():
+    calls = []
+
+    def responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert"):
+            calls.append(prompt)
+            if len(calls) == 1:
+                return FakeResponse('{"improved_english": "Hi", "dutch_translation": "Ha', finish_reason="MAX_TOKENS")
+            return json.dumps({"improved_english": "Hi", "dutch_translation": "Hallo"})
+        return "Hallo"
+
+    factory = FakeModelFactory(responder)
+    backend = TranslatorBackend("test-key", model_factory=factory)
+    result = backend.translate_row_robust("Hi", "")
+    assert result["dutch_translation"] == "Hallo"
+    report = backend.run_report()
+    assert (report["truncations"], report["parse_retries"]) == (1, 0)
+    # The retry gets twice the output budget instead of the same request
+    budgets = [c["kwargs"]["generation_config"]["max_output_tokens"] for c in factory.log if c["system"].startswith("You are an expert")]
+    assert budgets[1] == 2 * budgets[0]
+
+
+def test_cut_off_tail_without_max_tokens_is_retried():
+    calls = []
+
+    def responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert"):
+            calls.append(prompt)
+            if len(calls) == 1:
+                return FakeResponse('{"improved_english": "Hi there", "dutch_translation": "Hallo da', finish_reason="STOP")
+            return json.dumps({"improved_english": "Hi there", "dutch_translation": "Hallo daar"})
+        return "Hallo daar"
+
+    backend = TranslatorBackend("test-key", model_factory=FakeModelFactory(responder))
+    result = backend.translate_row_robust("Hi there", "")
+    assert result["dutch_translation"] == "Hallo daar"
+    report = backend.run_report()
+    assert (report["parse_retries"], report["parse_recovered"], report["truncations"]) == (1, 0, 0)
+
+
+def test_batch_parsers_reject_a_cut_off_tail():
+    with pytest.raises(ParseError):
+        parse_complete_json('{"translations": [{"id": 0, "dutch_translation": "Hallo wer')
+    assert parse_complete_json('{"translations": []}') == {"translations": []}
+
+
+def test_segment_still_truncated_is_split_at_sentence_boundaries():
+    first = "The first sentence explains how the camera records events."
+    second = "The second sentence explains where the recordings are stored."
+
+    def responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert"):
+            if "Input Text" in prompt and first in prompt.split("Input Text")[1] and second in prompt.split("Input Text")[1]:
+                return FakeResponse('{"improved_english": "The first', finish_reason="MAX_TOKENS")
+            source = prompt.split('Input Text: "')[1].rstrip('"')
+            return json.dumps({"improved_english": source, "dutch_translation": f"NL[{source[:10]}]"})
+        return prompt.split('Candidate Dutch: "')[1].rstrip('"') if "Candidate Dutch" in prompt else "x"
+
+    backend = TranslatorBackend("test-key", model_factory=FakeModelFactory(responder))
+    result = backend.translate_row_robust(f"{first} {second}", "")
+    assert result["dutch_translation"] == "NL[The first ] NL[The second]"
+    report = backend.run_report()
+    assert (report["truncations"], report["truncation_splits"], report["rows"], report["strategy_b"]) == (3, 1, 2, 0)
+
+
+def test_echo_can_be_left_out_of_the_json_answer():
+    factory = FakeModelFactory()
+    backend = TranslatorBackend("test-key", model_factory=factory, echo_source=False)
+    assert backend.translate_row_robust("Open the app", "")["dutch_translation"] == "Vertaalde tekst"
+    system = factory.log[0]["system"]
+    assert system.startswith("You are an expert") and "original_english" not in system
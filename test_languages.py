@@ -0,0 +1,82 @@
+"""
+Tests for multi-target fan-out (languages.py, TranslatorBackend.translate_cell_targets).
+"""
+import json
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from backend import IMPROVE_TEMPLATE, JSON_TEMPLATE, TranslatorBackend, target_template
+from conftest import FakeModelFactory
+from jobs import DONE, JobManager
+from languages import normalise_targets, result_columns
+
+
+def fanout_responder(prompt, model):
+    if model.system_instruction == JSON_TEMPLATE.system:
+        return json.dumps({"improved_english": "Open the app.", "dutch_translation": "Open de app."})
+    if model.system_instruction == IMPROVE_TEMPLATE.system:
+        return "Open the app."
+    if model.system_instruction == target_template("de").system:
+        return "Öffnen Sie die App."
+    if model.system_instruction == target_template("fr").system:
+        return "Ouvrez l'application."
+    return prompt.rsplit('Candidate Dutch: "', 1)[1].rstrip('"')
+
+
+def test_targets_are_validated_and_columns_named():
+    assert normalise_targets(["NL", "de", "nl"]) == ("nl", "de")
+    assert result_columns(("nl", "de")) == ["original_english", "improved_english", "dutch_translation", "translation_de"]
+    with pytest.raises(ValueError):
+        normalise_targets(["xx"])
+
+
+def test_improved_english_is_computed_once_for_all_targets():
+    factory = FakeModelFactory(fanout_responder)
+    backend = TranslatorBackend("k", model_factory=factory)
+    result = backend.translate_cell_targets("Open app", {}, ("nl", "de", "fr"))
+
+    assert result["dutch_translation"] == "Open de app."
+    assert result["translation_de"] == "Öffnen Sie die App."
+    assert result["translation_fr"] == "Ouvrez l'application."
+    systems = [c["system"] for c in factory.log]
+    assert systems.count(JSON_TEMPLATE.system) == 1
+    assert IMPROVE_TEMPLATE.system not in systems
+    # the other targets translate the improved English, not the raw source
+    de_call = next(c for c in factory.log if c["system"] == target_template("de").system)
+    assert '"Open the app."' in de_call["prompt"]
+
+
+def test_without_dutch_the_improve_step_runs_once_and_is_cached():
+    factory = FakeModelFactory(fanout_responder)
+    backend = TranslatorBackend("k", model_factory=factory)
+    backend.translate_cell_targets("Open app", {}, ("de",))
+    backend.translate_cell_targets("Open app", {}, ("de", "fr"))
+    systems = [c["system"] for c in factory.log]
+    assert systems.count(IMPROVE_TEMPLATE.system) == 1
+    assert systems.count(target_template("de").system) == 1
+
+
+def test_glossary_dict_per_target():
+    df = pd.DataFrame({"term": ["app"], "translation_nl": ["app"], "translation_de": ["App"]})
+    assert TranslatorBackend.build_glossary_dict(df, target="de") == {"app": "App"}
+    assert TranslatorBackend.build_glossary_dict(df) == {"app": "app"}
+
+
+def test_fanout_job_writes_wide_csv_and_one_xliff_per_target(tmp_path):
+    factory = FakeModelFactory(fanout_responder)
+    manager = JobManager(output_dir=str(tmp_path))
+    job = manager.submit(TranslatorBackend("k", model_factory=factory), ["Open app", ""], {}, targets=["nl", "de"])
+    deadline = time.time() + 10
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.02)
+
+    assert job.status == DONE
+    df = pd.read_csv(job.outputs["csv"], encoding="utf-8-sig")
+    assert list(df.columns) == result_columns(("nl", "de"))
+    assert df["translation_de"][0] == "Öffnen Sie die App."
+    assert os.path.basename(job.outputs["xlf_de"]).endswith("_de.xlf")
+    with open(job.outputs["xlf_de"], encoding="utf-8") as f:
+        assert 'target-language="de"' in f.read()
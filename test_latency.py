@@ -0,0 +1,68 @@
+"""
+Tests for per-call deadlines and request hedging (latency.py).
+"""
+import threading
+import time
+
+import pytest
+
+from latency import DeadlineExceeded, HedgedCaller
+
+
+def test_fast_call_returns_and_records_latency():
+    caller = HedgedCaller(deadline=1.0)
+    assert caller.call(lambda timeout: "ok") == "ok"
+    assert len(caller.tracker) == 1
+
+
+def test_deadline_is_passed_and_enforced():
+    seen = []
+
+    def slow(timeout):
+        seen.append(timeout)
+        time.sleep(0.5)
+        return "late"
+
+    caller = HedgedCaller(deadline=0.1)
+    with pytest.raises(DeadlineExceeded):
+        caller.call(slow)
+    assert seen == [0.1]
+    assert caller.stats["timeouts"] == 1
+
+
+def test_errors_propagate():
+    def boom(timeout):
+        raise RuntimeError("429 quota")
+
+    with pytest.raises(RuntimeError):
+        HedgedCaller(deadline=1.0).call(boom)
+
+
+def test_hedge_wins_when_primary_is_slow():
+    caller = HedgedCaller(deadline=2.0, hedge=True, min_samples=5, hedge_budget=1.0)
+    for _ in range(5):
+        caller.tracker.record(0.01)
+        caller.stats["calls"] += 1
+
+    attempts = []
+    lock = threading.Lock()
+
+    def flaky(timeout):
+        with lock:
+            attempts.append(timeout)
+            first = len(attempts) == 1
+        time.sleep(1.0 if first else 0.01)
+        return "slow" if first else "fast"
+
+    start = time.monotonic()
+    assert caller.call(flaky) == "fast"
+    assert time.monotonic() - start < 0.5
+    assert caller.stats["hedges"] == 1
+    assert caller.stats["hedge_wins"] == 1
+
+
+def test_hedge_budget_caps_duplicates():
+    caller = HedgedCaller(deadline=2.0, hedge=True, min_samples=1, hedge_budget=0.0)
+    caller.tracker.record(0.001)
+    assert caller.call(lambda timeout: time.sleep(0.05) or "done") == "done"
+    assert caller.stats["hedges"] == 0
@@ -0,0 +1,87 @@
+"""
+Tests for placeholder/markup masking (masking.py) and the marker restore in
+TranslatorBackend.translate_row_robust.
+"""
+import json
+
+from backend import JSON_TEMPLATE, MARKER_REPAIR_TEMPLATE, TranslatorBackend
+from conftest import FakeModelFactory
+from masking import is_all_caps, mask, upper_outside_markup
+
+SOURCE = 'Open <strong>{count} trips</strong> in Driver•i, see https://example.com/help. or mail help@netradyne.com'
+
+
+def test_mask_replaces_markup_and_roundtrips():
+    masked = mask(SOURCE)
+    assert "<strong>" not in masked.text
+    assert "{count}" not in masked.text
+    assert "https://" not in masked.text
+    assert "Driver•i" not in masked.text
+    assert "help@netradyne.com" not in masked.text
+    # the full stop after the URL is text, not part of the URL
+    assert masked.text.count(".") == 1
+    restored, problems = masked.restore(masked.text)
+    assert restored == SOURCE
+    assert problems == []
+
+
+def test_identical_tokens_share_a_marker():
+    masked = mask("<b>A</b> and <b>B</b>")
+    assert masked.text == "⟦0⟧A⟦1⟧ and ⟦0⟧B⟦1⟧"
+    assert masked.check("⟦0⟧A⟦1⟧ en ⟦0⟧B") == ["⟦1⟧ (</b>) appears 1x, expected 2x"]
+
+
+def test_check_reports_missing_and_unknown_markers():
+    masked = mask("Hello [text], you have {count} alerts")
+    assert masked.check("Hallo ⟦0⟧, u heeft ⟦1⟧ meldingen") == []
+    assert masked.check("Hallo, u heeft ⟦1⟧ meldingen ⟦7⟧") == ["missing ⟦0⟧ ([text])", "unknown marker ⟦7⟧"]
+    # a marker written back as its original token is fine, and so is [[n]]
+    assert masked.check("Hallo [text], u heeft [[1]] meldingen") == []
+
+
+def test_all_caps_ignores_markup():
+    assert is_all_caps("<strong>SAVE</strong>")
+    assert not is_all_caps("<strong>Save</strong>")
+    assert upper_outside_markup("<strong>opslaan {count}</strong>") == "<strong>OPSLAAN {count}</strong>"
+
+
+def marker_responder(drop_first=True):
+    calls = {"json": 0}
+
+    def responder(prompt, model):
+        if model.system_instruction == JSON_TEMPLATE.system:
+            calls["json"] += 1
+            source = prompt.rsplit('Input Text: "', 1)[1].rstrip('"')
+            dutch = "Open ⟦1⟧ ritten⟦2⟧" if drop_first else "Open ⟦0⟧⟦1⟧ ritten⟦2⟧"
+            return json.dumps({"improved_english": source, "dutch_translation": dutch})
+        if model.system_instruction == MARKER_REPAIR_TEMPLATE.system:
+            return "Open ⟦0⟧⟦1⟧ ritten⟦2⟧"
+        # verify pass: return the candidate unchanged
+        return prompt.rsplit('Candidate Dutch: "', 1)[1].rstrip('"')
+
+    return responder, calls
+
+
+def test_backend_sends_markers_and_restores_them():
+    responder, calls = marker_responder(drop_first=False)
+    factory = FakeModelFactory(responder)
+    backend = TranslatorBackend("test-key", model_factory=factory)
+    result = backend.translate_row_robust("Open <b>{count} trips</b>", "")
+
+    json_call = next(c for c in factory.log if c["system"] == JSON_TEMPLATE.system)
+    assert "<b>" not in json_call["prompt"]
+    assert result["dutch_translation"] == "Open <b>{count} ritten</b>"
+    assert result["improved_english"] == "Open <b>{count} trips</b>"
+    assert backend.stats["marker_repairs"] == 0
+
+
+def test_lost_marker_gets_targeted_repair_not_a_retry():
+    responder, calls = marker_responder(drop_first=True)
+    factory = FakeModelFactory(responder)
+    backend = TranslatorBackend("test-key", model_factory=factory)
+    result = backend.translate_row_robust("Open <b>{count} trips</b>", "")
+
+    assert result["dutch_translation"] == "Open <b>{count} ritten</b>"
+    assert calls["json"] == 1
+    assert backend.run_report()["marker_repairs"] == 1
+    assert backend.run_report()["marker_failures"] == 0
@@ -0,0 +1,54 @@
+"""
+Tests for the shared row pipeline (pipeline.py): the app backend and the CLI
+script run the same code and produce the same result shapes.
+"""
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import translate_script
+from backend import TranslatorBackend
+from conftest import FakeModelFactory, FakeResponse
+from memory import TranslationMemory
+from pipeline import FAILED, JSON_RETRIES, is_failed
+
+
+def broken_responder(prompt, model):
+    if model.system_instruction.startswith("Role: Technical Translator"):
+        return RuntimeError("fallback down")
+    return "Sorry, no JSON today"
+
+
+def test_backend_and_script_fail_rows_the_same_way(monkeypatch):
+    factory = FakeModelFactory(broken_responder)
+    backend = TranslatorBackend("k", model_factory=factory)
+    from_backend = backend.translate_cell("Open the settings page", {})
+
+    calls = []
+
+    def fake_generate(template, max_output_tokens=None, **values):
+        calls.append(template.name)
+        model = type("M", (), {"system_instruction": template.system})()
+        answer = broken_responder(template.render(**values), model)
+        if isinstance(answer, Exception):
+            raise answer
+        return FakeResponse(answer)
+
+    monkeypatch.setattr(translate_script, "_generate", fake_generate)
+    script = translate_script.ScriptPipeline(stats=Counter(), memory=TranslationMemory())
+    from_script = script.translate_cell("Open the settings page", {})
+
+    for result in (from_backend, from_script):
+        assert is_failed(result) and result["dutch_translation"] == FAILED
+        assert result["improved_english"].startswith("ERROR: fallback down")
+    assert calls.count("translate_json") == JSON_RETRIES
+    assert len([c for c in factory.log if "JSON" in c["system"]]) == JSON_RETRIES
+    assert script.stats["parse_retries"] == backend.stats["parse_retries"] == JSON_RETRIES
+
+
+def test_stats_stay_exact_when_rows_run_on_threads():
+    backend = TranslatorBackend("test-key", model_factory=FakeModelFactory())
+    texts = [f"Open report {i} now" for i in range(400)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda text: backend.translate_row_robust(text, ""), texts))
+    report = backend.run_report()
+    assert (report["rows"], report["json_ok"], report["failed"]) == (400, 400, 0)
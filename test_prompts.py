@@ -0,0 +1,44 @@
+"""
+Tests for the prompt templates and the static system-instruction prefix.
+"""
+import pytest
+
+from backend import FALLBACK_TEMPLATE, JSON_TEMPLATE, VERIFY_TEMPLATE
+from prompts import PromptTemplate
+
+
+def test_template_renders_fields_and_keeps_braces_in_values():
+    t = PromptTemplate("t", system="Rules", body='Input: "{source}" ({glossary})')
+    assert t.fields == ["source", "glossary"]
+    assert t.render(source="Show {count} items", glossary="-") == 'Input: "Show {count} items" (-)'
+    assert t.render_full(source="a", glossary="b").startswith("Rules\n\n")
+
+
+def test_template_missing_field_raises():
+    t = PromptTemplate("t", system="Rules", body="{source}")
+    with pytest.raises(KeyError):
+        t.render()
+
+
+def test_static_rules_are_not_in_row_part():
+    row = JSON_TEMPLATE.render(glossary="- 'Alert' -> 'Waarschuwing'", examples="", context="", source="Hello")
+    assert "LINGUISTIC RULES" not in row
+    assert "LINGUISTIC RULES" in JSON_TEMPLATE.system
+    assert "{source}" not in VERIFY_TEMPLATE.system and "{source}" not in FALLBACK_TEMPLATE.system
+
+
+def test_models_created_once_and_requests_carry_only_row_part(fake_backend, fake_factory):
+    for text in ["Open the app", "Close the app", "Add Vehicle Groups"]:
+        result = fake_backend.translate_row_robust(text, "- 'app' -> 'app'")
+        assert result["dutch_translation"] == "Vertaalde tekst"
+
+    # one model per template (JSON + verify), reused across rows
+    assert len(fake_factory.created) == 2
+    systems = {m.system_instruction for m in fake_factory.created}
+    assert JSON_TEMPLATE.system in systems and VERIFY_TEMPLATE.system in systems
+
+    json_calls = [c for c in fake_factory.log if c["system"] == JSON_TEMPLATE.system]
+    assert len(json_calls) == 3
+    for call in json_calls:
+        assert call["prompt_chars"] < len(JSON_TEMPLATE.system) / 4
+        assert "LINGUISTIC RULES" not in call["prompt"]
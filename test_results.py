@@ -0,0 +1,44 @@
+"""
+Tests for the columnar result store (results.py).
+"""
+import numpy as np
+
+from results import EMPTY, FAILED, OK, PENDING, ResultStore
+
+
+def test_rows_fill_out_of_order_and_frame_covers_prefix():
+    store = ResultStore(["a", "b", "c"])
+    store.put(1, {"improved_english": "B", "dutch_translation": "b-nl"})
+    assert len(store) == 1
+    assert len(store.frame()) == 0  # row 0 still pending
+    store.put(0, {"improved_english": "A", "dutch_translation": "a-nl"})
+    df = store.frame()
+    assert list(df["dutch_translation"]) == ["a-nl", "b-nl"]
+    assert list(store.status) == [OK, OK, PENDING]
+
+
+def test_frame_is_a_view_built_once():
+    store = ResultStore(["a", "b"])
+    store.put(0, {"improved_english": "A", "dutch_translation": "a-nl"})
+    store.put(1, {"improved_english": "", "dutch_translation": ""})
+    df = store.frame()
+    assert np.shares_memory(df["dutch_translation"].to_numpy(), store.dutch)
+    assert store.frame() is df
+    assert store.status[1] == EMPTY
+
+
+def test_failed_rows_keep_errors_out_of_the_text_columns():
+    store = ResultStore(["a"])
+    store.put(0, {"improved_english": "ERROR: " + "x" * 1000, "dutch_translation": "ERROR_FAILED"})
+    assert store.status[0] == FAILED
+    assert store.improved[0] == ""
+    assert store.dutch[0] == "ERROR_FAILED"
+    assert len(store.errors[0]) == 300
+    assert store.status_counts() == {"pending": 0, "ok": 0, "empty": 0, "failed": 1}
+
+
+def test_tail_preview():
+    store = ResultStore([str(i) for i in range(10)])
+    for i in range(6):
+        store.put(i, {"improved_english": str(i), "dutch_translation": str(i)})
+    assert list(store.tail(3).index) == [3, 4, 5]
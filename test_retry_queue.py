@@ -0,0 +1,163 @@
+"""
+Tests for error classification and the deferred retry queue (retry_queue.py).
+"""
+import time
+
+import pandas as pd
+import pytest
+
+import retry_queue
+from backend import TranslatorBackend
+from conftest import FakeModelFactory, default_responder
+from jobs import DONE, JobManager
+from json_recovery import ParseError
+from latency import DeadlineExceeded
+from retry_queue import (
+    PARSE, PERMANENT, TRANSIENT, RetryLater, RetryQueue, backoff_delay, classify_error, retry_after,
+)
+
+
+class ApiError(Exception):
+    """Shaped like google.api_core exceptions: an int `code` plus optional details."""
+    def __init__(self, message, code=None, details=None):
+        super().__init__(message)
+        self.code = code
+        self.details = details or []
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def test_errors_are_classified():
+    assert classify_error(ApiError("Resource has been exhausted", code=429)) == TRANSIENT
+    assert classify_error(ApiError("Service unavailable", code=503)) == TRANSIENT
+    assert classify_error(DeadlineExceeded("Model call exceeded 60s deadline")) == TRANSIENT
+    assert classify_error(ConnectionError("reset by peer")) == TRANSIENT
+    assert classify_error(ValueError("429 Quota exceeded")) == TRANSIENT
+    assert classify_error(ValueError("Blocked by safety filters or empty response")) == PERMANENT
+    assert classify_error(ApiError("API key not valid", code=400)) == PERMANENT
+    assert classify_error(ParseError("Missing JSON keys")) == PARSE
+    assert classify_error(KeyError("dutch_translation")) == PARSE
+
+
+def test_retry_after_sources():
+    class Response:
+        headers = {"Retry-After": "7"}
+
+    error = ApiError("429")
+    error.response = Response()
+    assert retry_after(error) == 7.0
+
+    class RetryInfo:
+        class retry_delay:
+            seconds = 12
+            nanos = 500_000_000
+
+    assert retry_after(ApiError("429", details=[RetryInfo()])) == 12.5
+    assert retry_after(ValueError("Quota exceeded. Please retry in 31.2s.")) == 31.2
+    assert retry_after(ValueError("no hint")) is None
+
+
+def test_backoff_is_jittered_and_capped():
+    class Rng:
+        def uniform(self, low, high):
+            return high
+
+    assert backoff_delay(1, rng=Rng()) == 4.0
+    assert backoff_delay(10, rng=Rng()) == 60.0
+    assert backoff_delay(1, server_delay=30, rng=Rng()) == 32.0
+    delays = {backoff_delay(3) for _ in range(20)}
+    assert len(delays) > 1 and all(0 <= d <= 16 for d in delays)
+
+
+def test_queue_retries_in_due_order_and_gives_up():
+    clock = FakeClock()
+    queue = RetryQueue(max_attempts=2, clock=clock, sleep=clock.sleep)
+    queue.defer("late", RetryLater(ValueError("429"), delay=20))
+    queue.defer("soon", RetryLater(ValueError("429"), delay=5))
+    queue.defer("stuck", RetryLater(ValueError("429"), delay=1))
+
+    def fn(key):
+        if key == "stuck":
+            raise RetryLater(ValueError("503"), delay=1)
+        return key.upper()
+
+    outcomes = list(queue.drain(fn))
+    assert [(k, r) for k, r, e in outcomes if e is None] == [("soon", "SOON"), ("late", "LATE")]
+    gave_up = [k for k, r, e in outcomes if e is not None]
+    assert gave_up == ["stuck"]
+    assert queue.stats["gave_up"] == 1 and queue.stats["recovered"] == 2
+    assert clock.now >= 20
+
+
+def flaky_responder(failures):
+    """Raises a 429 for the first `failures` JSON calls, then answers normally."""
+    state = {"left": failures}
+
+    def responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert") and state["left"] > 0:
+            state["left"] -= 1
+            return ApiError("429 Resource has been exhausted. Please retry in 0s.", code=429)
+        return default_responder(prompt, model)
+    return responder
+
+
+def test_backend_defers_instead_of_sleeping(monkeypatch):
+    monkeypatch.setattr("pipeline.time.sleep", lambda s: pytest.fail("slept inline"))
+    backend = TranslatorBackend("k", model_factory=FakeModelFactory(flaky_responder(1)), defer_retries=True)
+    with pytest.raises(RetryLater):
+        backend.translate_row_robust("Hello", "")
+    assert backend.stats["deferred"] == 1
+    assert backend.translate_row_robust("Hello", "")["dutch_translation"] == "Vertaalde tekst"
+    assert backend.run_report()["rows"] == 1
+
+
+def test_backend_without_deferral_backs_off_inline(monkeypatch):
+    slept = []
+    monkeypatch.setattr("pipeline.time.sleep", slept.append)
+    backend = TranslatorBackend("k", model_factory=FakeModelFactory(flaky_responder(1)))
+    assert backend.translate_row_robust("Hello", "")["dutch_translation"] == "Vertaalde tekst"
+    assert len(slept) == 1 and slept[0] <= 2.0
+
+
+def test_safety_block_is_not_retried():
+    calls = []
+
+    def responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert"):
+            calls.append(prompt)
+            return ""
+        return "Vertaalde tekst"
+
+    backend = TranslatorBackend("k", model_factory=FakeModelFactory(responder))
+    result = backend.translate_row_robust("Hello", "")
+    assert len(calls) == 1
+    assert backend.stats["permanent_errors"] == 1 and backend.stats["strategy_b"] == 1
+    assert result["dutch_translation"] == "Vertaalde tekst"
+
+
+def test_job_retries_deferred_rows_at_the_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(retry_queue, "backoff_delay", lambda *args, **kwargs: 0.0)
+    backend = TranslatorBackend("k", model_factory=FakeModelFactory(flaky_responder(1)), defer_retries=True)
+    manager = JobManager(output_dir=str(tmp_path))
+    job = manager.submit(backend, ["First row", "Second row", "Third row"], {})
+    deadline = time.time() + 10
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.02)
+
+    assert job.status == DONE
+    assert job.report["retry_deferred"] == 1 and job.report["retry_recovered"] == 1
+    df = pd.read_csv(job.outputs["csv"], encoding="utf-8-sig")
+    assert df["original_english"].tolist() == ["First row", "Second row", "Third row"]
+    assert df["dutch_translation"].tolist() == ["Vertaalde tekst"] * 3
+    assert any("deferred" in line for line in job.log)
@@ -0,0 +1,76 @@
+"""
+Tests for length-aware scheduling (scheduler.py) and concurrent jobs.
+"""
+import time
+
+import pandas as pd
+
+from backend import TranslatorBackend
+from conftest import FakeModelFactory, default_responder
+from jobs import DONE, JobManager
+from scheduler import ReorderBuffer, estimate_cost, estimate_costs, longest_first, makespan
+
+
+def test_cost_grows_with_length_terms_and_markup():
+    glossary = {"Driver•i app": "Driver•i-app", "camera": "camera"}
+    short = estimate_cost("Open the camera settings")
+    assert estimate_cost("Open the camera settings", glossary) > short
+    assert estimate_cost("Open the <b>camera</b> settings {0}") > short
+    assert estimate_cost("Open the camera settings. " * 20) > 5 * short
+    assert estimate_cost("") == 0 and estimate_cost(None) == 0
+
+
+def test_fast_path_cells_cost_nothing():
+    assert estimate_costs(["42", "Camera", "Open the camera"], {"Camera": "Camera"})[:2] == [0, 0]
+
+
+def test_longest_first_shortens_the_tail():
+    costs = [10] * 9 + [90]
+    order = longest_first(costs)
+    assert order[0] == 9 and order[1:] == list(range(9))
+    # in input order the big cell starts last and runs alone
+    assert makespan(costs, 2) == 130
+    assert makespan(costs, 2, order) == 90
+
+
+def test_reorder_buffer_releases_in_input_order():
+    buffer = ReorderBuffer(4)
+    assert buffer.complete(2) == []
+    assert buffer.complete(0) == [0]
+    assert buffer.complete(1) == [1, 2]
+    assert buffer.complete(3) == [3]
+    assert buffer.next == 4
+
+
+def test_concurrent_job_starts_long_cells_first_and_keeps_order(tmp_path):
+    started = []
+
+    def slow_responder(prompt, model):
+        if model.system_instruction.startswith("You are an expert"):
+            started.append(prompt)
+            time.sleep(0.01)
+        return default_responder(prompt, model)
+
+    long_text = "Keep both hands on the wheel while the camera records the road ahead. " * 6
+    texts = ["Label one", "Label two", long_text, "Label three"]
+    manager = JobManager(output_dir=str(tmp_path))
+    backend = TranslatorBackend("k", model_factory=FakeModelFactory(slow_responder))
+    job = manager.submit(backend, texts, {}, workers=2)
+    deadline = time.time() + 10
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.02)
+
+    assert job.status == DONE
+    assert any("Keep both hands" in prompt for prompt in started[:2])
+    df = pd.read_csv(job.outputs["csv"], encoding="utf-8-sig")
+    assert df["original_english"].tolist() == texts
+
+
+def test_costs_look_terms_up_instead_of_scanning_the_glossary():
+    glossary = {f"setting {i}": f"instelling {i}" for i in range(20_000)}
+    glossary["camera"] = "camera"
+    texts = [f"Open the camera settings for trip {i} now" for i in range(2_000)]
+    start = time.perf_counter()
+    costs = estimate_costs(texts, glossary)
+    assert time.perf_counter() - start < 1.0
+    assert costs[0] == estimate_cost(texts[0], glossary) == estimate_cost(texts[0], {"camera": "camera"})
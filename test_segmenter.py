@@ -0,0 +1,64 @@
+"""
+Tests for long-cell segmentation (segmenter.py) and TranslatorBackend.translate_cell.
+"""
+import json
+
+from backend import JSON_TEMPLATE, TranslatorBackend
+from conftest import FakeModelFactory, default_responder
+from segmenter import join_segments, needs_context, split_segments
+
+LONG_CELL = (
+    "Hi in this video, let us learn\n about Privacy Mode in detail. " * 12
+    + "\n\nPrivacy Mode is a feature offered by the Driver•i device. It respects drivers.\n"
+    + "ok."
+)
+
+
+def test_short_cell_is_not_split():
+    assert split_segments("Open the app") == [("Open the app", "")]
+
+
+def test_split_join_roundtrip_preserves_text_and_line_breaks():
+    pieces = split_segments(LONG_CELL)
+    assert len(pieces) > 1
+    assert all(len(p) <= 400 for p, _ in pieces)
+    assert join_segments(pieces, [p for p, _ in pieces]) == LONG_CELL
+    assert any("\n\n" in sep for _, sep in pieces)
+
+
+def test_needs_context_for_fragments():
+    assert needs_context("ok.")
+    assert needs_context("and then the vehicle stops moving for a long while.")
+    assert not needs_context("Privacy Mode is a feature offered by the Driver•i device.")
+
+
+def echo_responder(prompt, model):
+    if model.system_instruction == JSON_TEMPLATE.system:
+        source = prompt.rsplit('Input Text: "', 1)[1].rstrip('"')
+        return json.dumps({"improved_english": source, "dutch_translation": f"NL[{source}]"})
+    # verify pass: return the candidate unchanged
+    return prompt.rsplit('Candidate Dutch: "', 1)[1].rstrip('"')
+
+
+def test_translate_cell_splits_translates_and_reassembles():
+    factory = FakeModelFactory(echo_responder)
+    backend = TranslatorBackend("test-key", model_factory=factory)
+    result = backend.translate_cell(LONG_CELL, {})
+
+    pieces = split_segments(LONG_CELL)
+    json_calls = [c for c in factory.log if c["system"] == JSON_TEMPLATE.system]
+    assert len(json_calls) == len({" ".join(p.split()) for p, _ in pieces})
+    assert result["original_english"] == LONG_CELL
+    assert "\n\n" in result["dutch_translation"]
+    assert result["dutch_translation"].startswith("NL[")
+
+    # the short trailing fragment was sent with the whole cell as context
+    fragment_call = next(c for c in json_calls if c["prompt"].endswith('"ok."'))
+    assert "CONTEXT" in fragment_call["prompt"]
+
+
+def test_repeated_cells_come_from_memory(fake_backend, fake_factory):
+    fake_backend.translate_cell("Open the app", {})
+    fake_backend.translate_cell("Open the  app", {})
+    assert fake_backend.run_report()["memory_hits"] == 1
+    assert fake_backend.run_report()["rows"] == 1
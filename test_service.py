@@ -0,0 +1,87 @@
+"""
+Tests for the HTTP translation service (service.py) against a local fake model.
+"""
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend import BATCH_TEMPLATE, TranslatorBackend
+from conftest import FakeModelFactory, default_responder
+from service import create_server
+
+
+def batch_aware_responder(prompt, model):
+    if model.system_instruction == BATCH_TEMPLATE.system:
+        time.sleep(0.05)  # keep the batch in flight long enough to collapse duplicates
+        segments = json.loads(prompt.split("SEGMENTS:\n", 1)[1])
+        return json.dumps({"translations": [
+            {"id": s["id"], "improved_english": s["text"], "dutch_translation": f"NL {s['text']}"}
+            for s in segments
+        ]})
+    return default_responder(prompt, model)
+
+
+@pytest.fixture
+def server():
+    factory = FakeModelFactory(batch_aware_responder)
+    backend = TranslatorBackend("test-key", model_factory=factory)
+    srv = create_server(backend, {"app": "app"}, port=0, window=0.05)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    srv.factory = factory
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    srv.batcher.close()
+
+
+def post(srv, path, payload):
+    url = f"http://127.0.0.1:{srv.server_address[1]}{path}"
+    req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return resp.read().decode("utf-8")
+
+
+def test_concurrent_requests_share_one_call(server):
+    texts = ["Open the app", "Close the app", "Open the app", "Restart"]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        answers = list(pool.map(lambda t: json.loads(post(server, "/translate", {"text": t})), texts))
+
+    assert [a["dutch_translation"] for a in answers] == [f"NL {t}" for t in texts]
+    batch_calls = [c for c in server.factory.log if c["system"] == BATCH_TEMPLATE.system]
+    assert len(batch_calls) == 1
+    assert server.batcher.stats["collapsed"] == 1
+
+
+def test_batch_endpoint_streams_ndjson(server):
+    body = post(server, "/translate/batch", {"texts": ["one", "two", "three"]})
+    lines = [json.loads(line) for line in body.strip().splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert {line["dutch_translation"] for line in lines} == {"NL one", "NL two", "NL three"}
+
+
+def test_batch_endpoint_answers_every_duplicate(server):
+    body = post(server, "/translate/batch", {"texts": ["same", "other", "same"]})
+    lines = sorted((json.loads(line) for line in body.strip().splitlines()), key=lambda line: line["index"])
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["dutch_translation"] for line in lines] == ["NL same", "NL other", "NL same"]
+
+
+def test_bad_request(server):
+    with pytest.raises(urllib.error.HTTPError) as err:
+        post(server, "/translate", {"text": ""})
+    assert err.value.code == 400
+
+
+@pytest.mark.parametrize("payload", [["Open the app"], "Open the app", 3, None])
+def test_body_that_is_not_an_object_is_rejected(server, payload):
+    for path in ("/translate", "/translate/batch"):
+        with pytest.raises(urllib.error.HTTPError) as err:
+            post(server, path, payload)
+        assert err.value.code == 400
+        assert json.loads(err.value.read()) == {"error": "JSON body must be an object"}
@@ -0,0 +1,123 @@
+"""
+Tests for the Parquet working store (store.py).
+"""
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import store
+from memory import TranslationMemory
+from store import ResultsStore, load_memory, read_csv_cached, save_memory
+
+
+def _row(i):
+    return {"original_english": f"Row {i}", "improved_english": f"Row {i}.", "dutch_translation": f"Rij {i}"}
+
+
+def test_append_count_and_projected_read(tmp_path):
+    results = ResultsStore(str(tmp_path / "results.parquet"))
+    assert not results.exists() and results.count() == 0
+    assert list(results.read().columns) == store.RESULT_COLUMNS
+    results.append([_row(0), _row(1)])
+    results.append([{"original_english": float("nan"), "improved_english": "", "dutch_translation": None}])
+    results.append(pd.DataFrame([_row(3)]))
+
+    assert results.count() == 4
+    df = results.read(["dutch_translation"])
+    assert list(df.columns) == ["dutch_translation"]
+    assert df["dutch_translation"].isna().tolist() == [False, False, True, False]
+    assert df["dutch_translation"][3] == "Rij 3"
+    assert results.read(limit=2)["original_english"].tolist() == ["Row 0", "Row 1"]
+
+
+def test_small_trailing_parts_are_merged_in_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "MAX_PARTS", 4)
+    monkeypatch.setattr(store, "ROW_GROUP_ROWS", 3)
+    results = ResultsStore(str(tmp_path / "results.parquet"))
+    for i in range(12):
+        results.append([_row(i)])
+    assert len(results._parts()) <= 5
+    assert results.read()["original_english"].tolist() == [f"Row {i}" for i in range(12)]
+    results.compact()
+    assert len(results._parts()) == 1 and results.count() == 12
+
+
+def test_replace_and_interrupted_merge_recovery(tmp_path):
+    path = str(tmp_path / "results.parquet")
+    results = ResultsStore(path)
+    results.append([_row(0)])
+    results.append([_row(1)])
+    df = results.read()
+    df.loc[1, "dutch_translation"] = "Gerepareerd"
+    results.replace(df)
+    assert results.read()["dutch_translation"].tolist() == ["Rij 0", "Gerepareerd"]
+
+    # A merge that was written but not swapped in is completed on open; a partial one is dropped
+    results.append([_row(2)])
+    pq.write_table(store.results_table([_row(0), _row(1), _row(2)]), os.path.join(path, ".merge-000000-000001.ready"))
+    open(os.path.join(path, ".merge.tmp"), "wb").close()
+    reopened = ResultsStore(path)
+    assert len(reopened._parts()) == 1 and sorted(os.listdir(path)) == ["part-000000.parquet"]
+    assert reopened.read()["dutch_translation"].tolist() == ["Rij 0", "Rij 1", "Rij 2"]
+
+
+def test_csv_cache_and_memory_round_trip(tmp_path):
+    csv_path = tmp_path / "reference.csv"
+    pd.DataFrame({"en": ["Settings", "Save"], "nl": ["Instellingen", "Opslaan"]}).to_csv(csv_path, index=False)
+    cache_dir = str(tmp_path / "cache")
+    assert read_csv_cached(str(csv_path), ["nl"], cache_dir)["nl"].tolist() == ["Instellingen", "Opslaan"]
+    assert len(os.listdir(cache_dir)) == 1
+    assert read_csv_cached(str(csv_path), cache_dir=cache_dir).shape == (2, 2)
+
+    memory = TranslationMemory()
+    memory.put("Open  Settings", {"improved_english": "Open Settings", "dutch_translation": "Open Instellingen"})
+    memory.put("Settings", {"translation": "Einstellungen"}, context="target:de")
+    path = str(tmp_path / "memory.parquet")
+    assert save_memory(memory, path) == 2
+    restored = TranslationMemory()
+    assert load_memory(restored, path) == 2
+    assert restored.get("Open Settings")["dutch_translation"] == "Open Instellingen"
+    assert restored.get("Settings", "target:de") == {"translation": "Einstellungen"}
+
+
+def test_results_csv_restart_and_replacement(tmp_path, monkeypatch):
+    import translate_script
+
+    monkeypatch.chdir(tmp_path)
+    pd.DataFrame([_row(0)]).to_csv(translate_script.OUTPUT_FILE, index=False)
+    results = translate_script.open_results_store()
+    results.append([_row(1)])
+    translate_script.export_results_csv(results)
+    assert translate_script.open_results_store().count() == 2
+
+    # A replaced CSV is re-imported instead of being overwritten from the store
+    pd.DataFrame([_row(5)]).to_csv(translate_script.OUTPUT_FILE, index=False)
+    os.utime(translate_script.OUTPUT_FILE, ns=(1, 1))
+    assert translate_script.open_results_store().read()["original_english"].tolist() == ["Row 5"]
+
+    # Deleting the exported CSV starts over; an interrupted run without export is resumed.
+    # The dry run's count only looks.
+    os.remove(translate_script.OUTPUT_FILE)
+    assert translate_script.results_done_count() == 0
+    assert ResultsStore(translate_script.RESULTS_STORE).count() == 1
+    results = translate_script.open_results_store()
+    assert results.count() == 0
+    results.append([_row(2)])
+    assert translate_script.open_results_store().count() == 1
+
+
+def test_checkpoint_appends_batches_and_exports_the_csv(tmp_path, monkeypatch):
+    import translate_script
+
+    monkeypatch.chdir(tmp_path)
+    results = translate_script.open_results_store()
+    checkpoint = translate_script.ResultsCheckpoint(results, rows=3, seconds=3600)
+    for i in range(7):
+        checkpoint.add(_row(i))
+    assert len(results._parts()) == 2 and results.count() == 6
+    assert len(pd.read_csv(translate_script.OUTPUT_FILE)) == 6
+    checkpoint.flush()
+    assert len(results._parts()) == 3
+    assert pd.read_csv(translate_script.OUTPUT_FILE)["original_english"].tolist() == [f"Row {i}" for i in range(7)]
+    assert translate_script.results_done_count() == 7
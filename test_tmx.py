@@ -0,0 +1,86 @@
+"""
+Tests for the streaming TMX reader/writer (tmx.py).
+"""
+import io
+import tracemalloc
+
+import pandas as pd
+
+from exports import export_format
+from memory import TranslationMemory
+from tmx import TmxWriter, iter_units, load_into_memory, write_results
+
+SAMPLE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<tmx version="1.4">
+  <header srclang="en-US" segtype="sentence" datatype="plaintext" o-tmf="x" adminlang="en" creationtool="x" creationtoolversion="1"/>
+  <body>
+    <tu><tuv xml:lang="en-US"><seg>Open Settings</seg></tuv><tuv xml:lang="nl-NL"><seg>Open Instellingen</seg></tuv></tu>
+    <tu><tuv xml:lang="EN"><seg>Press <ph x="1">&lt;b&gt;</ph>Save</seg></tuv><tuv xml:lang="nl"><seg>Druk op <ph x="1">&lt;b&gt;</ph>Opslaan</seg></tuv></tu>
+    <tu><tuv xml:lang="en-US"><seg>Only English</seg></tuv><tuv xml:lang="de-DE"><seg>Nur Deutsch</seg></tuv></tu>
+  </body>
+</tmx>
+"""
+
+
+def test_iter_units_matches_language_prefixes_and_inline_codes():
+    units = list(iter_units(io.BytesIO(SAMPLE)))
+    assert units == [("Open Settings", "Open Instellingen"), ("Press <b>Save", "Druk op <b>Opslaan")]
+    assert list(iter_units(io.BytesIO(SAMPLE), target_lang="de")) == [("Only English", "Nur Deutsch")]
+
+
+def _peak_reading(path):
+    tracemalloc.start()
+    try:
+        count = sum(1 for _ in iter_units(str(path)))
+        return count, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_iter_units_reads_in_constant_memory(tmp_path):
+    peaks = []
+    for units in (5000, 40000):
+        path = tmp_path / f"{units}.tmx"
+        with open(path, "w", encoding="utf-8") as f, TmxWriter(f, ["nl"]) as tmx:
+            for i in range(units):
+                tmx.write(f"Source segment number {i}", {"nl": f"Bronsegment nummer {i}"})
+        count, peak = _peak_reading(path)
+        assert count == units
+        peaks.append(peak)
+    # Eight times the units may not cost noticeably more memory
+    assert peaks[1] < peaks[0] * 1.5
+
+
+def test_load_into_memory_uses_the_backend_entry_shapes():
+    memory = TranslationMemory()
+    assert load_into_memory(io.BytesIO(SAMPLE), memory) == 2
+    assert memory.get("Open  Settings")["dutch_translation"] == "Open Instellingen"
+    assert load_into_memory(io.BytesIO(SAMPLE), memory, target="de") == 1
+    assert memory.get("Only English", "target:de") == {"translation": "Nur Deutsch"}
+
+
+def test_writer_round_trips_and_skips_failed_rows():
+    df = pd.DataFrame({
+        "original_english": ["Fish & <chips>", "Broken", None],
+        "improved_english": ["", "", ""],
+        "dutch_translation": ["Vis & <friet>", "ERROR_FAILED", ""],
+        "translation_de": ["Fisch & <Pommes>", "Kaputt", ""],
+    })
+    out = io.StringIO()
+    assert write_results(out, df) == 2
+    data = out.getvalue().encode("utf-8")
+    assert list(iter_units(io.BytesIO(data))) == [("Fish & <chips>", "Vis & <friet>")]
+    assert list(iter_units(io.BytesIO(data), target_lang="de-DE")) == [
+        ("Fish & <chips>", "Fisch & <Pommes>"), ("Broken", "Kaputt")
+    ]
+    generator, extension, _ = export_format("tmx")
+    assert extension == "tmx" and generator(df) == data
+
+
+def test_writer_and_reader_stream_a_large_file(tmp_path):
+    path = tmp_path / "big.tmx"
+    with open(path, "w", encoding="utf-8") as f, TmxWriter(f) as tmx:
+        for i in range(20000):
+            tmx.write(f"Segment {i}", {"nl": f"Segment {i} NL"})
+    count = sum(1 for _ in iter_units(str(path)))
+    assert count == 20000
@@ -0,0 +1,104 @@
+"""
+Tests for the record/replay transport (transport.py).
+"""
+import json
+
+import pytest
+
+from backend import TranslatorBackend
+from conftest import FakeModelFactory, FakeResponse, default_responder
+from retry_queue import PERMANENT, TRANSIENT, classify_error
+from transport import CassetteMiss, ReplayedError, Transport
+
+
+class RateLimited(Exception):
+    code = 429
+
+
+def no_network_factory(system_instruction, **kwargs):
+    raise AssertionError("replay must not build a real model")
+
+
+def test_record_then_replay_gives_identical_results(tmp_path):
+    cassette = str(tmp_path / "run.jsonl")
+    recorder = TranslatorBackend("k", model_factory=FakeModelFactory(), transport=Transport("record", cassette))
+    recorded = [recorder.translate_row_robust(text, "") for text in ("Hello", "Open the app")]
+
+    with open(cassette, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert len(entries) == 4  # JSON + verify call per row
+    assert {"key", "prompt", "latency", "text", "finish_reason", "usage"} <= set(entries[0])
+
+    replayer = TranslatorBackend("", model_factory=no_network_factory, transport=Transport("replay", cassette, speed=0))
+    replayed = [replayer.translate_row_robust(text, "") for text in ("Hello", "Open the app")]
+    assert replayed == recorded
+    assert replayer.transport.stats["replayed"] == 4
+
+
+def test_repeated_requests_replay_in_recorded_order(tmp_path):
+    cassette = str(tmp_path / "flaky.jsonl")
+    answers = iter([RateLimited("429 Resource has been exhausted"), FakeResponse("Hallo", "STOP")])
+    factory = FakeModelFactory(lambda prompt, model: next(answers))
+    model = Transport("record", cassette).wrap(factory)(system_instruction="sys")
+    with pytest.raises(RateLimited):
+        model.generate_content("Hello")
+    assert model.generate_content("Hello").text == "Hallo"
+
+    replay = Transport("replay", cassette, speed=0).wrap(no_network_factory)(system_instruction="sys")
+    with pytest.raises(ReplayedError) as error:
+        replay.generate_content("Hello")
+    assert classify_error(error.value) == TRANSIENT
+    response = replay.generate_content("Hello")
+    assert response.text == "Hallo"
+    assert response.candidates[0].finish_reason == "STOP"
+
+
+def test_unknown_request_is_a_permanent_miss(tmp_path):
+    cassette = tmp_path / "empty.jsonl"
+    cassette.write_text("")
+    model = Transport("replay", str(cassette), speed=0).wrap(no_network_factory)(system_instruction="sys")
+    with pytest.raises(CassetteMiss) as error:
+        model.generate_content("never recorded")
+    assert classify_error(error.value) == PERMANENT
+
+
+def test_replay_scales_recorded_latency(tmp_path, monkeypatch):
+    cassette = str(tmp_path / "slow.jsonl")
+    Transport("record", cassette).wrap(FakeModelFactory(default_responder))(system_instruction="sys").generate_content("Hi")
+    with open(cassette, encoding="utf-8") as f:
+        entry = json.loads(f.readline())
+    entry["latency"] = 2.0
+    with open(cassette, "w", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+    slept = []
+    monkeypatch.setattr("transport.time.sleep", slept.append)
+    Transport("replay", cassette, speed=0.25).wrap(no_network_factory)(system_instruction="sys").generate_content("Hi")
+    assert slept == [0.5]
+
+
+def test_modes_are_validated():
+    with pytest.raises(ValueError):
+        Transport("replay")
+    with pytest.raises(ValueError):
+        Transport("mock", "x.jsonl")
+
+
+def test_script_run_replays_with_its_reference_examples(tmp_path, monkeypatch):
+    import translate_script
+
+    reference = tmp_path / "reference.csv"
+    reference.write_text("english,dutch\n" + "".join(f"Example {i},Voorbeeld {i}\n" for i in range(20)))
+    cassette = str(tmp_path / "script.jsonl")
+
+    def run(transport, factory):
+        monkeypatch.setattr(translate_script, "TRANSPORT", transport)
+        monkeypatch.setattr(translate_script, "_create_model", factory)
+        monkeypatch.setattr(translate_script, "_models", {})
+        examples = translate_script.load_reference_examples(str(reference), 3)
+        return [translate_script.translate_row_robust(text, "", examples) for text in ("Hello", "Open the app")]
+
+    recorded = run(Transport("record", cassette), FakeModelFactory())
+    replayer = Transport("replay", cassette, speed=0)
+    assert run(replayer, no_network_factory) == recorded
+    assert replayer.stats["replayed"] == 4
@@ -0,0 +1,119 @@
+"""
+Tests for multi-sheet, multi-column workbook jobs (workbook.py).
+"""
+import io
+import time
+import zipfile
+
+import pytest
+from openpyxl import Workbook, load_workbook
+from openpyxl.chart import BarChart, Reference
+from openpyxl.styles import Font
+
+from backend import TranslatorBackend
+from conftest import FakeModelFactory
+from jobs import DONE, JobManager
+from workbook import WorkbookSource, dropped_parts, list_text_columns
+
+
+def make_workbook():
+    wb = Workbook()
+    screens = wb.active
+    screens.title = "Screens"
+    screens.append(["id", "title", "body"])
+    screens.append([1, "Settings", "Open the settings"])
+    screens.append([2, "Alerts", "Settings"])
+    screens.append([3, "=A2+A3", None])
+    screens["B2"].font = Font(bold=True)
+    screens.column_dimensions["C"].width = 42
+    tips = wb.create_sheet("Tooltips")
+    tips.append(["key", "tooltip", "notes"])
+    tips.append(["t1", "Open the settings", "internal"])
+    tips.append(["t2", "Alerts", "internal"])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def echo_responder(prompt, model):
+    # Dutch = "NL:" + source text, so every cell can be traced back
+    if model.system_instruction.startswith("You are an expert"):
+        source = prompt.rsplit('Input Text: "', 1)[1].rstrip('"')
+        return '{"improved_english": "%s", "dutch_translation": "NL:%s"}' % (source, source)
+    return prompt.rsplit('Candidate Dutch: "', 1)[1].rstrip('"')
+
+
+def test_text_cells_are_collected_and_deduplicated():
+    data = make_workbook()
+    assert list_text_columns(data) == {"Screens": ["id", "title", "body"], "Tooltips": ["key", "tooltip", "notes"]}
+    source = WorkbookSource(data, [("Screens", "title"), ("Screens", "body"), ("Tooltips", "tooltip")])
+    assert source.texts == ["Settings", "Alerts", "Open the settings"]
+    assert len(source.cells) == 6  # the formula and the empty cell are skipped
+    assert "6 text cells" in source.summary()
+
+
+def test_workbook_job_writes_a_translated_copy(tmp_path):
+    data = make_workbook()
+    source = WorkbookSource(data, [("Screens", "title"), ("Screens", "body"), ("Tooltips", "tooltip")], name="ui.xlsx")
+    factory = FakeModelFactory(echo_responder)
+    manager = JobManager(output_dir=str(tmp_path))
+    job = manager.submit_workbook(TranslatorBackend("k", model_factory=factory), source, {})
+    deadline = time.time() + 10
+    while job.is_active and time.time() < deadline:
+        time.sleep(0.02)
+
+    assert job.status == DONE
+    # three unique texts, each translated once (JSON + verify call)
+    assert len(factory.log) == 6
+    wb = load_workbook(job.outputs["workbook"])
+    screens, tips = wb["Screens"], wb["Tooltips"]
+    assert [c.value for c in screens["B"]] == ["title", "NL:Settings", "NL:Alerts", "=A2+A3"]
+    assert screens["C2"].value == "NL:Open the settings" and screens["C3"].value == "NL:Settings"
+    assert screens["B2"].font.bold and screens.column_dimensions["C"].width == 42
+    assert tips["B2"].value == "NL:Open the settings" and tips["C2"].value == "internal"
+
+
+X14_VALIDATION = (
+    b'<extLst><ext uri="{CCE6A557-97BC-4b89-ADB6-D9C93CAAB3DF}" '
+    b'xmlns:x14="http://schemas.microsoft.com/office/spreadsheetml/2009/9/main">'
+    b'<x14:dataValidations count="1" xmlns:xm="http://schemas.microsoft.com/office/excel/2006/main">'
+    b'<x14:dataValidation type="list"><x14:formula1><xm:f>Tooltips!$A$2:$A$3</xm:f></x14:formula1>'
+    b'<xm:sqref>D2</xm:sqref></x14:dataValidation></x14:dataValidations></ext></extLst>'
+)
+
+
+def with_sheet_xml(data, extra):
+    source = zipfile.ZipFile(io.BytesIO(data))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as package:
+        for name in source.namelist():
+            part = source.read(name)
+            if name == "xl/worksheets/sheet1.xml":
+                part = part.replace(b"</worksheet>", extra + b"</worksheet>")
+            package.writestr(name, part)
+    return buffer.getvalue()
+
+
+def test_charts_survive_the_round_trip(tmp_path):
+    wb = load_workbook(io.BytesIO(make_workbook()))
+    chart = BarChart()
+    chart.add_data(Reference(wb["Screens"], min_col=1, min_row=1, max_row=3))
+    wb["Screens"].add_chart(chart, "E2")
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    assert dropped_parts(buffer.getvalue()) == []
+
+    source = WorkbookSource(buffer.getvalue(), [("Screens", "title")])
+    source.write(str(tmp_path / "out.xlsx"), ["Instellingen", "Meldingen"])
+    assert len(load_workbook(tmp_path / "out.xlsx")["Screens"]._charts) == 1
+
+
+@pytest.mark.filterwarnings("ignore:Data Validation extension")
+def test_parts_the_copy_loses_are_reported(tmp_path):
+    data = with_sheet_xml(make_workbook(), X14_VALIDATION)
+    source = WorkbookSource(data, [("Screens", "title")])
+    assert source.dropped == ["data validation extensions"]
+
+    source.write(str(tmp_path / "out.xlsx"), ["Instellingen", "Meldingen"])
+    # The warning is accurate: the extension is gone from the copy
+    assert dropped_parts((tmp_path / "out.xlsx").read_bytes()) == []
@@ -0,0 +1,145 @@
+"""
+Streaming TMX (Translation Memory eXchange 1.4) import and export.
+
+CAT tools exchange translation memory as TMX. The reader walks the file with
+ElementTree.iterparse and detaches every <tu> once it has been read, so a file
+with millions of units is read in constant memory. TmxWriter writes units
+one at a time to an open file for the same reason, and can put several
+target languages in one unit.
+"""
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+from languages import TARGET_LANGUAGES, result_column
+
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+SOURCE_LANG = "en-US"
+# Region codes written to TMX for the target languages of this project
+TMX_LANGS = {"nl": "nl-NL", "de": "de-DE", "fr": "fr-FR"}
+
+
+def _lang_matches(lang, wanted):
+    """'en-US' and 'EN' both match 'en'; a full code must match exactly."""
+    lang, wanted = (lang or "").lower().replace("_", "-"), wanted.lower().replace("_", "-")
+    return lang == wanted or ("-" not in wanted and lang.split("-")[0] == wanted)
+
+
+def _segment_text(tuv):
+    seg = tuv.find("seg")
+    if seg is None:
+        return None
+    # Inline codes (<ph>, <bpt>, <ept>, <it>) carry the native markup text
+    return "".join(seg.itertext())
+
+
+def iter_units(source, source_lang="en", target_lang="nl"):
+    """
+    Yields (source text, target text) for every unit that has both languages.
+    `source` is a path or a binary file object.
+    """
+    # Open elements; a finished <tu> is detached from its parent (<body>)
+    open_elems = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            open_elems.append(elem)
+            continue
+        open_elems.pop()
+        if elem.tag != "tu":
+            continue
+        src = tgt = None
+        for tuv in elem.iter("tuv"):
+            lang = tuv.get(XML_LANG) or tuv.get("lang")
+            if src is None and _lang_matches(lang, source_lang):
+                src = _segment_text(tuv)
+            elif tgt is None and _lang_matches(lang, target_lang):
+                tgt = _segment_text(tuv)
+        if src and tgt:
+            yield src, tgt
+        if open_elems:
+            open_elems[-1].remove(elem)
+
+
+def load_into_memory(source, memory, source_lang="en", target="nl"):
+    """
+    Bulk-loads TMX units into a TranslationMemory as finished translations for
+    one target code, in the entry shape the backend caches for that target.
+    Returns the number of units loaded.
+    """
+    count = 0
+    for src, tgt in iter_units(source, source_lang, target):
+        if target == "nl":
+            memory.put(src, {"improved_english": src, "dutch_translation": tgt})
+        else:
+            memory.put(src, {"translation": tgt}, context=f"target:{target}")
+        count += 1
+    return count
+
+
+class TmxWriter:
+    """
+    Writes a TMX file unit by unit:
+
+        with TmxWriter(f, ["nl"]) as tmx:
+            tmx.write("Settings", {"nl": "Instellingen"})
+
+    `f` is a text file object opened with encoding="utf-8".
+    """
+    def __init__(self, f, targets=("nl",), source_lang=SOURCE_LANG, tool="translator"):
+        self.f = f
+        self.targets = list(targets)
+        self.source_lang = source_lang
+        self.tool = tool
+        self.count = 0
+
+    def __enter__(self):
+        self.f.write('<?xml version="1.0" encoding="UTF-8"?>\n<tmx version="1.4">\n')
+        self.f.write(
+            f'  <header creationtool={quoteattr(self.tool)} creationtoolversion="1" segtype="sentence" '
+            f'o-tmf="csv" adminlang="en-US" srclang={quoteattr(self.source_lang)} datatype="plaintext"/>\n'
+        )
+        self.f.write("  <body>\n")
+        return self
+
+    def write(self, source, translations):
+        """
+        translations: {target code: text}; empty or failed ones are left out.
+        A unit without any usable translation is skipped.
+        """
+        tuvs = [
+            (TMX_LANGS.get(code, code), text)
+            for code, text in translations.items()
+            if isinstance(text, str) and text.strip() and not text.startswith("ERROR")
+        ]
+        if not isinstance(source, str) or not source.strip() or not tuvs:
+            return False
+        self.count += 1
+        lines = [f'    <tu tuid="{self.count}">',
+                 f'      <tuv xml:lang={quoteattr(self.source_lang)}><seg>{escape(source)}</seg></tuv>']
+        for lang, text in tuvs:
+            lines.append(f'      <tuv xml:lang={quoteattr(lang)}><seg>{escape(text)}</seg></tuv>')
+        lines.append("    </tu>\n")
+        self.f.write("\n".join(lines))
+        return True
+
+    def __exit__(self, exc_type, exc, tb):
+        self.f.write("  </body>\n</tmx>\n")
+        return False
+
+
+def result_targets(columns):
+    """Target codes whose translation column is in `columns`."""
+    return [code for code in TARGET_LANGUAGES if result_column(code) in columns]
+
+
+def write_results(f, df):
+    """
+    Writes a result frame as TMX: English source plus every target column present.
+    Returns the number of units written.
+    """
+    targets = result_targets(df.columns)
+    columns = [result_column(code) for code in targets]
+    with TmxWriter(f, targets) as tmx:
+        for row in df[["original_english"] + columns].itertuples(index=False):
+            tmx.write(row[0], dict(zip(targets, row[1:])))
+    return tmx.count
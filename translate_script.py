@@ -1,27 +1,39 @@
-import pandas as pd
-import requests
-import google.generativeai as genai
 import time
 import json
-import io
 import os
+from collections import Counter
 from dotenv import load_dotenv
 
-load_dotenv()
+from compliance import TERM_REPAIR_BATCH, CompiledGlossary, format_report, scan
+from estimator import Estimator, format_estimate, output_budget
+from fetch import fetch_csv
+from json_recovery import parse_complete_json
+from latency import HedgedCaller
+from masking import is_all_caps, mask, upper_outside_markup
+from memory import TranslationMemory
+from pipeline import FAILED, TranslationPipeline, failed_row
+from prompts import TERM_REPAIR_SCHEMA, TRANSLATION_SCHEMA, TRANSLATION_SCHEMA_NO_ECHO, PromptTemplate
+from retry_queue import RetryLater, RetryQueue
+from store import ResultsStore, load_memory, read_csv_cached, save_memory
+from tmx import load_into_memory, write_results as write_tmx
+from transport import Transport
 
-# CONFIGURATION
 # CONFIGURATION
 # SECURITY NOTE: Never hardcode API keys in production scripts.
-API_KEY = os.getenv("GOOGLE_API_KEY") 
-if not API_KEY:
-    print("Warning: GOOGLE_API_KEY not found in environment variables.")
+# The key is read from GOOGLE_API_KEY (or .env) when the first model is created.
 DOC_URL = "https://docs.google.com/spreadsheets/d/1--ANBO4vxR2jMvwdoSOUGXWuZlR2RI3fFcUfWgzoxdc/export?format=csv"
 GLOSSARY_URL = "https://docs.google.com/spreadsheets/d/1Au9OHt0wL1XTJgOEoJMgNpYcTe89v8w9TlaFcVc5kzY/export?format=csv"
 
 OUTPUT_FILE = "TRANSLATION_RESULTS_V2.csv"
+# Parquet working copy of the results; OUTPUT_FILE is exported from it after every run
+RESULTS_STORE = "TRANSLATION_RESULTS_V2.parquet"
+# Size and mtime of the last exported CSV, kept inside the store directory
+CSV_STAMP = ".csv-export"
+# Finished rows are appended to the store, and the CSV exported, every
+# CHECKPOINT_ROWS rows or CHECKPOINT_SECONDS seconds, whichever comes first
+CHECKPOINT_ROWS = 25
+CHECKPOINT_SECONDS = 60.0
 
-# Configure Gemini
-genai.configure(api_key=API_KEY)
 generation_config = {
     "temperature": 0.2,
     "top_p": 0.8,
@@ -37,102 +49,113 @@ safety_settings = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
 ]
 
-model = genai.GenerativeModel(
-    model_name="models/gemini-2.5-flash", 
-    generation_config=generation_config,
-    safety_settings=safety_settings
-)
+# PROMPT TEMPLATES
+# The static rule blocks are sent once per model as its system_instruction;
+# each request only carries the row part (glossary slice, examples, input).
+JSON_TEMPLATE = PromptTemplate(
+    name="translate_json",
+    system="""
+You are an expert technical translator converting English to Dutch.
 
-def download_data(url, filename):
-    print(f"Downloading data from {url}...")
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        # Save for reference
-        with open(filename, 'wb') as f:
-            f.write(response.content)
-        return pd.read_csv(io.StringIO(response.content.decode('utf-8')))
-    except Exception as e:
-        print(f"Error downloading {filename}: {e}")
-        # Fallback to local file if it exists
-        if os.path.exists(filename):
-            print(f"Falling back to local file {filename}...")
-            return pd.read_csv(filename)
-        raise
+🎯 YOUR MISSION: Produce IDIOMATIC Dutch that a native speaker would write, NOT a word-by-word translation.
 
-def build_glossary_dict(df_glossary):
-    """
-    Builds a list of dictionary entries for easier searching.
-    """
-    if 'term' not in df_glossary.columns or 'translation_nl' not in df_glossary.columns:
-        print("Warning: Glossary columns mismatch. Expecting 'term' and 'translation_nl'.")
-        print(f"Found: {df_glossary.columns}")
-        return {}
-    
-    # Create a dictionary mapping term to translation_nl
-    glossary_dict = df_glossary.set_index('term')['translation_nl'].to_dict()
-    return glossary_dict
+STRICT INSTRUCTIONS:
+1. Output JSON ONLY. No markdown.
+2. Structure: { "original_english": "...", "improved_english": "...", "dutch_translation": "..." }
+3. Rephrase 'Input Text' to be grammatically correct (improved_english).
+   - **CRITICAL:** Add missing articles (the, a) e.g. "I am Driver•i" -> "I am THE Driver•i".
+   - **IMMUTABLE TERMS:** DO NOT change, split, or 'fix' the following terms: ['Driver•i', 'Driver-i', 'Netradyne']. These are proper nouns.
+4. Translate to Dutch (dutch_translation) following the rules below.
 
-import re
-import random
-import sys
-import argparse
+═══════════════════════════════════════════════════════════════════
+🔴 CRITICAL LINGUISTIC RULES (NON-NEGOTIABLE)
+═══════════════════════════════════════════════════════════════════
 
-# Force UTF-8 for stdout/stderr to avoid encoding crash on Windows consoles
-sys.stdout.reconfigure(encoding='utf-8')
-sys.stderr.reconfigure(encoding='utf-8')
+1. **FORMALITY (ABSOLUTE RULE)**:
+   - ALWAYS use formal address: "u", "uw", "uzelf"
+   - NEVER use informal: "je", "jouw", "jou"
+   - Example: "your feedback" -> "uw feedback" (NOT "je feedback")
 
-def clean_text_for_prompt(text):
-    """
-    Flattens text to a single line for safer JSON prompting.
-    """
-    if not isinstance(text, str):
-        return str(text)
-    # 1. Fix encoding first
-    text = fix_utf8_mojibake(text)
-    
-    # 2. Normalize whitespace
-    text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+2. **BRANDING (INVIOLABLE)**:
+   - NEVER translate 'Driver•i' or 'Driver-i'. Keep as-is.
+   - When forming compounds with brand names, use HYPHEN:
+     ✅ "Driver•i-app" (NOT "Driver•i app" or "Driveri-app")
+     ✅ "Driver•i-assistent" (NOT "Driver•i Assistent")
 
-def fix_utf8_mojibake(text):
-    """
-    Repairs common UTF-8 encoding errors (Mojibake).
-    Specifically targets Windows-1252 artifacting.
-    """
-    if not isinstance(text, str):
-        return str(text)
-    
-    replacements = {
-        "Ã¢â‚¬Â¢": "•",  # Bullet (Standard encoding error)
-        "â€¢": "•",      # Bullet (alt)
-        "Ã¢": "â",       # Partial artifact
-        "â¢": "•",       # Screenshot variant
-        "Ã©": "é",       # e acute
-        "Ã": "à",        # a grave (partial) - be careful here, usually context dependent
-        "â€™": "'",      # Smart quote
-        "â€œ": '"',      # Smart open quote
-        "â€": '"',       # Smart close quote
-        "Ã«": "ë",       # e diaeresis
-        "Ã¯": "ï",       # i diaeresis
-        "â€“": "-",      # En dash
-    }
-    
-    for bad, good in replacements.items():
-        text = text.replace(bad, good)
-    return text
+3. **COMPOUND WORDS (Dutch Standard)**:
+   - Combine nouns WITHOUT spaces: "Account Meldingen" -> "Accountmeldingen"
+   - Use hyphen for brand + noun: "Driver•i-app", "USB-C-kabel"
+   - Ellipsis with hyphen: "Bestuurders- en Voertuiggroepen"
 
-def _verify_and_correct(candidate_translation, source_text):
-    """
-    Self-Correction Loop using the LLM.
-    """
-    verification_prompt = f"""
-Role: Quality Assurance for English -> Dutch translation.
-Task: Verify and correct the Dutch translation below.
+4. **CAPITALIZATION (MIRROR ENGLISH)**:
+   - If English is "feedback" (lowercase), Dutch MUST be "feedback"
+   - If English is "Feedback" (Title), Dutch MUST be "Feedback"
+   - DO NOT capitalize nouns mid-sentence unless capitalized in English
 
-Source English: "{source_text}"
-Candidate Dutch: "{candidate_translation}"
+5. **AVOID TRANSLATIONISMS** (This is the most important rule!):
+   - DO NOT translate word-by-word following English structure
+   - RETHINK the sentence in natural Dutch word order
+   - Move subordinate clauses to natural Dutch positions
+   
+   ❌ BAD (translationsim): "Voordat u begint met registreren, zorg ervoor dat..."
+   ✅ GOOD (natural Dutch): "Zorg ervoor dat... voordat u begint met registreren"
+   
+   ❌ BAD: "voor de dag" (literal translation, doesn't exist in Dutch)
+   ✅ GOOD: Omit or rephrase naturally
+   
+   ❌ BAD: "Het scherm stelt u in staat om uw status voor de dag te bevestigen"
+   ✅ GOOD: "Het scherm stelt u in staat om uw status te bevestigen"
+
+6. **WORD ORDER (Dutch SOV)**:
+   - Main clause: Subject-Verb-Object
+   - Subordinate clause: Subject-Object-Verb (verb at end)
+   - Time/Manner/Place order
+   - Ask yourself: "Would a Dutch person say this?"
+
+7. **GLOSSARY TERMS (SACRED)**:
+   - Terms from the glossary are MANDATORY and EXACT
+   - Do not modify, translate, or "improve" glossary terms
+
+8. **MARKERS**:
+   - Tokens like ⟦0⟧ stand for markup, placeholders or brand names
+   - Copy each one unchanged into improved_english and dutch_translation, where it belongs in the sentence
+
+🧠 BEFORE YOU TRANSLATE: Ask yourself:
+   1. Is this formal (u/uw)?
+   2. Are compound words joined correctly?
+   3. Does this sound natural in Dutch, or is it a word-by-word translation?
+   4. Are brand names preserved exactly?
+
+Each request gives the GLOSSARY terms and EXAMPLES relevant to its Input Text.
+""",
+    body="""
+GLOSSARY:
+{glossary}
+
+EXAMPLES:
+{examples}
+{context}
+Input Text: "{source}"
+""",
+    response_schema=TRANSLATION_SCHEMA,
+)
+
+# Same rules, but the answer leaves out the unchanged original_english echo (--no-echo)
+JSON_NO_ECHO_TEMPLATE = PromptTemplate(
+    name="translate_json_no_echo",
+    system=JSON_TEMPLATE.system.replace(
+        '{ "original_english": "...", "improved_english": "...", "dutch_translation": "..." }',
+        '{ "improved_english": "...", "dutch_translation": "..." }'
+    ),
+    body=JSON_TEMPLATE.body,
+    response_schema=TRANSLATION_SCHEMA_NO_ECHO,
+)
+
+VERIFY_TEMPLATE = PromptTemplate(
+    name="verify",
+    system="""
+Role: Quality Assurance for English -> Dutch translation.
+Task: Verify and correct the Dutch translation you are given.
 
 🔍 VERIFICATION CHECKLIST (STRICT):
 
@@ -165,8 +188,8 @@ Candidate Dutch: "{candidate_translation}"
    - Mirror English casing EXACTLY
    - ❌ "Beschrijf uw Feedback" (if source is "feedback") -> ✅ "Beschrijf uw feedback"
 
-6. **VARIABLES & PLACEHOLDERS**:
-   - Are `{{count}}` or `[text]` placeholders preserved?
+6. **MARKERS**:
+   - Is every ⟦n⟧ marker from the English kept unchanged and correctly placed?
 
 7. **ELLIPSIS**:
    - ❌ "Bestuurders en Voertuiggroepen" -> ✅ "Bestuurders- en Voertuiggroepen"
@@ -181,12 +204,157 @@ Instruction:
 - If the Candidate Dutch is perfect, output it EXACTLY as is.
 - If there are errors, output the CORRECTED version only.
 - Output ONLY the final Dutch string, no explanations.
-"""
-    try:
-        response = model.generate_content(verification_prompt)
-        return response.text.strip()
-    except Exception:
-        return candidate_translation
+""",
+    body="""
+Source English: "{source}"
+Candidate Dutch: "{candidate}"
+""",
+)
+
+FALLBACK_TEMPLATE = PromptTemplate(
+    name="translate_text",
+    system="""
+Role: Technical Translator (English -> Dutch).
+Task: Translate the English text you are given to Dutch, using the listed terms if present.
+Return ONLY the Dutch translation. do not include any other text.
+""",
+    body="""
+Use these terms if present: {glossary}
+
+Input: "{source}"
+""",
+)
+
+MARKER_REPAIR_TEMPLATE = PromptTemplate(
+    name="repair_markers",
+    system="""
+Role: Dutch Language Editor.
+Task: The Dutch translation lost or changed some ⟦n⟧ markers. Each marker stands for markup or a name
+and must appear in the Dutch exactly as in the English. Put every listed marker back in the right place
+and change nothing else.
+Output ONLY the corrected Dutch text.
+""",
+    body="""
+English: "{source}"
+Dutch: "{candidate}"
+Markers: {markers}
+""",
+)
+
+TERM_REPAIR_TEMPLATE = PromptTemplate(
+    name="repair_terms",
+    system="""
+Role: Dutch Language Editor.
+Task: Each row is an English source with its Dutch translation, which does not use some required
+glossary terms. Rewrite ONLY the parts of the Dutch needed to use the listed terms exactly as given
+(compound and inflect them naturally where Dutch requires it). Keep everything else unchanged:
+wording, formality (u/uw), casing, punctuation, tags and placeholders.
+Output JSON: { "fixes": [ { "id": <row id>, "dutch_translation": "..." } ] } with one entry per row.
+""",
+    body="""
+ROWS:
+{rows}
+""",
+    response_schema=TERM_REPAIR_SCHEMA,
+)
+
+_models = {}
+
+# Run report: parse recoveries are counted apart from real failures
+RUN_STATS = Counter()
+
+# Deadline (and optional hedging) for every model call; see --deadline / --hedge
+CALLER = HedgedCaller()
+
+# Rows that hit a rate limit, timeout or 5xx; retried at the end of the run.
+# main() turns deferral on (PIPELINE.defer_retries); other callers keep the inline backoff.
+RETRIES = RetryQueue()
+
+# Live calls, or record/replay against a cassette; see --record / --replay
+TRANSPORT = Transport.from_env()
+
+_genai = None
+
+def _get_genai():
+    """
+    Imports and configures the Gemini SDK on first use. The import takes about
+    a second, which --help and the tests should not pay.
+    """
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            print("Warning: GOOGLE_API_KEY not found in environment variables.")
+        genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
+def _create_model(system_instruction, response_schema=None):
+    config = dict(generation_config)
+    if response_schema:
+        # Structured output: the API constrains the answer to this schema
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = response_schema
+    return _get_genai().GenerativeModel(
+        model_name="models/gemini-2.5-flash", 
+        generation_config=config,
+        safety_settings=safety_settings,
+        system_instruction=system_instruction
+    )
+
+def _model_for(template):
+    """
+    One GenerativeModel per template, created on first use and reused for every row.
+    """
+    if template.name not in _models:
+        _models[template.name] = TRANSPORT.wrap(_create_model)(
+            system_instruction=template.system,
+            response_schema=template.response_schema
+        )
+    return _models[template.name]
+
+def _generate(template, max_output_tokens=None, **values):
+    """
+    max_output_tokens defaults to the expected answer size for this input.
+    """
+    model = _model_for(template)
+    prompt = template.render(**values)
+    config = {"max_output_tokens": max_output_tokens or output_budget(template.name, values)}
+    return CALLER.call(
+        lambda timeout: model.generate_content(prompt, generation_config=config, request_options={"timeout": timeout})
+    )
+
+def download_data(url, filename, offline=False):
+    """
+    Conditional download with a local snapshot cache (see fetch.py):
+    unchanged sources load from the snapshot instead of being re-parsed.
+    offline=True only reads the cached copy.
+    """
+    print(f"{'Loading cached' if offline else 'Downloading'} data from {url}...")
+    df, status = fetch_csv(url, filename, offline=offline)
+    print(f"  {filename}: {status.replace('_', ' ')}")
+    return df
+
+def build_glossary_dict(df_glossary):
+    """
+    Builds a list of dictionary entries for easier searching.
+    """
+    if 'term' not in df_glossary.columns or 'translation_nl' not in df_glossary.columns:
+        print("Warning: Glossary columns mismatch. Expecting 'term' and 'translation_nl'.")
+        print(f"Found: {df_glossary.columns}")
+        return {}
+    
+    # Create a dictionary mapping term to translation_nl
+    glossary_dict = df_glossary.set_index('term')['translation_nl'].to_dict()
+    return glossary_dict
+
+import re
+import random
+import sys
+import argparse
 
 def _post_process_enforcement(dutch_text, source_english):
     """
@@ -241,199 +409,72 @@ def _post_process_enforcement(dutch_text, source_english):
 
     return dutch_text
 
-def translate_row_robust(source_text, glossary_text, reference_examples=""):
+class ScriptPipeline(TranslationPipeline):
     """
-    Tries to translate using JSON mode first.
-    If that fails, falls back to a simple Text-Only mode to ensure we get a result.
+    The shared row pipeline (pipeline.py) with this script's prompts,
+    post-processing rules and model calls.
     """
-    # 1. Prepare Prompt Inputs
-    # We clean the text for the PROMPT (to avoid breaking JSON syntax in the prompt), 
-    # but we store the original source in the output.
-    clean_noline_source = clean_text_for_prompt(source_text)
-    safe_json_source = clean_noline_source.replace('"', '\\"')
-    
-    # --- STRATEGY A: Strict JSON ---
-    prompt_json = f"""
-You are an expert technical translator converting English to Dutch.
-
-🎯 YOUR MISSION: Produce IDIOMATIC Dutch that a native speaker would write, NOT a word-by-word translation.
-
-STRICT INSTRUCTIONS:
-1. Output JSON ONLY. No markdown.
-2. Structure: {{ "original_english": "...", "improved_english": "...", "dutch_translation": "..." }}
-3. Rephrase 'Input Text' to be grammatically correct (improved_english).
-   - **CRITICAL:** Add missing articles (the, a) e.g. "I am Driver•i" -> "I am THE Driver•i".
-   - **IMMUTABLE TERMS:** DO NOT change, split, or 'fix' the following terms: ['Driver•i', 'Driver-i', 'Netradyne']. These are proper nouns.
-4. Translate to Dutch (dutch_translation) following the rules below.
-
-═══════════════════════════════════════════════════════════════════
-🔴 CRITICAL LINGUISTIC RULES (NON-NEGOTIABLE)
-═══════════════════════════════════════════════════════════════════
-
-1. **FORMALITY (ABSOLUTE RULE)**:
-   - ALWAYS use formal address: "u", "uw", "uzelf"
-   - NEVER use informal: "je", "jouw", "jou"
-   - Example: "your feedback" -> "uw feedback" (NOT "je feedback")
-
-2. **BRANDING (INVIOLABLE)**:
-   - NEVER translate 'Driver•i' or 'Driver-i'. Keep as-is.
-   - When forming compounds with brand names, use HYPHEN:
-     ✅ "Driver•i-app" (NOT "Driver•i app" or "Driveri-app")
-     ✅ "Driver•i-assistent" (NOT "Driver•i Assistent")
-
-3. **COMPOUND WORDS (Dutch Standard)**:
-   - Combine nouns WITHOUT spaces: "Account Meldingen" -> "Accountmeldingen"
-   - Use hyphen for brand + noun: "Driver•i-app", "USB-C-kabel"
-   - Ellipsis with hyphen: "Bestuurders- en Voertuiggroepen"
-
-4. **CAPITALIZATION (MIRROR ENGLISH)**:
-   - If English is "feedback" (lowercase), Dutch MUST be "feedback"
-   - If English is "Feedback" (Title), Dutch MUST be "Feedback"
-   - DO NOT capitalize nouns mid-sentence unless capitalized in English
-
-5. **AVOID TRANSLATIONISMS** (This is the most important rule!):
-   - DO NOT translate word-by-word following English structure
-   - RETHINK the sentence in natural Dutch word order
-   - Move subordinate clauses to natural Dutch positions
-   
-   ❌ BAD (translationsim): "Voordat u begint met registreren, zorg ervoor dat..."
-   ✅ GOOD (natural Dutch): "Zorg ervoor dat... voordat u begint met registreren"
-   
-   ❌ BAD: "voor de dag" (literal translation, doesn't exist in Dutch)
-   ✅ GOOD: Omit or rephrase naturally
-   
-   ❌ BAD: "Het scherm stelt u in staat om uw status voor de dag te bevestigen"
-   ✅ GOOD: "Het scherm stelt u in staat om uw status te bevestigen"
-
-6. **WORD ORDER (Dutch SOV)**:
-   - Main clause: Subject-Verb-Object
-   - Subordinate clause: Subject-Object-Verb (verb at end)
-   - Time/Manner/Place order
-   - Ask yourself: "Would a Dutch person say this?"
-
-7. **GLOSSARY TERMS (SACRED)**:
-   - Terms from the glossary are MANDATORY and EXACT
-   - Do not modify, translate, or "improve" glossary terms
-
-GLOSSARY:
-{glossary_text}
-
-EXAMPLES:
-{reference_examples}
-
-🧠 BEFORE YOU TRANSLATE: Ask yourself:
-   1. Is this formal (u/uw)?
-   2. Are compound words joined correctly?
-   3. Does this sound natural in Dutch, or is it a word-by-word translation?
-   4. Are brand names preserved exactly?
-
-Input Text: "{safe_json_source}"
-"""
-    
-    retries = 2
-    for attempt in range(retries):
-        try:
-            response = model.generate_content(prompt_json)
-            if not response.parts:
-                raise ValueError("Empty response / Safety Block")
-            
-            # Clean possible markdown format
-            txt = response.text.strip()
-            if "```" in txt:
-                txt = re.sub(r"```json\s*", "", txt, flags=re.IGNORECASE).replace("```", "")
-            
-            # Try parse
-            data = json.loads(txt)
-            
-            # Validate keys exist
-            if "improved_english" not in data or "dutch_translation" not in data:
-                raise ValueError("Missing JSON keys")
-            
-            # --- VERIFICATION STEP (New) ---
-            verified_dutch = _verify_and_correct(data["dutch_translation"], source_text)
-
-            # --- POST-PROCESSING ENFORCEMENT (The "Iron Fist") ---
-            final_dutch = _post_process_enforcement(verified_dutch, source_text)
-            
-            # --- CRITICAL: ALL CAPS ENFORCEMENT ---
-            # If source is 100% CAPS (and length > 1 to avoid 'A'), force output to be CAPS.
-            if source_text.isupper() and len(source_text) > 1:
-                data["improved_english"] = data["improved_english"].upper()
-                final_dutch = final_dutch.upper()
-
-            return {
-                "original_english": source_text, # Keep original formatting in CSV
-                "improved_english": data["improved_english"],
-                "dutch_translation": final_dutch
-            }
-        except Exception as e:
-            # print(f"    [Strategy A] Attempt {attempt+1} failed: {e}")
-            time.sleep(1)
-
-    # --- STRATEGY B: Fallback Text-Only ---
-    # If JSON failed repeatedly, we just ask for the Dutch text directly.
-    # We will fill 'improved_english' with a placeholder or just the clean source.
-    print(f"    [!] Switches to Strategy B (Text fallback) for: {clean_noline_source[:30]}...")
-    
-    prompt_text = f"""
-Role: Technical Translator (English -> Dutch).
-Task: Translate the following English text to Dutch.
-Use these terms if present: {glossary_text}
-
-Input: "{clean_noline_source}"
-
-Return ONLY the Dutch translation. do not include any other text.
-"""
-    try:
-        response = model.generate_content(prompt_text)
-        dutch_text = response.text.strip()
-        # Even in fallback, apply Iron Fist
-        final_dutch = _post_process_enforcement(dutch_text, source_text)
-        
-        # --- CRITICAL: ALL CAPS ENFORCEMENT ---
-        if source_text.isupper() and len(source_text) > 1:
-            clean_noline_source = clean_noline_source.upper()
-            final_dutch = final_dutch.upper()
-        
-        return {
-            "original_english": source_text,
-            "improved_english": clean_noline_source, # Fallback: just use cleaned source
-            "dutch_translation": final_dutch
-        }
-    except Exception as e:
-        print(f"    [Strategy B] Failed: {e}")
-        return {
-            "original_english": source_text,
-            "improved_english": "ERROR_FAILED",
-            "dutch_translation": ""
-        }
-
-def find_relevant_terms(text, glossary_dict):
-    """
-    Simple keyword matching.
-    """
-    if not isinstance(text, str): return ""
-    text_lower = text.lower()
-    found = []
-    for term, trans in glossary_dict.items():
-        if term.lower() in text_lower: # Case-insensitive matching for terms
-            found.append(f"- '{term}' -> '{trans}'")
-    
-    # Limit to top 15 terms to conserve context
-    return "\n".join(found[:15])
+    json_template = JSON_TEMPLATE
+    verify_template = VERIFY_TEMPLATE
+    fallback_template = FALLBACK_TEMPLATE
+    marker_repair_template = MARKER_REPAIR_TEMPLATE
+
+    def _generate(self, template, max_output_tokens=None, **values):
+        return _generate(template, max_output_tokens, **values)
+
+    def _post_process_enforcement(self, dutch_text, source_english):
+        return _post_process_enforcement(dutch_text, source_english)
+
+    def _note(self, message):
+        print(message)
+
+# Finished rows/pieces of this run; the pipeline counts into RUN_STATS.
+# main() turns on deferral (--no-echo switches json_template).
+MEMORY = TranslationMemory()
+PIPELINE = ScriptPipeline(stats=RUN_STATS, memory=MEMORY)
+translate_row_robust = PIPELINE.translate_row_robust
+translate_cell = PIPELINE.translate_cell
+clean_text_for_prompt = PIPELINE.clean_text_for_prompt
+find_relevant_terms = PIPELINE.find_relevant_terms
+
+def print_run_report():
+    print("\n--- Run Report ---")
+    cells = RUN_STATS["cells"]
+    local_pct = 100.0 * RUN_STATS["local_cells"] / cells if cells else 0.0
+    print(f"Cells translated:       {cells}")
+    print(f"  Resolved locally:     {RUN_STATS['local_cells']} ({local_pct:.1f}%, fast path: {RUN_STATS['fast_path']})")
+    print(f"Rows sent to the model: {RUN_STATS['rows']}")
+    print(f"  JSON OK:              {RUN_STATS['json_ok']} (of which parse-recovered: {RUN_STATS['parse_recovered']})")
+    print(f"  Parse retries:        {RUN_STATS['parse_retries']}")
+    print(f"  Truncated answers:    {RUN_STATS['truncations']} (split: {RUN_STATS['truncation_splits']})")
+    print(f"  Strategy B fallback:  {RUN_STATS['strategy_b']}")
+    print(f"  Failed:               {RUN_STATS['failed']}")
+    print(f"  Transient errors:     {RUN_STATS['transient_errors']} (deferred: {RETRIES.stats['deferred']}, recovered: {RETRIES.stats['recovered']}, gave up: {RETRIES.stats['gave_up']})")
+    print(f"  Permanent errors:     {RUN_STATS['permanent_errors']}")
+    print(f"  Segmented long cells: {RUN_STATS['segmented_cells']}")
+    print(f"  Memory hits:          {RUN_STATS['memory_hits']}")
+    print(f"  Placeholder repairs:  {RUN_STATS['marker_repairs']} (unrepaired: {RUN_STATS['marker_failures']})")
+    print(f"  Call timeouts:        {CALLER.stats['timeouts']}")
+    print(f"  Hedged calls:         {CALLER.stats['hedges']} (won: {CALLER.stats['hedge_wins']})")
+    if TRANSPORT.mode != "live":
+        print(f"  Transport ({TRANSPORT.mode}):   {dict(TRANSPORT.stats)}")
 
 def load_reference_examples(reference_path="reference_data.csv", n=5):
     """
-    Loads random examples from the reference CSV to use as few-shot prompts.
+    Loads examples from the reference CSV to use as few-shot prompts. The
+    sample is seeded, so every call (and a --replay of a recorded run) sends
+    the same examples.
     """
     if not os.path.exists(reference_path):
         return ""
+    import pandas as pd
+
     try:
-        df = pd.read_csv(reference_path)
+        df = read_csv_cached(reference_path)
         if len(df) < n:
             sample = df
         else:
-            sample = df.sample(n)
+            sample = df.sample(n, random_state=0)
         
         examples_text = "\n".join([
             f"Input: \"{row.iloc[0]}\"\nOutput: {{ \"original_english\": \"{row.iloc[0]}\", \"improved_english\": \"{row.iloc[0]}\", \"dutch_translation\": \"{row.iloc[1]}\" }}"
@@ -444,37 +485,275 @@ def load_reference_examples(reference_path="reference_data.csv", n=5):
         print(f"Warning: Could not load reference examples: {e}")
         return ""
 
+def _markup_kept(old, new):
+    # Tags, placeholders and URLs of the old translation must survive the edit
+    return all(token in new for token in mask(old, brands=False).tokens)
+
+def repair_glossary_terms(df_results, glossary_dict, batch_size=TERM_REPAIR_BATCH):
+    """
+    Finds rows whose Dutch misses glossary terms used in the English (a local
+    scan, no model calls) and sends them in batches to a short "fix these
+    terms only" prompt. A fix is kept only when it now has every term and
+    still has the row's markup. Returns the compliance report after repair.
+    """
+    compiled = CompiledGlossary(glossary_dict)
+    sources = df_results["original_english"].tolist()
+    violations, report = scan(sources, df_results["dutch_translation"].tolist(), compiled)
+    print(f"Glossary compliance: {format_report(report)}")
+    rows = list(violations)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        print(f"Fixing glossary terms in rows {start + 1}-{start + len(batch)} of {len(rows)}...", end="\r")
+        items = [
+            {
+                "id": idx,
+                "english": clean_text_for_prompt(sources[idx]),
+                "dutch": df_results.at[idx, "dutch_translation"],
+                "terms": [f"'{term}' -> '{translation}'" for term, translation in violations[idx]],
+            }
+            for idx in batch
+        ]
+        try:
+            response = _generate(TERM_REPAIR_TEMPLATE, rows=json.dumps(items, ensure_ascii=False, indent=0))
+            data = parse_complete_json(response.text)
+            fixes = {int(fix["id"]): fix.get("dutch_translation") or "" for fix in data.get("fixes", [])}
+            RUN_STATS["term_repair_calls"] += 1
+        except Exception as e:
+            print(f"\n    [Term repair] Batch failed: {e}")
+            RUN_STATS["term_repair_rejected"] += len(batch)
+            continue
+        for idx in batch:
+            old = df_results.at[idx, "dutch_translation"]
+            fixed = _post_process_enforcement(fixes.get(idx, ""), sources[idx]) if fixes.get(idx) else ""
+            if fixed and is_all_caps(sources[idx]):
+                fixed = upper_outside_markup(fixed)
+            if fixed and not compiled.missing_terms(sources[idx], fixed) and _markup_kept(old, fixed):
+                df_results.at[idx, "dutch_translation"] = fixed
+                RUN_STATS["term_repairs"] += 1
+            else:
+                RUN_STATS["term_repair_rejected"] += 1
+
+    _, report = scan(sources, df_results["dutch_translation"].tolist(), compiled)
+    print(f"\nGlossary compliance after repair: {format_report(report)}")
+    return report
+
+def retry_deferred_rows(df_results, glossary_dict, reference_examples):
+    """
+    Retries the rows queued in RETRIES (keyed by row index) and writes the
+    outcome into df_results. Rows that still fail keep the failed_row()
+    marker, so a later --repair run picks them up.
+    """
+    if not RETRIES:
+        return
+    print(f"\nRetrying {len(RETRIES)} deferred rows...")
+    retry = lambda idx: translate_cell(df_results.at[idx, "original_english"], glossary_dict, reference_examples)
+    for idx, result, error in RETRIES.drain(retry):
+        if error is not None:
+            print(f"    Row {idx+1} still failing after {RETRIES.max_attempts} retries: {error}")
+            RUN_STATS["failed"] += 1
+            continue
+        df_results.at[idx, "improved_english"] = result["improved_english"]
+        df_results.at[idx, "dutch_translation"] = result["dutch_translation"]
+
+def _csv_stamp():
+    stat = os.stat(OUTPUT_FILE)
+    return f"{stat.st_size} {stat.st_mtime_ns}"
+
+
+def export_results_csv(store):
+    """
+    Exports OUTPUT_FILE from the store and records which CSV that was, so
+    open_results_store can tell a CSV changed or deleted since then.
+    """
+    store.export_csv(OUTPUT_FILE)
+    with open(os.path.join(RESULTS_STORE, CSV_STAMP), "w") as f:
+        f.write(_csv_stamp())
+
+
+def _results_source():
+    """
+    How open_results_store will treat the results, without touching them:
+    "restart", "import" (OUTPUT_FILE into the store) or "resume".
+    - no store yet: an existing CSV is imported;
+    - CSV replaced or edited since the last export: the store is rebuilt from it;
+    - CSV deleted after an export: the run starts over, as before the store.
+    A store without an exported CSV is an interrupted run and is resumed.
+    """
+    exported = None
+    stamp_path = os.path.join(RESULTS_STORE, CSV_STAMP)
+    if os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            exported = f.read()
+    if not os.path.exists(OUTPUT_FILE):
+        return "restart" if exported is not None else "resume"
+    if not ResultsStore(RESULTS_STORE).exists() or exported != _csv_stamp():
+        return "import"
+    return "resume"
+
+
+def results_done_count():
+    """Rows a run would resume after (read-only; used by --dry-run)."""
+    source = _results_source()
+    if source == "restart":
+        return 0
+    if source == "import":
+        import pandas as pd
+
+        return len(pd.read_csv(OUTPUT_FILE))
+    return ResultsStore(RESULTS_STORE).count()
+
+
+def open_results_store():
+    """
+    The Parquet results store, kept in step with OUTPUT_FILE (see _results_source).
+    """
+    import shutil
+
+    import pandas as pd
+
+    source = _results_source()
+    store = ResultsStore(RESULTS_STORE)
+    if source == "restart":
+        print(f"{OUTPUT_FILE} was deleted: starting over (removing {RESULTS_STORE})")
+        shutil.rmtree(RESULTS_STORE)
+        store = ResultsStore(RESULTS_STORE)
+    elif source == "import":
+        if store.exists():
+            print(f"{OUTPUT_FILE} changed since it was exported: re-importing it into {RESULTS_STORE}")
+        store.replace(pd.read_csv(OUTPUT_FILE))
+        with open(os.path.join(RESULTS_STORE, CSV_STAMP), "w") as f:
+            f.write(_csv_stamp())
+        print(f"Imported {OUTPUT_FILE} into {RESULTS_STORE}")
+    elif store.exists() and not os.path.exists(OUTPUT_FILE):
+        print(f"Resuming from {RESULTS_STORE}; delete it to start over")
+    return store
+
+class ResultsCheckpoint:
+    """
+    Buffers finished rows and writes them as one store part, followed by a
+    CSV export, at every checkpoint. A crash loses at most one checkpoint.
+    """
+    def __init__(self, store, rows=CHECKPOINT_ROWS, seconds=CHECKPOINT_SECONDS):
+        self.store = store
+        self.rows = rows
+        self.seconds = seconds
+        self.pending = []
+        self.last = time.monotonic()
+
+    def add(self, result):
+        self.pending.append(result)
+        if len(self.pending) >= self.rows or time.monotonic() - self.last >= self.seconds:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.store.append(self.pending)
+            self.pending = []
+            export_results_csv(self.store)
+        self.last = time.monotonic()
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--repair", action="store_true", help="Fix failed rows in existing results.")
+    parser.add_argument("--deadline", type=float, default=CALLER.deadline, help="Seconds before a model call is cancelled and retried.")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate request when a call runs past the observed p95 latency.")
+    parser.add_argument("--check-glossary", action="store_true", help="Report rows whose Dutch misses glossary terms (local scan, no model calls).")
+    parser.add_argument("--dry-run", action="store_true", help="Estimate calls, tokens, cost and wall time for the pending rows without calling the model.")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record every model call (request, response, latency, tokens) to this file.")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Answer model calls from a recorded cassette instead of the API.")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Multiplier for recorded latencies in --replay (0 = instant).")
+    parser.add_argument("--load-tmx", metavar="TMX", action="append", default=[], help="Preload a TMX file (en -> nl units) into the translation memory. Repeatable.")
+    parser.add_argument("--export-tmx", metavar="TMX", help="Write the results to this TMX file when the run ends.")
+    parser.add_argument("--no-echo", action="store_true", help="Leave the unchanged original_english out of the JSON answers (less output).")
+    parser.add_argument("--memory-store", metavar="PARQUET", help="Load the translation memory from this file and save it back after the run.")
     args = parser.parse_args()
 
+    import pandas as pd
+
+    # Force UTF-8 for stdout/stderr to avoid encoding crash on Windows consoles
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+    global TRANSPORT
+    CALLER.deadline = args.deadline
+    CALLER.hedge = args.hedge
+    if args.record:
+        TRANSPORT = Transport("record", args.record)
+    elif args.replay:
+        TRANSPORT = Transport("replay", args.replay, speed=args.replay_speed)
+    # Rate limits and timeouts queue the row instead of stalling the run
+    PIPELINE.defer_retries = True
+    if args.no_echo:
+        # JSON answer without the original_english echo
+        PIPELINE.json_template = JSON_NO_ECHO_TEMPLATE
+    for path in args.load_tmx:
+        start = time.time()
+        loaded = load_into_memory(path, MEMORY)
+        print(f"Loaded {loaded} translation units from {path} ({time.time() - start:.1f}s)")
+    if args.memory_store:
+        print(f"Loaded {load_memory(MEMORY, args.memory_store)} memory entries from {args.memory_store}")
+
     print("--- Starting Translation Process (Robust V3) ---")
     
     # 1. Download Data
     img_glossary_file = "glossary_data.csv"
     img_doc_file = "source_doc_data.csv"
     
-    # Always refresh data
-    df_glossary = download_data(GLOSSARY_URL, img_glossary_file)
+    # Refresh data (conditional requests; unchanged sources load from cache)
+    df_glossary = download_data(GLOSSARY_URL, img_glossary_file, offline=args.dry_run)
     glossary_dict = build_glossary_dict(df_glossary)
     
     # Identify source column
-    df_doc = download_data(DOC_URL, img_doc_file)
+    df_doc = download_data(DOC_URL, img_doc_file, offline=args.dry_run)
     source_col = next((c for c in df_doc.columns if 'source' in c.lower() or 'en_us' in c.lower()), df_doc.columns[0])
     print(f"Source Column: {source_col}")
 
+    if args.dry_run:
+        print(">>> DRY RUN (no model calls) <<<")
+        # Read-only: a dry run never imports, rebuilds or clears the store
+        processed_count = results_done_count()
+        texts = df_doc[source_col].iloc[processed_count:].tolist()
+        if processed_count:
+            print(f"Resuming from row {processed_count}: {len(texts)} rows pending.")
+        estimator = Estimator(clean_text_for_prompt, find_relevant_terms, PIPELINE.json_template, VERIFY_TEMPLATE)
+        # Rows run one at a time with a 1 s pause, as in the standard mode below
+        estimate = estimator.estimate(
+            texts, glossary_dict, load_reference_examples("reference_data.csv", 3), memory=MEMORY,
+            concurrency=1, row_pause=1.0
+        )
+        for line in format_estimate(estimate):
+            print(line)
+        return
+
+    store = open_results_store()
+    if args.check_glossary:
+        if not store.exists():
+            print("No results to check.")
+            return
+        df_results = store.read(["original_english", "dutch_translation"])
+        violations, report = scan(df_results["original_english"], df_results["dutch_translation"], glossary_dict)
+        for idx, missing in list(violations.items())[:20]:
+            print(f"Row {idx+1}: missing " + ", ".join(f"'{term}' -> '{translation}'" for term, translation in missing))
+        print(f"Glossary compliance: {format_report(report)}")
+        return
+
     # 2. Repair Mode or Append Mode
     if args.repair:
         print(">>> REPAIR MODE ACTIVATED <<<")
-        if not os.path.exists(OUTPUT_FILE):
-            print("No output file to repair.")
+        if not store.exists():
+            print("No results to repair.")
             return
             
-        df_results = pd.read_csv(OUTPUT_FILE)
+        df_results = store.read()
         
         # Identify failed rows
-        mask_fail = (df_results["improved_english"] == "ERROR_FAILED") | (df_results["dutch_translation"].isna())
+        # Results written before the shared pipeline marked failures in improved_english
+        mask_fail = (
+            (df_results["dutch_translation"] == FAILED)
+            | (df_results["improved_english"] == FAILED)
+            | df_results["dutch_translation"].isna()
+        )
         failed_indices = df_results[mask_fail].index
         
         print(f"Found {len(failed_indices)} rows to repair.")
@@ -485,69 +764,95 @@ def main():
             
             print(f"Repairing Row {idx+1}...", end="\r")
             
-            updated_row = translate_row_robust(
-                original_text, 
-                find_relevant_terms(original_text, glossary_dict),
-                load_reference_examples("reference_data.csv", 3)
-            )
+            try:
+                updated_row = translate_cell(
+                    original_text, 
+                    glossary_dict,
+                    load_reference_examples("reference_data.csv", 3)
+                )
+            except RetryLater as e:
+                RETRIES.defer(idx, e)
+                continue
             
             # Update output DF in memory
             df_results.at[idx, "improved_english"] = updated_row["improved_english"]
             df_results.at[idx, "dutch_translation"] = updated_row["dutch_translation"]
             
             # Save constantly to avoid data loss
-            # For repair, overwriting the whole CSV is safer to keep order, 
+            # For repair, overwriting the whole store is safer to keep order, 
             # but we can improve efficiency if needed. For now, simple rewrite is safe for 500 rows.
             if idx % 5 == 0: # Save batch
-                 df_results.to_csv(OUTPUT_FILE, index=False)
-            
-            time.sleep(1.0)
+                 store.replace(df_results)
             
+        retry_deferred_rows(df_results, glossary_dict, load_reference_examples("reference_data.csv", 3))
+        store.replace(df_results)
+
+        # Rows that translated fine but ignored the glossary: targeted, batched fixes
+        repair_glossary_terms(df_results, glossary_dict)
         # Final Save
-        df_results.to_csv(OUTPUT_FILE, index=False)
+        store.replace(df_results)
         print("\nRepair Complete.")
         
     else:
         # Standard Process (Append / Resume)
         print(">>> STANDARD MODE ACTIVATED <<<")
-        if not os.path.exists(OUTPUT_FILE):
-             pd.DataFrame(columns=["original_english", "improved_english", "dutch_translation"]).to_csv(OUTPUT_FILE, index=False)
-             processed_count = 0
-        else:
-             existing_df = pd.read_csv(OUTPUT_FILE)
-             processed_count = len(existing_df)
+        # Row count from the Parquet footers; no need to parse earlier results
+        processed_count = store.count()
+        if processed_count:
              print(f"Resuming from row {processed_count}...")
         
         rows_to_process = df_doc.iloc[processed_count:]
         total_rows = len(df_doc)
+        checkpoint = ResultsCheckpoint(store)
 
-        for index, row in rows_to_process.iterrows():
-            source_text = row[source_col]
-            if pd.isna(source_text) or str(source_text).strip() == "":
-                # Append an empty row to maintain alignment if resuming
-                empty_result = {
-                    "original_english": source_text,
-                    "improved_english": "",
-                    "dutch_translation": ""
-                }
-                pd.DataFrame([empty_result]).to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
-                continue
-
-            print(f"[{index+1}/{total_rows}] Processing...", end="\r")
-            
-            result = translate_row_robust(
-                source_text,
-                find_relevant_terms(source_text, glossary_dict),
-                load_reference_examples("reference_data.csv", 3)
-            )
-            
-            new_df = pd.DataFrame([result])
-            new_df = new_df[["original_english", "improved_english", "dutch_translation"]]
-            new_df.to_csv(OUTPUT_FILE, mode='a', header=False, index=False)
-            
-            time.sleep(1.0)
-
+        try:
+            for index, row in rows_to_process.iterrows():
+                source_text = row[source_col]
+                if pd.isna(source_text) or str(source_text).strip() == "":
+                    # Append an empty row to maintain alignment if resuming
+                    checkpoint.add({
+                        "original_english": source_text,
+                        "improved_english": "",
+                        "dutch_translation": ""
+                    })
+                    continue
+
+                print(f"[{index+1}/{total_rows}] Processing...", end="\r")
+
+                try:
+                    result = translate_cell(
+                        source_text,
+                        glossary_dict,
+                        load_reference_examples("reference_data.csv", 3)
+                    )
+                except RetryLater as e:
+                    # Keep the row's place; it is retried after the other rows
+                    RETRIES.defer(index, e)
+                    result = failed_row(source_text, f"ERROR: deferred ({e})")
+
+                checkpoint.add(result)
+
+                time.sleep(1.0)
+        finally:
+            # Also on Ctrl+C: finished rows are kept and the run resumes after them
+            checkpoint.flush()
+
+        if RETRIES:
+            df_results = store.read()
+            retry_deferred_rows(df_results, glossary_dict, load_reference_examples("reference_data.csv", 3))
+            store.replace(df_results)
+        store.compact()
+
+    # CSV stays the deliverable
+    export_results_csv(store)
+    if args.memory_store:
+        print(f"Saved {save_memory(MEMORY, args.memory_store)} memory entries to {args.memory_store}")
+    print_run_report()
     print(f"\nDone! Results saved to: {os.path.abspath(OUTPUT_FILE)}")
+    if args.export_tmx:
+        with open(args.export_tmx, "w", encoding="utf-8") as f:
+            units = write_tmx(f, store.read())
+        print(f"TMX: {units} units written to {os.path.abspath(args.export_tmx)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,204 @@
+"""
+Record/replay transport for model calls.
+
+Sits between the code that builds prompts and the model objects returned by
+a model factory (TranslatorBackend's model_factory, translate_script's
+_model_for). Three modes:
+
+    live    calls go straight to the model (the default)
+    record  calls go to the model; request, response, latency and token
+            usage are appended to a cassette file (JSON Lines)
+    replay  calls are answered from the cassette, after the recorded latency
+            times `speed` (0 = instant), without network access or an API key
+
+Entries are keyed by a hash of the system instruction and the prompt. A
+prompt that was sent several times (retries) replays its answers in the
+recorded order, errors included, so a production run can be replayed
+deterministically.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from json_recovery import response_finish_reason
+
+LIVE = "live"
+RECORD = "record"
+REPLAY = "replay"
+MODES = (LIVE, RECORD, REPLAY)
+
+
+class CassetteMiss(LookupError):
+    """Replay mode got a request that is not in the cassette."""
+    # Classified as permanent (retry_queue.classify_error): asking again will not help
+    code = 404
+
+
+class ReplayedError(Exception):
+    """An error recorded in the cassette, raised again on replay."""
+    def __init__(self, message, code=None, kind=""):
+        super().__init__(message)
+        self.code = code
+        self.kind = kind
+
+
+class _Candidate:
+    def __init__(self, finish_reason):
+        self.finish_reason = finish_reason
+
+
+class _Usage:
+    def __init__(self, usage):
+        self.prompt_token_count = usage.get("prompt_tokens", 0)
+        self.candidates_token_count = usage.get("output_tokens", 0)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class ReplayResponse:
+    """
+    The parts of a GenerateContentResponse this project reads: text, parts,
+    candidates[0].finish_reason and usage_metadata.
+    """
+    def __init__(self, entry):
+        self.text = entry.get("text") or ""
+        self.parts = [self.text] if self.text else []
+        self.candidates = [_Candidate(entry.get("finish_reason") or "STOP")]
+        self.usage_metadata = _Usage(entry.get("usage") or {})
+
+
+def request_key(system_instruction, prompt):
+    raw = json.dumps([system_instruction or "", prompt], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _usage(response):
+    meta = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(meta, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(meta, "candidates_token_count", 0) or 0,
+    }
+
+
+def _text(response):
+    # .text raises when the answer was blocked (no parts)
+    try:
+        return response.text if response.parts else ""
+    except Exception:
+        return ""
+
+
+class Transport:
+    """
+    wrap(model_factory) returns a factory with the same signature whose
+    models record or replay according to `mode`.
+    """
+    def __init__(self, mode=LIVE, cassette=None, speed=1.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown transport mode '{mode}' (expected one of {', '.join(MODES)})")
+        if mode != LIVE and not cassette:
+            raise ValueError(f"Transport mode '{mode}' needs a cassette path")
+        self.mode = mode
+        self.cassette = cassette
+        self.speed = speed
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._entries = None
+        self._served = defaultdict(int)
+
+    @classmethod
+    def from_env(cls):
+        """
+        TRANSLATOR_TRANSPORT=live|record|replay, TRANSLATOR_CASSETTE=path,
+        TRANSLATOR_REPLAY_SPEED=float (replay latency multiplier).
+        """
+        return cls(
+            os.getenv("TRANSLATOR_TRANSPORT", LIVE),
+            os.getenv("TRANSLATOR_CASSETTE"),
+            float(os.getenv("TRANSLATOR_REPLAY_SPEED", "1.0")),
+        )
+
+    def wrap(self, model_factory):
+        if self.mode == LIVE:
+            return model_factory
+
+        def factory(system_instruction, **kwargs):
+            # Replay never builds a real model: no SDK import, no API key
+            inner = model_factory(system_instruction=system_instruction, **kwargs) if self.mode == RECORD else None
+            return _TransportModel(self, system_instruction, inner)
+        return factory
+
+    def _load(self):
+        with self._lock:
+            if self._entries is None:
+                self._entries = defaultdict(list)
+                with open(self.cassette, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["key"]].append(entry)
+            return self._entries
+
+    def record(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            with open(self.cassette, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.stats["recorded"] += 1
+
+    def lookup(self, key):
+        entries = self._load().get(key)
+        if not entries:
+            self.stats["misses"] += 1
+            raise CassetteMiss(f"No recorded response for request {key} in {self.cassette}")
+        with self._lock:
+            # Repeated requests replay in recorded order; the last answer repeats
+            position = min(self._served[key], len(entries) - 1)
+            self._served[key] += 1
+            self.stats["replayed"] += 1
+        return entries[position]
+
+
+class _TransportModel:
+    def __init__(self, transport, system_instruction, inner):
+        self.transport = transport
+        self.system_instruction = system_instruction
+        self.inner = inner
+
+    def generate_content(self, contents, **kwargs):
+        key = request_key(self.system_instruction, contents)
+        if self.transport.mode == REPLAY:
+            return self._replay(key)
+
+        start = time.monotonic()
+        entry = {"key": key, "system": (self.system_instruction or "").strip()[:80], "prompt": contents}
+        try:
+            response = self.inner.generate_content(contents, **kwargs)
+        except Exception as e:
+            code = getattr(e, "code", None)
+            entry.update({
+                "latency": round(time.monotonic() - start, 4),
+                "error": {"type": type(e).__name__, "message": str(e), "code": code if isinstance(code, int) else None},
+            })
+            self.transport.record(entry)
+            raise
+        entry.update({
+            "latency": round(time.monotonic() - start, 4),
+            "text": _text(response),
+            "finish_reason": response_finish_reason(response),
+            "usage": _usage(response),
+        })
+        self.transport.record(entry)
+        return response
+
+    def _replay(self, key):
+        entry = self.transport.lookup(key)
+        delay = entry.get("latency", 0) * self.transport.speed
+        if delay > 0:
+            time.sleep(delay)
+        error = entry.get("error")
+        if error:
+            raise ReplayedError(error["message"], code=error.get("code"), kind=error.get("type", ""))
+        return ReplayResponse(entry)
@@ -0,0 +1,147 @@
+"""
+Multi-sheet, multi-column workbook jobs.
+
+Real deliverables are workbooks with several sheets and several text columns
+(title, body, tooltip, ...) that share many strings. A WorkbookSource
+collects the text cells of the selected (sheet, column) pairs, dedups them
+across all columns and sheets, and hands the unique texts to one job, so
+they share one concurrent pipeline and one translation memory. Afterwards
+the translations are written back into a copy of the original workbook: the
+same sheets, styles, widths and formulas, with only the text cells replaced.
+Row 1 of every sheet is taken as the header row.
+
+The copy is an openpyxl round-trip, which does not keep everything: shapes
+and text boxes, slicers, and the extension features of newer Excel versions
+(data validation lists that point at other sheets, sparklines) are dropped,
+and images too when Pillow is not installed. Charts are kept. dropped_parts()
+names the ones a file has, so the UI can warn before the job runs.
+"""
+import importlib.util
+import io
+import re
+import zipfile
+
+HEADER_ROW = 1
+
+
+def _load(data, read_only):
+    from openpyxl import load_workbook
+
+    return load_workbook(io.BytesIO(data), read_only=read_only)
+
+
+# Package part -> what the translated copy loses
+_DROPPED_PARTS = [
+    ("xl/slicers/", "slicers"),
+]
+# (folder, XML pattern) -> what the translated copy loses
+_DROPPED_ELEMENTS = [
+    ("xl/drawings/", re.compile(rb"<(?:xdr:)?sp\b"), "shapes and text boxes"),
+    ("xl/worksheets/", re.compile(rb"<x14:dataValidations?\b"), "data validation extensions"),
+    ("xl/worksheets/", re.compile(rb"<x14:sparklineGroups?\b"), "sparklines"),
+]
+
+
+def dropped_parts(data):
+    """
+    What the translated copy of an .xlsx file (bytes) will lose, e.g.
+    ["shapes and text boxes", "sparklines"]; empty when the round-trip keeps
+    everything.
+    """
+    found = []
+    parts = list(_DROPPED_PARTS)
+    if importlib.util.find_spec("PIL") is None:
+        # openpyxl only reads images back with Pillow
+        parts.append(("xl/media/", "images"))
+    with zipfile.ZipFile(io.BytesIO(data)) as package:
+        names = package.namelist()
+        for prefix, label in parts:
+            if any(name.startswith(prefix) for name in names):
+                found.append(label)
+        for folder, pattern, label in _DROPPED_ELEMENTS:
+            xml_parts = [name for name in names if name.startswith(folder) and name.endswith(".xml")]
+            if any(pattern.search(package.read(name)) for name in xml_parts):
+                found.append(label)
+    return found
+
+
+def _is_text(value):
+    # Formulas stay formulas; numbers and dates are not translated
+    return isinstance(value, str) and value.strip() != "" and not value.startswith("=")
+
+
+def list_text_columns(data):
+    """
+    {sheet name: [column header, ...]} for every sheet of an .xlsx file (bytes).
+    """
+    wb = _load(data, read_only=True)
+    try:
+        columns = {}
+        for ws in wb.worksheets:
+            header = next(ws.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+            columns[ws.title] = [str(h) for h in header if h is not None and str(h).strip()]
+        return columns
+    finally:
+        wb.close()
+
+
+class WorkbookSource:
+    """
+    data:       the .xlsx file as bytes (kept to write the translated copy)
+    selections: [(sheet name, column header), ...] to translate
+
+    texts holds the unique source texts in first-seen order; cells maps
+    every selected text cell (sheet, row, column number) to its entry in texts.
+    dropped lists what the translated copy loses (see dropped_parts).
+    """
+    def __init__(self, data, selections, name="workbook.xlsx"):
+        self.data = data
+        self.name = name
+        self.dropped = dropped_parts(data)
+        self.selections = [tuple(s) for s in selections]
+        self.texts = []
+        self.cells = []
+        positions = {}
+        wb = _load(data, read_only=True)
+        try:
+            for sheet, header in self.selections:
+                ws = wb[sheet]
+                headers = next(ws.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+                try:
+                    column = [str(h) if h is not None else "" for h in headers].index(header) + 1
+                except ValueError:
+                    raise ValueError(f"Column '{header}' not found in sheet '{sheet}'")
+                rows = ws.iter_rows(min_row=HEADER_ROW + 1, min_col=column, max_col=column, values_only=True)
+                for row_number, (value,) in enumerate(rows, start=HEADER_ROW + 1):
+                    if not _is_text(value):
+                        continue
+                    if value not in positions:
+                        positions[value] = len(self.texts)
+                        self.texts.append(value)
+                    self.cells.append((sheet, row_number, column, positions[value]))
+        finally:
+            wb.close()
+
+    def summary(self):
+        return (
+            f"{len(self.cells)} text cells in {len(self.selections)} sheet columns, "
+            f"{len(self.texts)} unique"
+        )
+
+    def write(self, path, translations, failed_markers=("ERROR_FAILED", "ERROR_FAILED_PROCESSING")):
+        """
+        Saves a copy of the workbook with every selected cell replaced by the
+        translation of its text. Empty or failed translations keep the
+        English; self.dropped is not in the copy. Returns the number of cells
+        replaced.
+        """
+        wb = _load(self.data, read_only=False)
+        replaced = 0
+        for sheet, row, column, text_index in self.cells:
+            translation = translations[text_index]
+            if not isinstance(translation, str) or not translation or translation in failed_markers:
+                continue
+            wb[sheet].cell(row=row, column=column).value = translation
+            replaced += 1
+        wb.save(path)
+        return replaced